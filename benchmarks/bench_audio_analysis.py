@@ -0,0 +1,114 @@
+"""
+Benchmarks storing Spotify audio analysis as packed float32 BLOBs against keeping the JSON payload as TEXT:
+bytes stored per track and the time to extract features of every stored track.
+
+Usage:
+    python benchmarks/bench_audio_analysis.py --tracks 1000 --repeat 3 --output audio_analysis.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import common
+from app.api.sqlite_api import SQLiteAPI
+from app.api.audio_analysis_api import AudioAnalysisAPI, AUDIO_ANALYSIS_TABLE
+
+JSON_TABLE = 'spotify_audio_analysis_json'
+
+
+def synthetic_analysis(rng, segments=800, beats=400):
+    """Returns an audio-analysis payload shaped like the Spotify one, with about as many segments as a 3 minute track"""
+    def intervals(count, duration):
+        starts = np.arange(count) * duration
+        return [{'start': float(s), 'duration': float(duration * (0.9 + 0.2 * c)), 'confidence': float(c)}
+                for s, c in zip(starts, rng.random(count))]
+
+    return {
+        'track': {'duration': 180.0, 'tempo': float(60 + 140 * rng.random()), 'key': int(rng.integers(12)),
+                  'mode': int(rng.integers(2)), 'time_signature': 4, 'loudness': float(-40 * rng.random())},
+        'segments': [
+            {'start': float(i * 0.22), 'duration': float(0.1 + 0.3 * rng.random()), 'confidence': float(rng.random()),
+             'loudness_start': float(-60 * rng.random()), 'loudness_max_time': float(0.1 * rng.random()),
+             'loudness_max': float(-40 * rng.random()),
+             'pitches': rng.random(12).round(3).tolist(), 'timbre': (100 * rng.standard_normal(12)).round(3).tolist()}
+            for i in range(segments)
+        ],
+        'beats': intervals(beats, 0.5),
+        'bars': intervals(beats // 4, 2.0),
+        'tatums': intervals(beats * 2, 0.25),
+        'sections': [{'start': float(i * 20), 'duration': 20.0, 'confidence': 0.5, 'loudness': -8.0,
+                      'tempo': 120.0, 'key': 5, 'mode': 1} for i in range(9)],
+    }
+
+
+def json_features(connection, track_ids):
+    """Extracts the same features as AudioAnalysisAPI.extract_features, one JSON payload at a time"""
+    placeholders = ', '.join(['?' for _ in track_ids])
+    rows = dict(connection.execute(f"SELECT track_id, data FROM {JSON_TABLE} WHERE track_id IN ({placeholders})", track_ids))
+    features = {'track_ids': [], 'mean_pitches': [], 'mean_timbre': [], 'key_histogram': [], 'tempo_stability': []}
+    for track_id in track_ids:
+        payload = json.loads(rows[track_id])
+        pitches = np.array([segment['pitches'] for segment in payload['segments']])
+        durations = np.array([segment['duration'] for segment in payload['segments']])
+        histogram = np.bincount(pitches.argmax(axis=1), weights=durations, minlength=12)
+        beats = np.array([beat['duration'] for beat in payload['beats']])
+        features['track_ids'].append(track_id)
+        features['mean_pitches'].append(pitches.mean(axis=0))
+        features['mean_timbre'].append(np.array([segment['timbre'] for segment in payload['segments']]).mean(axis=0))
+        features['key_histogram'].append(histogram / histogram.sum())
+        features['tempo_stability'].append(np.clip(1 - beats.std() / beats.mean(), 0, 1))
+    return features
+
+
+def run(tracks, repeat, workdir):
+    rng = np.random.default_rng(tracks)
+    db_path = os.path.join(workdir, 'audio_analysis.db')
+    sqlite3.connect(db_path).close()
+    sqlite_api = SQLiteAPI()
+    sqlite_api.connect(db_path)
+    api = AudioAnalysisAPI(sqlite_api)
+
+    track_ids = [f'track{i}' for i in range(tracks)]
+    payloads = [synthetic_analysis(rng) for _ in track_ids]
+    assert api.store(list(zip(track_ids, payloads)))[1] == 201
+    sqlite_api.create_table(JSON_TABLE, ['track_id TEXT PRIMARY KEY', 'data TEXT'], force_create=True)
+    sqlite_api.insert_rows(JSON_TABLE, [[track_id, json.dumps(payload)] for track_id, payload in zip(track_ids, payloads)])
+
+    connection = sqlite3.connect(db_path)
+    json_bytes = connection.execute(f"SELECT sum(length(data)) FROM {JSON_TABLE}").fetchone()[0]
+    blob_bytes = connection.execute(
+        f"SELECT sum(length(segments) + length(beats) + length(bars) + length(tatums) + length(sections)) FROM {AUDIO_ANALYSIS_TABLE}"
+    ).fetchone()[0]
+
+    json_samples, blob_samples = [], []
+    for _ in range(repeat):
+        seconds, expected = common.timed(json_features, connection, track_ids)
+        json_samples.append(seconds)
+        seconds, (features, status) = common.timed(api.extract_features, track_ids)
+        blob_samples.append(seconds)
+        assert status == 200 and features['track_ids'] == expected['track_ids']
+        for name in ('mean_pitches', 'mean_timbre', 'key_histogram', 'tempo_stability'):
+            assert np.allclose(features[name], np.array(expected[name]), rtol=1e-3, atol=1e-3), name
+
+    connection.close()
+    sqlite_api.disconnect()
+    return [
+        common.summarize('audio_analysis_json', json_samples, items=tracks, bytes_per_track=json_bytes / tracks),
+        common.summarize('audio_analysis_blob', blob_samples, items=tracks, bytes_per_track=blob_bytes / tracks),
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark packed audio analysis against JSON storage.')
+    parser.add_argument('--tracks', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.tracks, args.repeat, workdir)
+
+    common.write_results('audio_analysis', results, args.output)
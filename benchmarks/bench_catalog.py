@@ -0,0 +1,113 @@
+"""
+Benchmarks the normalized catalog against track JSON documents: loading batches of track objects,
+looking up the tracks of an artist and aggregating tracks per artist, with json_each over the documents
+and with indexed joins over the catalog tables.
+
+Usage:
+    python benchmarks/bench_catalog.py --tracks 50000 --lookups 200 --output catalog.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import common
+from app.api.sqlite_api import SQLiteAPI
+from app.api.catalog_api import SpotifyCatalogAPI
+
+# Track objects carry the markets they are available in, most of the size of a real document
+MARKETS = [f'M{n}' for n in range(180)]
+
+JSON_TOP_ARTISTS = (
+    "SELECT json_extract(a.value, '$.id'), MAX(json_extract(a.value, '$.name')), COUNT(*), AVG(json_extract(t.data, '$.popularity')) "
+    "FROM spotify_tracks t, json_each(t.data, '$.artists') a WHERE t.removed_at IS NULL GROUP BY json_extract(a.value, '$.id')"
+)
+CATALOG_TOP_ARTISTS = (
+    "SELECT ta.artist_id, MAX(a.name), COUNT(*), AVG(t.popularity) FROM track_artists ta "
+    "JOIN tracks t ON t.id = ta.track_id LEFT JOIN artists a ON a.id = ta.artist_id WHERE t.removed_at IS NULL GROUP BY ta.artist_id"
+)
+JSON_ARTIST_TRACKS = (
+    "SELECT t.id, json_extract(t.data, '$.name') FROM spotify_tracks t, json_each(t.data, '$.artists') a "
+    "WHERE json_extract(a.value, '$.id') = ?"
+)
+CATALOG_ARTIST_TRACKS = "SELECT t.id, t.name FROM track_artists ta JOIN tracks t ON t.id = ta.track_id WHERE ta.artist_id = ?"
+
+
+def make_tracks(count, artists=2000, albums=5000, seed=0):
+    rng = random.Random(seed)
+    tracks = []
+    for n in range(count):
+        track_artists = rng.sample(range(artists), rng.choice((1, 1, 1, 2, 3)))
+        album = rng.randrange(albums)
+        tracks.append({
+            'id': f'track{n}', 'name': f'Track {n}', 'popularity': rng.randrange(100), 'duration_ms': rng.randrange(60_000, 400_000),
+            'explicit': rng.random() < 0.2, 'track_number': rng.randrange(1, 15), 'disc_number': 1,
+            'external_ids': {'isrc': f'ISRC{n:08d}'}, 'uri': f'spotify:track:track{n}', 'available_markets': MARKETS,
+            'album': {'id': f'album{album}', 'name': f'Album {album}', 'album_type': 'album', 'release_date': f'{2000 + album % 25}-01-01',
+                      'total_tracks': 12, 'uri': f'spotify:album:album{album}', 'available_markets': MARKETS},
+            'artists': [{'id': f'artist{a}', 'name': f'Artist {a}', 'uri': f'spotify:artist:artist{a}'} for a in track_artists],
+        })
+    return tracks
+
+
+def run(tracks, lookups, batch_size, workdir):
+    documents = make_tracks(tracks)
+    db_path = os.path.join(workdir, 'catalog.db')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    api.connect(db_path)
+    api.create_table('spotify_tracks', ['id TEXT PRIMARY KEY', 'data TEXT', 'synced_at REAL', 'removed_at REAL'])
+    catalog = SpotifyCatalogAPI(api)
+    catalog.create_tables()
+
+    json_loads, catalog_loads = [], []
+    for i in range(0, tracks, batch_size):
+        batch = documents[i:i + batch_size]
+        seconds, (_, status) = common.timed(
+            api.upsert_rows, 'spotify_tracks', [[track['id'], json.dumps(track), time.time(), None] for track in batch]
+        )
+        assert status == 200, status
+        json_loads.append(seconds)
+        seconds, (_, status) = common.timed(catalog.load_tracks, batch)
+        assert status == 200, status
+        catalog_loads.append(seconds)
+
+    db = sqlite3.connect(db_path)
+    results = [
+        common.summarize('catalog_load_json', json_loads, items=batch_size),
+        common.summarize('catalog_load_normalized', catalog_loads, items=batch_size),
+    ]
+    for name, query in (('json', JSON_TOP_ARTISTS), ('normalized', CATALOG_TOP_ARTISTS)):
+        samples = []
+        for _ in range(3):
+            seconds, rows = common.timed(lambda: db.execute(query).fetchall())
+            samples.append(seconds)
+        results.append(common.summarize(f'catalog_top_artists_{name}', samples, groups=len(rows)))
+
+    artists = [f'artist{n}' for n in random.Random(1).sample(range(2000), lookups)]
+    for name, query in (('json', JSON_ARTIST_TRACKS), ('normalized', CATALOG_ARTIST_TRACKS)):
+        samples = []
+        for artist_id in artists:
+            seconds, _ = common.timed(lambda: db.execute(query, (artist_id,)).fetchall())
+            samples.append(seconds)
+        results.append(common.summarize(f'catalog_artist_tracks_{name}', samples, tracks=tracks))
+    db.close()
+    api.disconnect()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the normalized catalog against track JSON documents.')
+    parser.add_argument('--tracks', type=int, default=50_000)
+    parser.add_argument('--lookups', type=int, default=200, help='Artists whose tracks are looked up.')
+    parser.add_argument('--batch_size', type=int, default=1000, help='Track objects loaded per batch.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.tracks, args.lookups, args.batch_size, workdir)
+
+    common.write_results('catalog', results, args.output)
@@ -0,0 +1,122 @@
+"""
+Benchmarks the external API clients against local stub servers, so throughput can be measured
+without network variance or hitting the real Spotify and Genius rate limits.
+
+Usage:
+    python benchmarks/bench_clients.py --items 1000 --latency 0.02 --rate_limit 0.05 --output clients.json
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import common
+from stub_servers import SpotifyStub, GeniusStub
+from src.app.api.spotify_api import SpotifyAPI
+from src.app.api.genius_api import GeniusAPI
+from src.app.utils.search_cache import SearchCache
+from src.app.utils.cpu_pool import CPUPool
+
+RETRIES = 8
+DELAY = 0.01
+
+
+def make_spotify(url):
+    api = SpotifyAPI(client_id=None, client_secret=None, access_token='benchmark', token_expires=time.time() + 86400)
+    api._BASE_URL = url
+    return api
+
+
+def make_genius(url):
+    api = GeniusAPI(access_token='benchmark', redirect_url=None)
+    api._BASE_URL = url
+    return api
+
+
+def spotify_scenarios(api, items):
+    ids = [f'{n:022d}' for n in range(items)]
+    songs = [f'Song {n}' for n in range(items)]
+    artists = [f'Artist {n % 50}' for n in range(items)]
+    return {
+        'spotify_tracks': lambda: api.get_tracks_data(ids, RETRIES, DELAY),
+        'spotify_artists': lambda: api.get_artists_data(ids, RETRIES, DELAY),
+        'spotify_albums': lambda: api.get_albums_data(ids, RETRIES, DELAY),
+        'spotify_audio_features': lambda: api.get_tracks_audio_features(ids, RETRIES, DELAY),
+        'spotify_search': lambda: api.get_matching_tracks_uris(songs, artists, 1, RETRIES, DELAY),
+    }
+
+
+def run_async(name, stub, api, factory, items, repeat):
+    samples = []
+    requests_before, limited_before = stub.requests, stub.rate_limited
+    failures = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, failures = asyncio.run(factory())
+        samples.append(time.perf_counter() - start)
+    return common.summarize(
+        name, samples, items=items,
+        requests=stub.requests - requests_before,
+        rate_limited=stub.rate_limited - limited_before,
+        failures=len(failures),
+    )
+
+
+def run(items, repeat, latency, rate_limit, payload_size, lyrics_pages):
+    results = []
+    options = dict(latency=latency, rate_limit=rate_limit, payload_size=payload_size)
+
+    with SpotifyStub(**options) as stub:
+        api = make_spotify(stub.url)
+        for name, factory in spotify_scenarios(api, items).items():
+            results.append(run_async(name, stub, api, factory, items, repeat))
+
+    with GeniusStub(**options) as stub:
+        api = make_genius(stub.url)
+        songs = [f'Song {n}' for n in range(items)]
+        artists = [f'Artist {n % 50}' for n in range(items)]
+        results.append(run_async(
+            'genius_get_songs_data', stub, api, lambda: api.get_songs_data(songs, artists, RETRIES, DELAY), items, repeat))
+
+        # Playlists repeat songs, here each distinct song appears four times with different formatting
+        distinct = max(1, items // 4)
+        songs = [f'Song {n % distinct}' + (' (Remastered)' if n % 2 else '') for n in range(items)]
+        artists = [f'Artist {n % distinct}' + (' feat. Guest' if n % 3 else '') for n in range(items)]
+        results.append(run_async(
+            'genius_resolve_songs', stub, api, lambda: api.resolve_songs(songs, artists, RETRIES, DELAY), items, repeat))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = SearchCache(os.path.join(cache_dir, 'search_cache.db'), namespace='genius')
+            asyncio.run(api.resolve_songs(songs, artists, RETRIES, DELAY, cache=cache))
+            results.append(run_async(
+                'genius_resolve_songs_cached', stub, api, lambda: api.resolve_songs(songs, artists, RETRIES, DELAY, cache=cache), items, repeat))
+            cache.close()
+
+        # scrape_lyrics is blocking and fetches one page per call, so it is measured per page
+        stub.rate_limit = 0.0
+        urls = [f'{stub.url}/lyrics/{n}' for n in range(lyrics_pages)]
+        samples = [common.timed(GeniusAPI.scrape_lyrics, url)[0] for _ in range(repeat) for url in urls]
+        results.append(common.summarize('genius_scrape_lyrics', samples, items=1))
+        # Fetched concurrently, parsed in worker processes
+        pool = CPUPool()
+        results.append(run_async(
+            'genius_scrape_lyrics_batch', stub, api, lambda: api.scrape_lyrics_batch(urls, RETRIES, DELAY, pool=pool), len(urls), repeat))
+        pool.shutdown()
+
+    for result in results:
+        result.update(latency=latency, rate_limit=rate_limit, payload_size=payload_size)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Spotify and Genius clients against local stub servers.')
+    parser.add_argument('--items', type=int, default=1000, help='Ids or queries per scenario.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds of latency added by the stubs to each request.')
+    parser.add_argument('--rate_limit', type=float, default=0.0, help='Fraction of requests answered with 429.')
+    parser.add_argument('--payload_size', type=int, default=0, help='Bytes of padding per returned item.')
+    parser.add_argument('--lyrics_pages', type=int, default=50)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    common.write_results('clients', run(args.items, args.repeat, args.latency, args.rate_limit, args.payload_size, args.lyrics_pages), args.output)
@@ -0,0 +1,63 @@
+"""
+Benchmarks the CPU stage of the Genius pipeline, lyrics HTML parsing and song querifying,
+inline on the event loop and in CPUPool worker processes of increasing size.
+
+Usage:
+    python benchmarks/bench_cpu_pool.py --pages 2000 --pairs 100000 --output cpu_pool.json
+"""
+
+import argparse
+import asyncio
+import os
+import common
+from src.app.api.genius_api import parse_lyrics, _map
+from src.app.utils.cpu_pool import CPUPool
+from src.utils import song_querifier
+
+
+def make_pages(count, lines=40):
+    return [
+        '<html><head><title>Lyrics</title></head><body><div class="Header">header</div>'
+        f'<div class="Lyrics__Container-sc-1ynbvzw-1">{"<br/>".join(f"[Verse {n}] line {n} of song {page}" for n in range(lines))}</div>'
+        '</body></html>'
+        for page in range(count)
+    ]
+
+
+def make_pairs(count):
+    return [(f'Song {n} (Remastered {n % 30}) - Live', f'Artist {n % 500} feat. Guest & Friends') for n in range(count)]
+
+
+def worker_counts():
+    counts, workers = [], 1
+    while workers < (os.cpu_count() or 1):
+        counts.append(workers)
+        workers *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def run(pages, pairs, repeat):
+    workloads = {'parse_lyrics': (parse_lyrics, make_pages(pages)), 'querify': (song_querifier.querify_pair, make_pairs(pairs))}
+    results = []
+    for name, (function, items) in workloads.items():
+        samples = [common.timed(asyncio.run, _map(None, function, items))[0] for _ in range(repeat)]
+        results.append(common.summarize(f'cpu_{name}_inline', samples, items=len(items), workers=0))
+        for workers in worker_counts():
+            pool = CPUPool(max_workers=workers)
+            # Start the workers outside of the measurement
+            asyncio.run(pool.map(function, items[:workers]))
+            samples = [common.timed(asyncio.run, pool.map(function, items))[0] for _ in range(repeat)]
+            pool.shutdown()
+            results.append(common.summarize(f'cpu_{name}_pool_{workers}', samples, items=len(items), workers=workers))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark lyrics parsing and querifying inline and in worker processes.')
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--pairs', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    common.write_results('cpu_pool', run(args.pages, args.pairs, args.repeat), args.output)
@@ -0,0 +1,92 @@
+"""
+Benchmarks table exports to Parquet and Arrow IPC against the JSON rows returned by get_table,
+both the time to write the export and the time to read it back.
+
+Usage:
+    python benchmarks/bench_export.py --rows 100000 --output export.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import common
+from app.api.sqlite_api import SQLiteAPI
+from app.api.export_api import ExportAPI
+from bench_sqlite import COLUMNS, make_rows
+
+
+def run(rows, repeat, workdir):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    db_path = os.path.join(workdir, 'export.db')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    api.connect(db_path)
+    api.create_table('songs', COLUMNS, force_create=True)
+    api.insert_rows('songs', make_rows(rows))
+    export_api = ExportAPI(api, export_dir=workdir)
+
+    written = {'json': [], 'parquet': [], 'arrow': []}
+    read = {'json': [], 'parquet': [], 'arrow': []}
+    sizes = {}
+    for _ in range(repeat):
+        json_path = os.path.join(workdir, 'songs.json')
+
+        def write_json():
+            table, _ = api.get_table('songs')
+            with open(json_path, 'w') as f:
+                json.dump(table, f)
+
+        seconds, _ = common.timed(write_json)
+        written['json'].append(seconds)
+        sizes['json'] = os.path.getsize(json_path)
+
+        def read_json():
+            with open(json_path) as f:
+                return json.load(f)
+
+        seconds, _ = common.timed(read_json)
+        read['json'].append(seconds)
+
+        for export_format in ('parquet', 'arrow'):
+            path = os.path.join(workdir, f'songs.{export_format}')
+            seconds, (result, status) = common.timed(export_api.export, 'songs', export_format, path)
+            assert status == 200, result
+            written[export_format].append(seconds)
+            sizes[export_format] = result['bytes']
+
+        seconds, table = common.timed(pq.read_table, os.path.join(workdir, 'songs.parquet'))
+        assert table.num_rows == rows
+        read['parquet'].append(seconds)
+
+        # Memory-mapped, the record batches point straight into the file
+        def read_arrow():
+            with pa.memory_map(os.path.join(workdir, 'songs.arrow')) as source:
+                return pa.ipc.open_file(source).read_all()
+
+        seconds, table = common.timed(read_arrow)
+        assert table.num_rows == rows
+        read['arrow'].append(seconds)
+
+    api.disconnect()
+    results = []
+    for export_format in ('json', 'parquet', 'arrow'):
+        results.append(common.summarize(f'export_write_{export_format}', written[export_format], items=rows, file_bytes=sizes[export_format]))
+        results.append(common.summarize(f'export_read_{export_format}', read[export_format], items=rows))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark Parquet and Arrow exports against JSON.')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.rows, args.repeat, workdir)
+
+    common.write_results('export', results, args.output)
@@ -0,0 +1,86 @@
+"""
+Benchmarks many concurrent writers inserting small batches of rows,
+with one transaction per request against the group commits of the ingest buffer.
+
+Usage:
+    python benchmarks/bench_ingest.py --writers 16 --requests 100 --rows_per_request 10 --output ingest.json
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import common
+from app.api.sqlite_api import SQLiteAPI
+from app.api.ingest_api import IngestAPI
+from bench_sqlite import COLUMNS
+
+
+def _run_writers(insert, writers, requests, rows_per_request):
+    latencies = [[] for _ in range(writers)]
+
+    def writer(n):
+        for i in range(requests):
+            first = (n * requests + i) * rows_per_request
+            rows = [[first + j, f'Song {first + j}', 'Artist', j % 100, 120.0] for j in range(rows_per_request)]
+            seconds, (_, status) = common.timed(insert, 'songs', rows)
+            assert status == 201, status
+            latencies[n].append(seconds)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, [seconds for samples in latencies for seconds in samples]
+
+
+def run(writers, requests, rows_per_request, workdir):
+    results = []
+    total_rows = writers * requests * rows_per_request
+    for mode in ('per_request', 'group_commit'):
+        db_path = os.path.join(workdir, f'ingest_{mode}.db')
+        sqlite3.connect(db_path).close()
+        api = SQLiteAPI()
+        api.connect(db_path)
+        api.create_table('songs', COLUMNS, force_create=True)
+
+        if mode == 'per_request':
+            # The shared connection as RowsResource.post used it, one commit per request
+            lock = threading.Lock()
+
+            def insert(table_name, rows):
+                with lock:
+                    return api.insert_rows(table_name, rows)
+            wall, latencies = _run_writers(insert, writers, requests, rows_per_request)
+        else:
+            ingest = IngestAPI(api)
+            wall, latencies = _run_writers(ingest.insert_rows, writers, requests, rows_per_request)
+            ingest.shutdown()
+
+        count = sqlite3.connect(db_path).execute('SELECT COUNT(*) FROM songs').fetchone()[0]
+        assert count == total_rows, count
+        api.disconnect()
+        result = common.summarize(f'ingest_{mode}', latencies, writers=writers, rows_per_request=rows_per_request)
+        # Throughput over the whole run, the samples are per-request latencies taken concurrently
+        result['rows_per_second'] = total_rows / wall
+        result['wall_seconds'] = wall
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark concurrent small inserts with and without group commits.')
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=100, help='Insert requests made by each writer.')
+    parser.add_argument('--rows_per_request', type=int, default=10)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.writers, args.requests, args.rows_per_request, workdir)
+
+    common.write_results('ingest', results, args.output)
@@ -0,0 +1,90 @@
+"""
+Benchmarks point reads while other clients send expensive reads of the same table, a filter on a column
+without an index and a grouping over every row, with and without query budgets.
+All reads share one connection, one thread at a time, as the routes do without the read replica.
+
+Usage:
+    python benchmarks/bench_query_guard.py --rows 200000 --seconds 5 --output query_guard.json
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import common
+from bench_replica import _worker
+from bench_sqlite import COLUMNS, make_rows
+from app.api.sqlite_api import SQLiteAPI
+from src.app.utils import query_guard
+from src.app.utils.query_guard import QueryBudget
+
+GROUP_SPEC = {
+    'columns': ['name'],
+    'aggregates': [{'function': 'avg', 'column': 'tempo', 'alias': 'avg_tempo'}],
+    'group_by': ['name'],
+    'order_by': [{'column': 'avg_tempo', 'direction': 'desc'}],
+    'limit': 10,
+}
+
+
+def run(rows, seconds, readers, workdir, budget=QueryBudget(max_rows=10_000, max_cost=50_000, timeout=0.05)):
+    db_path = os.path.join(workdir, 'query_guard.db')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    api.connect(db_path)
+    api.create_table('songs', COLUMNS)
+    _, status = api.insert_rows('songs', make_rows(rows))
+    assert status == 201, status
+    shared = threading.Lock()
+
+    results = []
+    for scenario, scenario_budget in (('unguarded', None), ('guarded', budget)):
+        statuses = {}
+
+        def guarded(read):
+            def operation():
+                with shared, query_guard.limits(scenario_budget):
+                    _, status = read()
+                statuses[status] = statuses.get(status, 0) + 1
+            return operation
+
+        point_read = guarded(lambda: api.get_row('songs', str(time.perf_counter_ns() % rows)))
+        unindexed = guarded(lambda: api.get_rows('songs', ["tempo > 100"]))
+        grouping = guarded(lambda: api.query_table('songs', GROUP_SPEC))
+
+        samples = {'point_read': [], 'expensive': []}
+        stop = threading.Event()
+        threads = [threading.Thread(target=_worker, args=(samples['point_read'], stop, point_read, 0.001)) for _ in range(readers)]
+        threads += [threading.Thread(target=_worker, args=(samples['expensive'], stop, read, 0.05)) for read in (unindexed, grouping)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        for operation, operation_samples in samples.items():
+            results.append(common.summarize(
+                f'query_guard_{scenario}_{operation}', operation_samples,
+                p95_ms=common.percentile_ms(operation_samples, 95), operations=len(operation_samples), rows=rows,
+                rejected=statuses.get(422, 0), timed_out=statuses.get(503, 0),
+            ))
+
+    api.disconnect()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark point reads next to expensive reads with and without query budgets.')
+    parser.add_argument('--rows', type=int, default=200_000, help='Rows in the table.')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Seconds each scenario runs.')
+    parser.add_argument('--readers', type=int, default=4, help='Threads running point reads.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.rows, args.seconds, args.readers, workdir)
+
+    common.write_results('query_guard', results, args.output)
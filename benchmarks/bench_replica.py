@@ -0,0 +1,108 @@
+"""
+Benchmarks a mixed workload of small writes, analytical scans and point reads on one database,
+with reads on the shared connection, on read-only memory-mapped connections to the database file,
+and on read-only memory-mapped connections to a periodic snapshot.
+The shared connection serves one thread at a time, as its cursor is shared, so in the first scenario
+every operation takes a lock around it.
+
+Usage:
+    python benchmarks/bench_replica.py --rows 200000 --seconds 5 --output replica.json
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+import common
+from bench_sqlite import COLUMNS, make_rows
+from app.api.sqlite_api import SQLiteAPI
+from app.api.replica_api import ReadReplicaAPI
+
+SCAN_SPEC = {
+    'columns': ['artist'],
+    'aggregates': [{'function': 'avg', 'column': 'tempo', 'alias': 'avg_tempo'}, {'function': 'count'}],
+    'group_by': ['artist'],
+    'order_by': [{'column': 'avg_tempo', 'direction': 'desc'}],
+    'limit': 10,
+}
+
+
+def _worker(samples, stop, operation, pause):
+    while not stop.is_set():
+        start = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - start)
+        time.sleep(pause)
+
+
+def run(rows, seconds, scanners, readers, workdir, snapshot_interval=1.0):
+    results = []
+    for mode in ('off', 'direct', 'snapshot'):
+        db_path = os.path.join(workdir, f'replica_{mode}.db')
+        sqlite3.connect(db_path).close()
+        api = SQLiteAPI()
+        api.connect(db_path)
+        api.create_table('songs', COLUMNS)
+        _, status = api.insert_rows('songs', make_rows(rows))
+        assert status == 201, status
+
+        replica = ReadReplicaAPI(api, mode=mode, max_readers=scanners + readers, snapshot_interval=snapshot_interval)
+        replica.start()
+        shared = threading.Lock() if mode == 'off' else None
+        guard = (lambda: shared) if shared is not None else nullcontext
+        next_id = [rows]
+
+        def write():
+            with guard():
+                next_id[0] += 1
+                _, status = api.insert_rows('songs', [[next_id[0], f'Song {next_id[0]}', 'Artist 0', 50, 120.0]])
+            assert status == 201, status
+
+        def scan():
+            with guard():
+                _, status = replica.query_table('songs', SCAN_SPEC)
+            assert status == 200, status
+
+        def point_read():
+            with guard():
+                _, status = replica.get_row('songs', str(int(time.perf_counter_ns()) % rows))
+            assert status == 200, status
+
+        samples = {'write': [], 'scan': [], 'point_read': []}
+        stop = threading.Event()
+        threads = [threading.Thread(target=_worker, args=(samples['write'], stop, write, 0.002))]
+        threads += [threading.Thread(target=_worker, args=(samples['scan'], stop, scan, 0.0)) for _ in range(scanners)]
+        threads += [threading.Thread(target=_worker, args=(samples['point_read'], stop, point_read, 0.001)) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        replica.shutdown()
+        api.disconnect()
+        for operation, operation_samples in samples.items():
+            results.append(common.summarize(
+                f'replica_{mode}_{operation}', operation_samples,
+                p95_ms=common.percentile_ms(operation_samples, 95), operations=len(operation_samples), rows=rows,
+            ))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark a mixed read/write workload with and without the read replica.')
+    parser.add_argument('--rows', type=int, default=200_000, help='Rows in the scanned table.')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Seconds each scenario runs.')
+    parser.add_argument('--scanners', type=int, default=2, help='Threads running analytical scans.')
+    parser.add_argument('--readers', type=int, default=4, help='Threads running point reads.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.rows, args.seconds, args.scanners, args.readers, workdir)
+
+    common.write_results('replica', results, args.output)
@@ -0,0 +1,127 @@
+"""
+Benchmarks the latency of dashboard requests while a heavy scheduled job loads tracks into the catalog,
+with the job working straight through and with the job pausing at checkpoints while requests are served.
+The API is served from a thread of this process, as in production, and requested from a client process
+in bursts, as a page load does.
+
+Usage:
+    python benchmarks/bench_scheduler.py --tracks 20000 --chunk_size 100 --requests 300 --burst 10 --output scheduler.json
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import common
+from bench_catalog import make_tracks
+from flask import Flask
+from werkzeug.serving import make_server
+from app.api.sqlite_api import SQLiteAPI
+from app.api.catalog_api import SpotifyCatalogAPI
+from app.api.scheduler_api import SchedulerAPI
+from src.app.utils import budgets
+
+
+def _client(url, requests, burst, think, results):
+    # Runs in its own process, so the client does not compete with the server for the GIL
+    import requests as http
+    session = http.Session()
+    samples = []
+    for n in range(requests):
+        start = time.perf_counter()
+        response = session.get(f'{url}/tracks/track{n % 1000}')
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        if n % burst == burst - 1:
+            time.sleep(think)
+    results.put(samples)
+
+
+def _make_app(api):
+    app = Flask(__name__)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    budgets.init_budgets(app, {})
+
+    @app.route('/tracks/<track_id>')
+    def track(track_id):
+        row, status = api.get_row('tracks', track_id)
+        return {'track': row}, status
+
+    return app
+
+
+def _load_job(documents, chunk_size, yielding):
+    def job(context):
+        catalog = SpotifyCatalogAPI(context.connection)
+        for i in range(0, len(documents), chunk_size):
+            if yielding:
+                context.checkpoint()
+            _, status = catalog.load_tracks(documents[i:i + chunk_size])
+            assert status == 200, status
+        return {'tracks': len(documents)}
+    return job
+
+
+def run(tracks, chunk_size, requests, burst, think, workdir):
+    documents = make_tracks(tracks)
+    db_path = os.path.join(workdir, 'scheduler.db')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    api.connect(db_path)
+    SpotifyCatalogAPI(api).create_tables()
+    _, status = SpotifyCatalogAPI(api).load_tracks(documents[:1000])
+    assert status == 200, status
+
+    server = make_server('127.0.0.1', 0, _make_app(api), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+
+    results = []
+    for scenario in ('idle', 'background', 'background_yielding'):
+        scheduler = SchedulerAPI(api, max_concurrent=1, max_pause=5.0)
+        if scenario != 'idle':
+            scheduler.register('load_tracks', _load_job(documents, chunk_size, scenario == 'background_yielding'))
+        queue = multiprocessing.Queue()
+        client = multiprocessing.Process(target=_client, args=(url, requests, burst, think, queue))
+        client.start()
+        job_start = time.perf_counter()
+        if scenario != 'idle':
+            _, status = scheduler.trigger('load_tracks')
+            assert status == 202, status
+        samples = queue.get()
+        client.join()
+        if scenario != 'idle':
+            while scheduler.get_runs('load_tracks')[0][0]['status'] in ('queued', 'running'):
+                time.sleep(0.01)
+            last_run = scheduler.get_runs('load_tracks')[0][0]
+            assert last_run['status'] == 'done', last_run
+        job_seconds = time.perf_counter() - job_start if scenario != 'idle' else None
+        scheduler.shutdown()
+        results.append(common.summarize(
+            f'scheduler_dashboard_{scenario}', samples,
+            p95_ms=common.percentile_ms(samples, 95), job_seconds=job_seconds, tracks=tracks, chunk_size=chunk_size,
+        ))
+
+    server.shutdown()
+    api.disconnect()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark dashboard latency while a scheduled job runs.')
+    parser.add_argument('--tracks', type=int, default=20_000, help='Tracks loaded by the background job.')
+    parser.add_argument('--chunk_size', type=int, default=100, help='Tracks loaded per step of the job.')
+    parser.add_argument('--requests', type=int, default=300, help='Dashboard requests per scenario.')
+    parser.add_argument('--burst', type=int, default=10, help='Dashboard requests sent back to back, as for one page.')
+    parser.add_argument('--think', type=float, default=0.2, help='Seconds between bursts.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.tracks, args.chunk_size, args.requests, args.burst, args.think, workdir)
+
+    common.write_results('scheduler', results, args.output)
@@ -0,0 +1,71 @@
+"""
+Benchmarks encoding and decoding get_tables payloads with each installed serializer backend:
+the standard library json, orjson and msgspec for JSON, and msgpack and msgspec for MessagePack.
+
+Usage:
+    python benchmarks/bench_serializers.py --tables 20 --rows_per_table 10000 --output serializers.json
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import common
+from app.api.sqlite_api import SQLiteAPI
+from app.utils import serializers
+from bench_sqlite import COLUMNS, make_rows
+
+
+def _payloads(tables, rows_per_table, workdir):
+    db_path = os.path.join(workdir, 'serializers.db')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    api.connect(db_path)
+    for n in range(tables):
+        api.create_table(f'table_{n}', COLUMNS, force_create=True)
+        api.insert_rows(f'table_{n}', make_rows(rows_per_table, offset=n))
+    payloads = {}
+    for orient in ('rows', 'columns'):
+        payload, status = api.get_tables(orient)
+        assert status == 200, status
+        payloads[orient] = payload
+    api.disconnect()
+    return payloads
+
+
+def run(tables, rows_per_table, repeat, workdir):
+    payloads = _payloads(tables, rows_per_table, workdir)
+    formats = {
+        'json': (serializers.JSON_ENCODERS, serializers.JSON_DECODERS),
+        'msgpack': (serializers.MSGPACK_ENCODERS, serializers.MSGPACK_DECODERS),
+    }
+    rows = tables * rows_per_table
+    results = []
+    for orient, payload in payloads.items():
+        for media_type, (encoders, decoders) in formats.items():
+            for backend, encode in encoders.items():
+                encodes, decodes = [], []
+                for _ in range(repeat):
+                    seconds, body = common.timed(encode, payload)
+                    encodes.append(seconds)
+                    seconds, decoded = common.timed(decoders[backend], body)
+                    decodes.append(seconds)
+                assert len(decoded['tables']) == tables
+                name = f'serialize_{orient}_{media_type}_{backend}'
+                results.append(common.summarize(f'{name}_encode', encodes, items=rows, response_bytes=len(body)))
+                results.append(common.summarize(f'{name}_decode', decodes, items=rows, response_bytes=len(body)))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark JSON and MessagePack serializers on get_tables payloads.')
+    parser.add_argument('--tables', type=int, default=20)
+    parser.add_argument('--rows_per_table', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.tables, args.rows_per_table, args.repeat, workdir)
+
+    common.write_results('serializers', results, args.output)
@@ -0,0 +1,73 @@
+"""
+Benchmarks similarity query latency of the exact and approximate indexes at increasing library sizes.
+
+Usage:
+    python benchmarks/bench_similarity.py --sizes 10000 100000 1000000 --output similarity.json
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import common
+from app.api.sqlite_api import SQLiteAPI
+from app.api.similarity_api import SimilarityAPI, FEATURES
+
+
+def synthetic_features(n, rng):
+    values = rng.random((n, len(FEATURES)), dtype=np.float32)
+    values[:, FEATURES.index('tempo')] = 60 + 140 * values[:, FEATURES.index('tempo')]
+    values[:, FEATURES.index('loudness')] = -40 * values[:, FEATURES.index('loudness')]
+    return [dict(zip(FEATURES, row.tolist()), id=f'track{i}') for i, row in enumerate(values)]
+
+
+def run(size, queries, k, n_probe, workdir):
+    rng = np.random.default_rng(size)
+    db_path = os.path.join(workdir, f'similarity_{size}.db')
+    sqlite3.connect(db_path).close()
+    sqlite_api = SQLiteAPI()
+    sqlite_api.connect(db_path)
+
+    api = SimilarityAPI(sqlite_api, index_dir=os.path.join(workdir, f'index_{size}'), approximate_threshold=0, n_probe=n_probe)
+    api.build()
+
+    features = synthetic_features(size, rng)
+    start = time.perf_counter()
+    api.add(features)
+    build_seconds = time.perf_counter() - start
+
+    query_ids = [features[i]['id'] for i in rng.choice(size, size=queries, replace=False)]
+    result = {'scenario': f'similarity_{size}', 'size': size, 'k': k, 'n_probe': n_probe, 'build_seconds': build_seconds}
+    answers = {}
+    for mode, exact in (('exact', True), ('approximate', False)):
+        samples = []
+        answers[mode] = []
+        for track_id in query_ids:
+            start = time.perf_counter()
+            matches, _ = api.query(track_id, k=k, exact=exact)
+            samples.append(time.perf_counter() - start)
+            answers[mode].append({match['id'] for match in matches})
+        result[f'{mode}_p50_ms'] = common.percentile_ms(samples, 50)
+        result[f'{mode}_p99_ms'] = common.percentile_ms(samples, 99)
+
+    recall = [len(a & e) / k for a, e in zip(answers['approximate'], answers['exact'])]
+    result['approximate_recall'] = float(np.mean(recall))
+    sqlite_api.disconnect()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark similarity search latency.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n_probe', type=int, default=8)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run(size, args.queries, args.k, args.n_probe, workdir) for size in args.sizes]
+
+    common.write_results('similarity', results, args.output)
@@ -0,0 +1,165 @@
+"""
+Benchmarks SQLiteAPI bulk writes and reads, the result formats of reads, and the /tables route of the Flask app.
+
+Usage:
+    python benchmarks/bench_sqlite.py --rows 100000 --tables 20 --output sqlite.json
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import common
+from app.api.sqlite_api import SQLiteAPI
+
+COLUMNS = ['id INTEGER PRIMARY KEY', 'name TEXT', 'artist TEXT', 'popularity INTEGER', 'tempo REAL']
+
+
+def make_rows(count, offset=0):
+    return [[n, f'Song {n}', f'Artist {n % 500}', (n + offset) % 100, 60.0 + (n + offset) % 140] for n in range(count)]
+
+
+def bench_sqlite_api(rows, repeat, workdir):
+    results = []
+    inserted, upserted, updated, read = [], [], [], []
+    for run in range(repeat):
+        db_path = os.path.join(workdir, f'bench_{run}.db')
+        sqlite3.connect(db_path).close()
+        api = SQLiteAPI()
+        api.connect(db_path)
+        api.create_table('songs', COLUMNS)
+
+        seconds, (_, status) = common.timed(api.insert_rows, 'songs', make_rows(rows))
+        assert status == 201, status
+        inserted.append(seconds)
+
+        seconds, (_, status) = common.timed(api.upsert_rows, 'songs', make_rows(rows, offset=1))
+        assert status == 200, status
+        upserted.append(seconds)
+
+        seconds, (_, status) = common.timed(api.update_rows, 'songs', make_rows(rows, offset=2))
+        assert status == 200, status
+        updated.append(seconds)
+
+        seconds, (_, status) = common.timed(api.get_table, 'songs')
+        assert status == 200, status
+        read.append(seconds)
+
+        api.disconnect()
+
+    results.append(common.summarize('sqlite_insert_rows', inserted, items=rows))
+    results.append(common.summarize('sqlite_upsert_rows', upserted, items=rows))
+    results.append(common.summarize('sqlite_update_rows', updated, items=rows))
+    results.append(common.summarize('sqlite_get_table', read, items=rows))
+    return results
+
+
+def bench_read_formats(rows, repeat, workdir):
+    """Reads a table as a list of dicts and as per-column arrays, then builds a DataFrame and JSON from each"""
+    import json
+    import tracemalloc
+    import pandas as pd
+
+    db_path = os.path.join(workdir, 'read_formats.db')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    api.connect(db_path)
+    api.create_table('songs', COLUMNS, force_create=True)
+    for start in range(0, rows, 100_000):
+        chunk = make_rows(min(100_000, rows - start))
+        for row in chunk:
+            row[0] += start
+        api.insert_rows('songs', chunk)
+
+    build_frame = {
+        'records': lambda result: pd.DataFrame(result),
+        'columns': lambda result: pd.DataFrame(dict(zip(result['columns'], result['data'])), columns=result['columns']),
+    }
+    results = []
+    for orient, to_frame in build_frame.items():
+        reads, frames, dumps = [], [], []
+        for _ in range(repeat):
+            seconds, (result, status) = common.timed(api.get_table, 'songs', orient)
+            assert status == 200, status
+            reads.append(seconds)
+            seconds, frame = common.timed(to_frame, result)
+            assert len(frame) == rows
+            frames.append(seconds)
+            seconds, body = common.timed(json.dumps, result)
+            dumps.append(seconds)
+            del result, frame
+
+        tracemalloc.start()
+        result, _ = api.get_table('songs', orient)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del result
+
+        results.append(common.summarize(f'sqlite_read_{orient}', reads, items=rows, peak_mb=peak_bytes / 2**20))
+        results.append(common.summarize(f'sqlite_read_{orient}_dataframe', frames, items=rows))
+        results.append(common.summarize(f'sqlite_read_{orient}_json', dumps, items=rows, response_bytes=len(body)))
+    api.disconnect()
+    return results
+
+
+def bench_tables_route(tables, rows_per_table, requests, workdir):
+    # The Flask app opens src/database/database relative to the working directory on import
+    previous = os.getcwd()
+    os.chdir(workdir)
+    os.makedirs(os.path.join('src', 'database'), exist_ok=True)
+    sqlite3.connect(os.path.join('src', 'database', 'database')).close()
+    try:
+        from app import main
+        api = main.sqlite_api
+        for n in range(tables):
+            api.create_table(f'table_{n}', COLUMNS, force_create=True)
+            api.insert_rows(f'table_{n}', make_rows(rows_per_table))
+
+        client = main.app.test_client()
+        samples = []
+        for _ in range(requests):
+            seconds, response = common.timed(client.get, '/db/tables')
+            assert response.status_code == 200, response.status_code
+            samples.append(seconds)
+
+        # One table pulled whole, as the dashboard did to aggregate in pandas, versus aggregated on the server
+        spec = {
+            'columns': ['artist'], 'group_by': ['artist'],
+            'aggregates': [{'function': 'avg', 'column': 'tempo'}, {'function': 'count'}],
+        }
+        full, aggregated = [], []
+        for _ in range(requests):
+            seconds, response = common.timed(client.get, '/db/table_0')
+            full.append(seconds)
+            full_bytes = len(response.get_data())
+            seconds, response = common.timed(client.post, '/db/table_0/query', json=spec)
+            assert response.status_code == 200, response.status_code
+            aggregated.append(seconds)
+            aggregated_bytes = len(response.get_data())
+        main.shutdown()
+    finally:
+        os.chdir(previous)
+    return [
+        common.summarize('route_tables', samples, tables=tables, rows_per_table=rows_per_table),
+        common.summarize('route_table_full', full, rows=rows_per_table, response_bytes=full_bytes),
+        common.summarize('route_query_aggregate', aggregated, rows=rows_per_table, response_bytes=aggregated_bytes),
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark SQLiteAPI bulk operations and the /tables route.')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tables', type=int, default=20, help='Tables created for the /tables route benchmark.')
+    parser.add_argument('--rows_per_table', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=50, help='Requests made to the /tables route.')
+    parser.add_argument('--read_rows', type=int, default=1_000_000, help='Rows read as records and as columns.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = bench_sqlite_api(args.rows, args.repeat, workdir)
+        results += bench_tables_route(args.tables, args.rows_per_table, args.requests, workdir)
+        results += bench_read_formats(args.read_rows, args.repeat, workdir)
+
+    common.write_results('sqlite', results, args.output)
@@ -0,0 +1,120 @@
+"""
+Benchmarks cold start of the API: import time of the Flask app measured with `python -X importtime`,
+and the time from launching `src/main.py --api-only` until its health check answers.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --top 15 --output startup.json
+"""
+
+import argparse
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import common
+
+IMPORT_TARGET = 'import app.main'
+
+
+def _environment():
+    env = dict(os.environ)
+    paths = [os.path.join(common.REPO_ROOT, 'src'), common.REPO_ROOT, env.get('PYTHONPATH', '')]
+    env['PYTHONPATH'] = os.pathsep.join(path for path in paths if path)
+    return env
+
+
+def _workdir(root):
+    # The app opens src/database/database and writes logs/ relative to the working directory
+    os.makedirs(os.path.join(root, 'src', 'database'), exist_ok=True)
+    sqlite3.connect(os.path.join(root, 'src', 'database', 'database')).close()
+    return root
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+"""
+Parses the output of -X importtime
+Returns:
+    - The total cumulative import time of top level imports in ms (float)
+    - The modules with their self and cumulative time in ms, slowest first (List[dict])
+"""
+def parse_importtime(stderr):
+    modules = []
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            total_us += int(cumulative_us)
+        modules.append({'module': name.strip(), 'self_ms': int(self_us) / 1000, 'cumulative_ms': int(cumulative_us) / 1000})
+    modules.sort(key=lambda module: module['cumulative_ms'], reverse=True)
+    return total_us / 1000, modules
+
+
+def bench_import(runs, top, workdir):
+    totals = []
+    modules = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_TARGET],
+            cwd=workdir, env=_environment(), capture_output=True, text=True, check=True,
+        )
+        total_ms, modules = parse_importtime(completed.stderr)
+        totals.append(total_ms / 1000)
+    result = common.summarize('startup_import_app', totals)
+    result['slowest_imports'] = modules[:top]
+    return result
+
+
+def bench_ready(runs, timeout, workdir):
+    samples = []
+    for _ in range(runs):
+        port = _free_port()
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(common.REPO_ROOT, 'src', 'main.py'), '--api-only', '--port', str(port)],
+            cwd=workdir, env=_environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            ready = None
+            while time.perf_counter() - start < timeout and process.poll() is None:
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1) as response:
+                        if response.status == 200:
+                            ready = time.perf_counter() - start
+                            break
+                except (OSError, urllib.error.URLError):
+                    time.sleep(0.005)
+            if ready is None:
+                raise RuntimeError('The API did not become ready in time.')
+            samples.append(ready)
+        finally:
+            process.terminate()
+            process.wait()
+    return common.summarize('startup_time_to_ready', samples)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark API import time and time to first served request.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to report.')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _workdir(workdir)
+        results = [bench_import(args.runs, args.top, workdir), bench_ready(args.runs, args.timeout, workdir)]
+
+    common.write_results('startup', results, args.output)
@@ -0,0 +1,139 @@
+"""
+Benchmarks the dashboard to API channel on the edit table page interaction: load the tables, update rows
+and load the tables again. Sequential requests are compared with one /db/batch round-trip for the update
+and the refreshed tables, each with plain JSON bodies and with MessagePack and gzip or brotli compression.
+The API runs in a subprocess, so bytes are counted as sent on the wire.
+
+Usage:
+    python benchmarks/bench_transport.py --tables 5 --rows_per_table 10000 --interactions 10 --output transport.json
+"""
+
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+import common
+from bench_sqlite import COLUMNS, make_rows
+from bench_startup import _environment, _free_port, _workdir
+from app.utils import compression, serializers
+
+
+def _seed(workdir, tables, rows_per_table):
+    db = sqlite3.connect(os.path.join(workdir, 'src', 'database', 'database'))
+    for n in range(tables):
+        db.execute(f"CREATE TABLE table_{n} ({', '.join(COLUMNS)})")
+        db.executemany(f"INSERT INTO table_{n} VALUES (?, ?, ?, ?, ?)", make_rows(rows_per_table, offset=n))
+    db.commit()
+    db.close()
+
+
+def _start_api(workdir, timeout=30):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(common.REPO_ROOT, 'src', 'main.py'), '--api-only', '--port', str(port)],
+        cwd=workdir, env=_environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout and process.poll() is None:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/health', timeout=1).status_code == 200:
+                return process, f'http://127.0.0.1:{port}'
+        except requests.RequestException:
+            time.sleep(0.01)
+    process.terminate()
+    raise RuntimeError('The API did not become ready in time.')
+
+
+class Channel:
+    """A client counting round-trips and the bytes of request and response bodies as sent"""
+
+    def __init__(self, base_url, compressed):
+        self.base_url = base_url
+        self.compressed = compressed
+        self.session = requests.Session()
+        if compressed:
+            self.session.headers.update({'Accept': serializers.accept_header(), 'Accept-Encoding': ', '.join(compression.ENCODINGS)})
+        else:
+            self.session.headers.update({'Accept': serializers.JSON, 'Accept-Encoding': 'identity'})
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def request(self, method, path, payload=None, **params):
+        body, headers = None, {}
+        if payload is not None:
+            body, headers = compression.json_request(serializers.dumps(payload), 1024 if self.compressed else float('inf'))
+        response = self.session.request(method, self.base_url + path, data=body, headers=headers, params=params, stream=True)
+        raw = response.raw.read(decode_content=False)
+        self.round_trips += 1
+        self.bytes_sent += len(body or b'')
+        self.bytes_received += len(raw)
+        assert response.status_code == 200, (response.status_code, raw[:200])
+        encoding = response.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            raw = compression.gzip.decompress(raw)
+        elif encoding == 'br':
+            raw = compression.brotli.decompress(raw)
+        return serializers.decode(response.headers.get('Content-Type'), raw)
+
+
+def _edit_sequential(channel, rows):
+    channel.request('GET', '/db/tables', orient='columns')
+    channel.request('PUT', '/db/table_0/rows', {'rows': rows})
+    return channel.request('GET', '/db/tables', orient='columns')['tables']
+
+
+def _edit_batched(channel, rows):
+    channel.request('GET', '/db/tables', orient='columns')
+    response = channel.request('POST', '/db/batch', {'operations': [
+        {'op': 'update_rows', 'table_name': 'table_0', 'rows': rows},
+        {'op': 'get_tables', 'orient': 'columns'},
+    ]})
+    return response['results'][1]['result']['tables']
+
+
+def run(tables, rows_per_table, interactions, updated_rows, workdir):
+    _workdir(workdir)
+    _seed(workdir, tables, rows_per_table)
+    process, base_url = _start_api(workdir)
+    results = []
+    try:
+        for mode, interact in (('sequential', _edit_sequential), ('batched', _edit_batched)):
+            for compressed in (False, True):
+                channel = Channel(base_url, compressed)
+                samples = []
+                for n in range(interactions):
+                    rows = [[i, f'Edited {n}', 'Artist', i % 100, 120.0] for i in range(updated_rows)]
+                    seconds, refreshed = common.timed(interact, channel, rows)
+                    assert refreshed['table_0']['data'][1][0] == f'Edited {n}'
+                    samples.append(seconds)
+                results.append(common.summarize(
+                    f"transport_edit_{mode}_{'compressed' if compressed else 'plain'}", samples,
+                    round_trips=channel.round_trips / interactions,
+                    bytes_sent=channel.bytes_sent / interactions,
+                    bytes_received=channel.bytes_received / interactions,
+                    encodings=list(compression.ENCODINGS) if compressed else [],
+                ))
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark round-trips and bytes of the edit table page interaction.')
+    parser.add_argument('--tables', type=int, default=5)
+    parser.add_argument('--rows_per_table', type=int, default=10_000)
+    parser.add_argument('--interactions', type=int, default=10)
+    parser.add_argument('--updated_rows', type=int, default=1000, help='Rows sent with each update.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run(args.tables, args.rows_per_table, args.interactions, args.updated_rows, workdir)
+
+    common.write_results('transport', results, args.output)
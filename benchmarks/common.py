@@ -0,0 +1,76 @@
+"""
+Shared helpers for the benchmark scripts: import paths, timing statistics and JSON result files.
+Results carry the git commit and Python version so runs from different commits can be compared.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# The app is imported both as `app...` (src on the path) and as `src.app...`
+for path in (REPO_ROOT, os.path.join(REPO_ROOT, 'src')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def percentile_ms(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index] * 1000
+
+
+def summarize(name, samples, items=None, **extra):
+    """Returns a result entry for a list of per-run durations in seconds"""
+    total = sum(samples)
+    result = {
+        'scenario': name,
+        'runs': len(samples),
+        'total_seconds': total,
+        'p50_ms': percentile_ms(samples, 50),
+        'p99_ms': percentile_ms(samples, 99),
+    }
+    if items is not None:
+        result['items'] = items
+        result['items_per_second'] = items * len(samples) / total if total else None
+    result.update(extra)
+    return result
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    value = function(*args, **kwargs)
+    return time.perf_counter() - start, value
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(suite, results, output=None):
+    """Prints the results and writes them with run metadata to output, if given"""
+    document = {
+        'suite': suite,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    text = json.dumps(document, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    return document
@@ -0,0 +1,101 @@
+"""
+Runs every benchmark suite and writes a single JSON document, optionally comparing it to a previous run.
+
+Usage:
+    python benchmarks/run_all.py --output results/HEAD.json
+    python benchmarks/run_all.py --quick --compare results/baseline.json
+"""
+
+import argparse
+import importlib.util
+import json
+import tempfile
+import common
+import bench_audio_analysis
+import bench_catalog
+import bench_clients
+import bench_export
+import bench_ingest
+import bench_query_guard
+import bench_replica
+import bench_scheduler
+import bench_serializers
+import bench_similarity
+import bench_sqlite
+import bench_startup
+import bench_transport
+
+FULL = {'items': 1000, 'repeat': 3, 'rows': 100_000, 'tables': 20, 'requests': 50, 'sizes': [10_000, 100_000]}
+QUICK = {'items': 200, 'repeat': 1, 'rows': 10_000, 'tables': 5, 'requests': 10, 'sizes': [10_000]}
+
+# Lower is better for these fields, higher is better for the rest
+LOWER_IS_BETTER = ('total_seconds', 'p50_ms', 'p99_ms', 'build_seconds', 'exact_p50_ms', 'exact_p99_ms',
+                   'approximate_p50_ms', 'approximate_p99_ms', 'p95_ms', 'wall_seconds', 'peak_mb',
+                   'round_trips', 'bytes_sent', 'bytes_received', 'bytes_per_track')
+HIGHER_IS_BETTER = ('items_per_second', 'approximate_recall', 'rows_per_second')
+
+
+def run(sizes, latency, rate_limit, payload_size):
+    results = bench_clients.run(sizes['items'], sizes['repeat'], latency, rate_limit, payload_size, lyrics_pages=20)
+    with tempfile.TemporaryDirectory() as workdir:
+        results += bench_sqlite.bench_sqlite_api(sizes['rows'], sizes['repeat'], workdir)
+        results += bench_sqlite.bench_tables_route(sizes['tables'], 1000, sizes['requests'], workdir)
+        results += bench_sqlite.bench_read_formats(sizes['rows'], sizes['repeat'], workdir)
+        results += bench_ingest.run(16, sizes['requests'], 10, workdir)
+        results += bench_catalog.run(sizes['rows'] // 5, sizes['requests'], 1000, workdir)
+        results += bench_replica.run(sizes['rows'], 3, 2, 4, workdir)
+        results += bench_query_guard.run(sizes['rows'], 3, 4, workdir)
+        results += bench_scheduler.run(sizes['rows'] // 5, 100, sizes['requests'] * 6, 10, 0.2, workdir)
+        results += bench_serializers.run(sizes['tables'], 1000, sizes['repeat'], workdir)
+        results += [bench_similarity.run(size, 100, 10, 8, workdir) for size in sizes['sizes']]
+        results += bench_audio_analysis.run(sizes['items'] // 2, sizes['repeat'], workdir)
+        # Exports need the optional pyarrow dependency
+        if importlib.util.find_spec('pyarrow'):
+            results += bench_export.run(sizes['rows'], sizes['repeat'], workdir)
+    with tempfile.TemporaryDirectory() as workdir:
+        bench_startup._workdir(workdir)
+        results += [bench_startup.bench_import(sizes['repeat'], 15, workdir), bench_startup.bench_ready(sizes['repeat'], 30, workdir)]
+    with tempfile.TemporaryDirectory() as workdir:
+        results += bench_transport.run(5, sizes['rows'] // 10, sizes['requests'] // 5, 1000, workdir)
+    return results
+
+
+def compare(current, baseline_path, threshold):
+    """Prints the relative change of each metric against the baseline and returns the regressed ones"""
+    with open(baseline_path) as f:
+        baseline = {result['scenario']: result for result in json.load(f)['results']}
+
+    regressions = []
+    for result in current:
+        previous = baseline.get(result['scenario'])
+        if previous is None:
+            continue
+        for field in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            before, after = previous.get(field), result.get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change > threshold if field in LOWER_IS_BETTER else change < -threshold
+            print(f"{result['scenario']:<28} {field:<20} {before:>12.4f} -> {after:>12.4f} ({change:+.1%}){'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append((result['scenario'], field, change))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run all benchmark suites.')
+    parser.add_argument('--quick', action='store_true', help='Use small sizes, for a fast smoke run.')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--rate_limit', type=float, default=0.0)
+    parser.add_argument('--payload_size', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    parser.add_argument('--compare', type=str, default=None, help='A previous results file to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Relative change reported as a regression.')
+    args = parser.parse_args()
+
+    results = run(QUICK if args.quick else FULL, args.latency, args.rate_limit, args.payload_size)
+    common.write_results('all', results, args.output)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        raise SystemExit(1 if regressions else 0)
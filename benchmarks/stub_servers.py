@@ -0,0 +1,205 @@
+"""
+Local aiohttp servers mimicking the Spotify and Genius endpoints used by the ETL.
+Each server runs on its own event loop in a background thread, so both async clients (SpotifyAPI,
+GeniusAPI) and blocking ones (requests, used by scrape_lyrics) can call it.
+
+Every server can be configured with:
+    - latency (float) - Seconds to wait before answering each request
+    - rate_limit (float) - Fraction of requests answered with 429 and a Retry-After header
+    - failure_rate (float) - Fraction of requests answered with 503, to mimic a flaky host
+    - payload_size (int) - Bytes of padding added to each item, to mimic large responses
+"""
+
+import asyncio
+import random
+import socket
+import threading
+import zlib
+from aiohttp import web
+
+
+def _stable_hash(value: str) -> int:
+    # hash() of str is salted per process, which would make payloads differ between runs
+    return zlib.crc32(value.encode())
+
+
+class StubServer:
+    def __init__(self, latency=0.0, rate_limit=0.0, payload_size=0, retry_after=0, seed=0, failure_rate=0.0):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.failure_rate = failure_rate
+        self.failed = 0
+        self.payload_size = payload_size
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.port = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def routes(self):
+        raise NotImplementedError
+
+    def _padding(self):
+        return 'x' * self.payload_size
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.rate_limit and self._random.random() < self.rate_limit:
+            self.rate_limited += 1
+            return web.Response(status=429, headers={'Retry-After': str(self.retry_after)})
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.failed += 1
+            return web.Response(status=503)
+        return await handler(request)
+
+    def start(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes(self.routes())
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, '127.0.0.1', self.port)
+        self._loop.run_until_complete(site.start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class SpotifyStub(StubServer):
+    """Serves /search, /tracks, /artists, /albums, /audio-features and /audio-analysis with deterministic fake items"""
+
+    def routes(self):
+        return [
+            web.get('/search', self.search),
+            web.get('/tracks', self.batch('tracks', self._track)),
+            web.get('/artists', self.batch('artists', self._artist)),
+            web.get('/albums', self.batch('albums', self._album)),
+            web.get('/audio-features', self.batch('audio_features', self._audio_features)),
+            web.get('/audio-analysis/{track_id}', self.audio_analysis),
+        ]
+
+    def _track(self, track_id):
+        return {
+            'id': track_id,
+            'uri': f'spotify:track:{track_id}',
+            'name': f'Track {track_id}',
+            'popularity': _stable_hash(track_id) % 100,
+            'duration_ms': 180000,
+            'artists': [{'id': f'artist{_stable_hash(track_id) % 1000}', 'name': 'Artist'}],
+            'album': {'id': f'album{_stable_hash(track_id) % 500}', 'name': 'Album'},
+            'padding': self._padding(),
+        }
+
+    def _artist(self, artist_id):
+        return {'id': artist_id, 'name': f'Artist {artist_id}', 'genres': ['pop'], 'padding': self._padding()}
+
+    def _album(self, album_id):
+        return {'id': album_id, 'name': f'Album {album_id}', 'release_date': '2020-01-01', 'padding': self._padding()}
+
+    def _audio_features(self, track_id):
+        return {
+            'id': track_id, 'danceability': 0.5, 'energy': 0.5, 'key': 5, 'loudness': -8.0, 'mode': 1,
+            'speechiness': 0.05, 'acousticness': 0.2, 'instrumentalness': 0.0, 'liveness': 0.1,
+            'valence': 0.5, 'tempo': 120.0, 'padding': self._padding(),
+        }
+
+    async def audio_analysis(self, request):
+        seed = _stable_hash(request.match_info['track_id'])
+        return web.json_response({
+            'track': {'duration': 180.0, 'tempo': 60.0 + seed % 140, 'key': seed % 12, 'mode': 1, 'time_signature': 4, 'loudness': -8.0},
+            'segments': [
+                {'start': n * 0.25, 'duration': 0.25, 'confidence': 0.5, 'loudness_start': -20.0, 'loudness_max_time': 0.05,
+                 'loudness_max': -10.0, 'pitches': [float((seed + n) % 12 == p) for p in range(12)], 'timbre': [float(n % 7)] * 12}
+                for n in range(16)
+            ],
+            'beats': [{'start': n * 0.5, 'duration': 0.5, 'confidence': 0.9} for n in range(8)],
+            'bars': [{'start': n * 2.0, 'duration': 2.0, 'confidence': 0.8} for n in range(2)],
+            'tatums': [{'start': n * 0.25, 'duration': 0.25, 'confidence': 0.7} for n in range(16)],
+            'sections': [{'start': 0.0, 'duration': 180.0, 'confidence': 1.0, 'loudness': -8.0, 'tempo': 120.0, 'key': 5, 'mode': 1}],
+            'padding': self._padding(),
+        })
+
+    def batch(self, key, make_item):
+        async def handler(request):
+            ids = [i for i in request.query.get('ids', '').split(',') if i]
+            return web.json_response({key: [make_item(i) for i in ids]})
+        return handler
+
+    async def search(self, request):
+        query = request.query.get('q', '')
+        limit = int(request.query.get('limit', 1))
+        items = [self._track(f'{_stable_hash(query) % 10**8}{n}') for n in range(limit)]
+        return web.json_response({'tracks': {'items': items}})
+
+
+class GeniusStub(StubServer):
+    """Serves the Genius /search endpoint and lyrics pages under /lyrics/<id>"""
+
+    def __init__(self, lyrics_lines=40, **kwargs):
+        super().__init__(**kwargs)
+        self.lyrics_lines = lyrics_lines
+
+    def routes(self):
+        return [
+            web.get('/search', self.search),
+            web.get('/lyrics/{song_id}', self.lyrics),
+        ]
+
+    async def search(self, request):
+        query = request.query.get('q', '')
+        hits = [{
+            'type': 'song',
+            'result': {
+                'id': _stable_hash(query) % 10**8 + n,
+                'title': query,
+                'primary_artist': {'name': 'Artist'},
+                'url': f'{self.url}/lyrics/{n}',
+                'padding': self._padding(),
+            }
+        } for n in range(10)]
+        return web.json_response({'response': {'hits': hits}})
+
+    async def lyrics(self, request):
+        lines = '<br/>'.join(f'[Verse {n}] line {n} of song {request.match_info["song_id"]}' for n in range(self.lyrics_lines))
+        html = (
+            '<html><head><title>Lyrics</title></head><body>'
+            f'<div class="Header">{self._padding()}</div>'
+            f'<div class="Lyrics__Container-sc-1ynbvzw-1">{lines}</div>'
+            '</body></html>'
+        )
+        return web.Response(text=html, content_type='text/html')
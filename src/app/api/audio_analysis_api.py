@@ -0,0 +1,277 @@
+"""
+This class is responsible for storing Spotify audio-analysis payloads compactly in the SQLite Database
+and extracting features from them.
+Segments, beats, bars, tatums and sections are packed as float32 NumPy arrays in BLOB columns keyed by track id,
+instead of keeping the full JSON, and feature extraction runs over whole batches of tracks at once.
+"""
+
+import time
+import logging
+from typing import Optional, List, Dict, Any, Tuple
+import numpy as np
+from app.api.sqlite_api import SQLiteAPI
+
+AUDIO_ANALYSIS_TABLE = 'spotify_audio_analysis'
+
+# Column layout of each packed array, in order
+SEGMENT_FIELDS = ['start', 'duration', 'confidence', 'loudness_start', 'loudness_max_time', 'loudness_max']
+SEGMENT_WIDTH = len(SEGMENT_FIELDS) + 12 + 12  # + pitches + timbre
+PITCHES = slice(len(SEGMENT_FIELDS), len(SEGMENT_FIELDS) + 12)
+TIMBRE = slice(len(SEGMENT_FIELDS) + 12, SEGMENT_WIDTH)
+
+INTERVAL_FIELDS = ['start', 'duration', 'confidence']
+SECTION_FIELDS = ['start', 'duration', 'confidence', 'loudness', 'tempo', 'key', 'mode']
+
+ARRAY_WIDTHS = {
+    'segments': SEGMENT_WIDTH,
+    'beats': len(INTERVAL_FIELDS),
+    'bars': len(INTERVAL_FIELDS),
+    'tatums': len(INTERVAL_FIELDS),
+    'sections': len(SECTION_FIELDS),
+}
+
+TRACK_FIELDS = ['duration', 'tempo', 'key', 'mode', 'time_signature', 'loudness']
+
+AUDIO_ANALYSIS_COLUMNS = (
+    ['track_id TEXT PRIMARY KEY']
+    + [f'{field} REAL' for field in TRACK_FIELDS]
+    + [f'{name} BLOB' for name in ARRAY_WIDTHS]
+    + ['stored_at REAL']
+)
+
+"""
+Packs an audio-analysis payload into scalar track fields and float32 array bytes
+Parameters:
+    - payload (dict) - The JSON returned by the Spotify /audio-analysis endpoint
+Returns:
+    - A list of values in AUDIO_ANALYSIS_COLUMNS order, excluding track_id and stored_at
+"""
+def pack_analysis(payload: Dict[str, Any]) -> List[Any]:
+    track = payload.get('track', {})
+    values = [track.get(field) for field in TRACK_FIELDS]
+
+    segments = payload.get('segments', [])
+    values.append(np.array(
+        [[segment.get(field, 0.0) for field in SEGMENT_FIELDS] + segment['pitches'] + segment['timbre'] for segment in segments],
+        dtype=np.float32
+    ).reshape(-1, SEGMENT_WIDTH).tobytes())
+
+    for name in ('beats', 'bars', 'tatums'):
+        values.append(np.array(
+            [[interval.get(field, 0.0) for field in INTERVAL_FIELDS] for interval in payload.get(name, [])],
+            dtype=np.float32
+        ).reshape(-1, ARRAY_WIDTHS[name]).tobytes())
+
+    values.append(np.array(
+        [[section.get(field, 0.0) for field in SECTION_FIELDS] for section in payload.get('sections', [])],
+        dtype=np.float32
+    ).reshape(-1, ARRAY_WIDTHS['sections']).tobytes())
+
+    return values
+
+"""
+Unpacks an array BLOB without copying it
+Parameters:
+    - name (str) - The name of the array column, e.g. 'segments'
+    - blob (bytes) - The stored bytes
+Returns:
+    - A read-only (n, width) float32 array
+"""
+def unpack_array(name: str, blob: Optional[bytes]) -> np.ndarray:
+    if not blob:
+        return np.empty((0, ARRAY_WIDTHS[name]), dtype=np.float32)
+    return np.frombuffer(blob, dtype=np.float32).reshape(-1, ARRAY_WIDTHS[name])
+
+
+class AudioAnalysisAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "ANALYSIS_STORED": "Stored audio analysis for {count} track(s).",
+        "ANALYSIS_FETCH_FAIL": "Failed to fetch audio analysis of {count} track(s).",
+        "ANALYSIS_STORE_FAIL": "Failed to store audio analysis: {error}",
+        "ANALYSIS_NOT_FOUND": "No audio analysis found for the requested track(s).",
+    }
+
+    def __init__(self, sqlite_api: SQLiteAPI):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self._table_created = False
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    def _create_table(self):
+        if not self._table_created:
+            self.sqlite_api.create_table(AUDIO_ANALYSIS_TABLE, AUDIO_ANALYSIS_COLUMNS)
+            self._table_created = True
+
+    """
+    Fetches audio analysis for a list of tracks from Spotify and stores it packed
+    Parameters:
+        - spotify_api (SpotifyAPI) - The client used to fetch the analysis
+        - track_ids (List[str]) - The ids of the tracks
+        - retries (int) - The number of retries per request
+        - delay (float) - The delay between retries in seconds
+    Returns:
+        - A dictionary with the number of tracks "stored" and "failed" if successful, a message otherwise
+        - HTTP Status Code (int)
+    """
+    async def fetch_and_store(self, spotify_api, track_ids: List[str], retries: int, delay: float) -> Tuple[Any, int]:
+        payloads, failures = await spotify_api.get_tracks_audio_analysis(track_ids, retries, delay)
+        if failures:
+            self.logger.warning(self.MESSAGES["ANALYSIS_FETCH_FAIL"].format(count=len(failures)))
+        analyses = [(track_id, payload) for track_id, payload in zip(track_ids, payloads) if payload]
+        message, status_code = self.store(analyses)
+        if status_code >= 300:
+            return message, status_code
+        return {"stored": len(analyses), "failed": len(track_ids) - len(analyses)}, 201
+
+    """
+    Stores audio-analysis payloads, replacing any previous analysis of the same tracks
+    Parameters:
+        - analyses (List[Tuple[str, dict]]) - Pairs of track id and audio-analysis JSON
+    Returns:
+        Response message (str)
+        HTTP Status Code (int)
+    """
+    def store(self, analyses: List[Tuple[str, Dict[str, Any]]]) -> Tuple[str, int]:
+        try:
+            self._create_table()
+            now = time.time()
+            rows = [[track_id] + pack_analysis(payload) + [now] for track_id, payload in analyses if payload]
+            message, status_code = self.sqlite_api.upsert_rows(AUDIO_ANALYSIS_TABLE, rows)
+            if status_code >= 300:
+                return message, status_code
+
+            message = self.MESSAGES["ANALYSIS_STORED"].format(count=len(rows))
+            self.logger.info(message)
+            return message, 201
+
+        except Exception as e:
+            message = self.MESSAGES["ANALYSIS_STORE_FAIL"].format(error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+    """
+    Retrieves the packed arrays of the given tracks
+    Parameters:
+        - track_ids (List[str]) - The ids of the tracks
+        - arrays (List[str]) - The arrays to load, defaults to all of them
+    Returns:
+        - A dictionary of track id to a dictionary of track fields and (n, width) float32 arrays
+        - HTTP Status Code (int)
+    """
+    def get_analysis(self, track_ids: List[str], arrays: Optional[List[str]] = None) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        self._create_table()
+        arrays = arrays or list(ARRAY_WIDTHS)
+        columns = ['track_id'] + TRACK_FIELDS + arrays
+
+        result = {}
+        for i in range(0, len(track_ids), 500):
+            batch = track_ids[i:i + 500]
+            placeholders = ', '.join(['?' for _ in batch])
+            self.sqlite_api._execute(
+                f"SELECT {', '.join(columns)} FROM {AUDIO_ANALYSIS_TABLE} WHERE track_id IN ({placeholders})",
+                batch
+            )
+            for row in self.sqlite_api._fetchall():
+                analysis = dict(zip(TRACK_FIELDS, row[1:1 + len(TRACK_FIELDS)]))
+                for name, blob in zip(arrays, row[1 + len(TRACK_FIELDS):]):
+                    analysis[name] = unpack_array(name, blob)
+                result[row[0]] = analysis
+
+        if not result:
+            self.logger.info(self.MESSAGES["ANALYSIS_NOT_FOUND"])
+            return result, 404
+        return result, 200
+
+    """
+    Extracts per-track features from stored analyses in one vectorized pass
+    Parameters:
+        - track_ids (List[str]) - The ids of the tracks
+    Returns:
+        - A dictionary with the track ids and one array per feature, aligned by row:
+            - "tempo", "loudness" (n,)
+            - "mean_timbre", "mean_pitches" (n, 12)
+            - "tempo_stability" (n,) - 1 minus the coefficient of variation of beat durations
+            - "key_histogram" (n, 12) - duration-weighted histogram of each segment's dominant pitch class
+        - HTTP Status Code (int)
+    """
+    def extract_features(self, track_ids: List[str]) -> Tuple[Dict[str, Any], int]:
+        analyses, status_code = self.get_analysis(track_ids, arrays=['segments', 'beats'])
+        if status_code != 200:
+            return {}, status_code
+
+        ids = [track_id for track_id in track_ids if track_id in analyses]
+        segments = [analyses[track_id]['segments'] for track_id in ids]
+        beats = [analyses[track_id]['beats'] for track_id in ids]
+
+        features = {
+            'track_ids': ids,
+            'tempo': np.array([analyses[track_id]['tempo'] or 0.0 for track_id in ids], dtype=np.float32),
+            'loudness': np.array([analyses[track_id]['loudness'] or 0.0 for track_id in ids], dtype=np.float32),
+        }
+        features.update(_segment_features(segments))
+        features['tempo_stability'] = _tempo_stability(beats)
+        return features, 200
+
+    """
+    Extracts per-track features from stored analyses, as returned by extract_features, with one record per track
+    Parameters:
+        - track_ids (List[str]) - The ids of the tracks
+    Returns:
+        - A list of dictionaries with "track_id" and each feature as a number or a list of numbers
+        - HTTP Status Code (int)
+    """
+    def get_features(self, track_ids: List[str]) -> Tuple[Any, int]:
+        features, status_code = self.extract_features(track_ids)
+        if status_code != 200:
+            return {"error": self.MESSAGES["ANALYSIS_NOT_FOUND"]}, status_code
+        names = [name for name in features if name != 'track_ids']
+        return [
+            {'track_id': track_id, **{name: features[name][i].tolist() for name in names}}
+            for i, track_id in enumerate(features['track_ids'])
+        ], 200
+
+
+def _segment_features(segments: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    n = len(segments)
+    counts = np.array([len(s) for s in segments], dtype=np.int64)
+    stacked = np.concatenate(segments) if n else np.empty((0, SEGMENT_WIDTH), dtype=np.float32)
+    owner = np.repeat(np.arange(n), counts)
+
+    # Per-track sums as differences of a running total, which also handles tracks without segments
+    running = np.zeros((len(stacked) + 1, SEGMENT_WIDTH), dtype=np.float64)
+    np.cumsum(stacked, axis=0, out=running[1:])
+    ends = np.cumsum(counts)
+    totals = running[ends] - running[ends - counts]
+    means = totals / np.maximum(counts, 1)[:, None]
+
+    durations = stacked[:, SEGMENT_FIELDS.index('duration')]
+    dominant = np.argmax(stacked[:, PITCHES], axis=1) if len(stacked) else np.empty(0, dtype=np.int64)
+    histogram = np.bincount(owner * 12 + dominant, weights=durations, minlength=n * 12).reshape(n, 12)
+    histogram /= np.maximum(histogram.sum(axis=1, keepdims=True), 1e-9)
+
+    return {
+        'mean_pitches': means[:, PITCHES].astype(np.float32),
+        'mean_timbre': means[:, TIMBRE].astype(np.float32),
+        'key_histogram': histogram.astype(np.float32),
+    }
+
+
+def _tempo_stability(beats: List[np.ndarray]) -> np.ndarray:
+    n = len(beats)
+    counts = np.array([len(b) for b in beats], dtype=np.int64)
+    durations = np.concatenate([b[:, 1] for b in beats]).astype(np.float64) if n else np.empty(0)
+    owner = np.repeat(np.arange(n), counts)
+
+    total = np.bincount(owner, weights=durations, minlength=n)
+    total_sq = np.bincount(owner, weights=durations ** 2, minlength=n)
+    safe_counts = np.maximum(counts, 1)
+    mean = total / safe_counts
+    std = np.sqrt(np.maximum(total_sq / safe_counts - mean ** 2, 0.0))
+
+    stability = 1.0 - std / np.maximum(mean, 1e-9)
+    stability[counts < 2] = 0.0
+    return np.clip(stability, 0.0, 1.0).astype(np.float32)
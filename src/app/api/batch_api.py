@@ -0,0 +1,143 @@
+"""
+This class is responsible for running several SQLite Database operations in one request and one transaction.
+Operations are SQLiteAPI methods called by name, e.g. an update_rows followed by a get_tables that already sees
+the update. If any operation fails, the whole batch is rolled back.
+Batches run on a dedicated connection, so their open transaction is never committed by another request
+on the shared connection; write hooks of the shared connection are told about the writes once committed.
+"""
+
+import logging
+import threading
+from typing import Optional, List, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+
+READ_OPERATIONS = ('get_tables', 'get_table', 'get_table_schema', 'get_row', 'get_rows', 'query_table')
+WRITE_OPERATIONS = ('create_table', 'drop_table', 'insert_rows', 'upsert_rows', 'update_rows', 'delete_rows')
+
+
+class BatchFailed(Exception):
+    def __init__(self, index: int, status: int):
+        super().__init__(index, status)
+        self.index = index
+        self.status = status
+
+
+class BatchAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "BATCH_EMPTY": "No operations provided.",
+        "BATCH_TOO_LARGE": "A batch holds at most {max_operations} operations, got {operations}.",
+        "INVALID_OPERATION": "Invalid operation at index {index}: expected an object with an 'op' field.",
+        "OPERATION_NOT_FOUND": "Operation '{op}' at index {index} not found, expected one of: {operations}.",
+        "INVALID_ARGUMENTS": "Invalid arguments for operation '{op}' at index {index}: {error}",
+        "BATCH_COMMITTED": "Batch of {operations} operation(s) committed.",
+        "BATCH_ROLLED_BACK": "Batch rolled back: operation '{op}' at index {index} failed with status {status}.",
+        "BATCH_FAIL": "Failed to run a batch of {operations} operation(s): {error}",
+    }
+
+    """
+    Parameters:
+        - sqlite_api (SQLiteAPI) - The shared API, whose database the batches run on
+        - max_operations (int) - Operations accepted per batch
+    """
+    def __init__(self, sqlite_api: SQLiteAPI, max_operations: int = 100):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.max_operations = max_operations
+        self._lock = threading.Lock()
+        self._connection: Optional[SQLiteAPI] = None
+        self._writes: List[Tuple[str, Optional[List[Any]]]] = []
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    def shutdown(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.disconnect()
+                self._connection = None
+
+    def _writer(self) -> SQLiteAPI:
+        # Created on first use, with a hook forwarding writes to the hooks of the shared connection
+        if self._connection is None:
+            self._connection = SQLiteAPI()
+            self._connection.connect(self.sqlite_api.db_path)
+            self._connection.add_write_hook(self._on_write)
+        return self._connection
+
+    def _on_write(self, phase: str, table_name: str, keys: Optional[List[Any]]):
+        if phase == 'before':
+            # The shared connection still sees the rows as they were before the batch
+            self.sqlite_api._notify_write('before', table_name, keys)
+        else:
+            self._writes.append((table_name, keys))
+
+    def _validate(self, operations: Any) -> Optional[str]:
+        if not isinstance(operations, list) or not operations:
+            return self.MESSAGES["BATCH_EMPTY"]
+        if len(operations) > self.max_operations:
+            return self.MESSAGES["BATCH_TOO_LARGE"].format(max_operations=self.max_operations, operations=len(operations))
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict) or not isinstance(operation.get('op'), str):
+                return self.MESSAGES["INVALID_OPERATION"].format(index=index)
+            if operation['op'] not in READ_OPERATIONS + WRITE_OPERATIONS:
+                return self.MESSAGES["OPERATION_NOT_FOUND"].format(
+                    op=operation['op'], index=index, operations=', '.join(READ_OPERATIONS + WRITE_OPERATIONS)
+                )
+        return None
+
+    """
+    Runs operations in order in one transaction
+    Parameters:
+        - operations (List[Dict]) - Each operation names a SQLiteAPI method in 'op', the other fields are its arguments,
+                                    e.g. {"op": "update_rows", "table_name": "songs", "rows": [...]}
+    Returns:
+        - {"results": [{"status": ..., "result": ...}, ...]}, one entry per operation run.
+          On failure, 'failed' holds the index of the operation that failed and nothing is committed
+        - HTTP Status Code (int), the status of the failed operation if any
+    """
+    def run(self, operations: List[Dict[str, Any]]) -> Tuple[Any, int]:
+        message = self._validate(operations)
+        if message is not None:
+            return message, 400
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+
+        writes = any(operation['op'] in WRITE_OPERATIONS for operation in operations)
+        results = []
+        with self._lock:
+            self._writes = []
+            try:
+                writer = self._writer()
+                # Reads only get a consistent snapshot, batches that write take the write lock before their first read
+                with writer.transaction(immediate=writes):
+                    for index, operation in enumerate(operations):
+                        arguments = {key: value for key, value in operation.items() if key != 'op'}
+                        try:
+                            result, status = getattr(writer, operation['op'])(**arguments)
+                        except TypeError as e:
+                            result = self.MESSAGES["INVALID_ARGUMENTS"].format(op=operation['op'], index=index, error=str(e))
+                            status = 400
+                        results.append({'status': status, 'result': result})
+                        if status >= 400:
+                            raise BatchFailed(index, status)
+
+            except BatchFailed as e:
+                self.logger.warning(self.MESSAGES["BATCH_ROLLED_BACK"].format(
+                    op=operations[e.index]['op'], index=e.index, status=e.status
+                ))
+                return {'results': results, 'failed': e.index}, e.status
+
+            except Exception as e:
+                message = self.MESSAGES["BATCH_FAIL"].format(operations=len(operations), error=str(e))
+                self.logger.error(message)
+                return message, 500
+
+            # Write hooks observe the shared connection, tell them once the writes are visible to it
+            for table_name, keys in self._writes:
+                self.sqlite_api.notify_write(table_name, keys)
+            self._writes = []
+
+        self.logger.debug(self.MESSAGES["BATCH_COMMITTED"].format(operations=len(operations)))
+        return {'results': results}, 200
@@ -0,0 +1,384 @@
+"""
+This class is responsible for the normalized relational model of Spotify entities in the SQLite Database:
+tracks, artists, albums, the track_artists link table and audio_features, with primary keys and indexes
+on the columns analytics queries join and group on.
+Batches of JSON objects as returned by the Spotify API are flattened at once with pandas.json_normalize
+and upserted in bulk, one transaction per batch. Objects nested in others (the album and artists of a track)
+only carry some fields, so values missing from a batch never erase values already stored.
+"""
+
+import json
+import logging
+import time
+from typing import Optional, List, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+
+TRACKS_TABLE = 'tracks'
+ARTISTS_TABLE = 'artists'
+ALBUMS_TABLE = 'albums'
+TRACK_ARTISTS_TABLE = 'track_artists'
+AUDIO_FEATURES_TABLE = 'audio_features'
+
+TABLE_COLUMNS = {
+    ARTISTS_TABLE: [
+        'id TEXT PRIMARY KEY',
+        'name TEXT',
+        'popularity INTEGER',
+        'followers INTEGER',
+        'genres TEXT',
+        'uri TEXT',
+        'synced_at REAL',
+    ],
+    ALBUMS_TABLE: [
+        'id TEXT PRIMARY KEY',
+        'name TEXT',
+        'album_type TEXT',
+        'release_date TEXT',
+        'release_date_precision TEXT',
+        'total_tracks INTEGER',
+        'label TEXT',
+        'popularity INTEGER',
+        'uri TEXT',
+        'synced_at REAL',
+    ],
+    TRACKS_TABLE: [
+        'id TEXT PRIMARY KEY',
+        'name TEXT',
+        f'album_id TEXT REFERENCES {ALBUMS_TABLE}(id)',
+        'duration_ms INTEGER',
+        'explicit INTEGER',
+        'popularity INTEGER',
+        'track_number INTEGER',
+        'disc_number INTEGER',
+        'isrc TEXT',
+        'uri TEXT',
+        'synced_at REAL',
+        'removed_at REAL',
+    ],
+    TRACK_ARTISTS_TABLE: [
+        f'track_id TEXT REFERENCES {TRACKS_TABLE}(id)',
+        f'artist_id TEXT REFERENCES {ARTISTS_TABLE}(id)',
+        'position INTEGER',
+        'PRIMARY KEY (track_id, artist_id)',
+    ],
+    AUDIO_FEATURES_TABLE: [
+        f'track_id TEXT PRIMARY KEY REFERENCES {TRACKS_TABLE}(id)',
+        'danceability REAL',
+        'energy REAL',
+        'key INTEGER',
+        'loudness REAL',
+        'mode INTEGER',
+        'speechiness REAL',
+        'acousticness REAL',
+        'instrumentalness REAL',
+        'liveness REAL',
+        'valence REAL',
+        'tempo REAL',
+        'time_signature INTEGER',
+        'duration_ms INTEGER',
+        'synced_at REAL',
+    ],
+}
+
+# Foreign keys and grouping columns, primary keys are indexed already
+TABLE_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_tracks_album_id ON {TRACKS_TABLE} (album_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_track_artists_artist_id ON {TRACK_ARTISTS_TABLE} (artist_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_albums_release_date ON {ALBUMS_TABLE} (release_date)",
+    f"CREATE INDEX IF NOT EXISTS idx_audio_features_key ON {AUDIO_FEATURES_TABLE} (key, mode)",
+]
+
+# Table column mapped to its path in the flattened JSON object
+TRACK_FIELDS = {
+    'id': 'id', 'name': 'name', 'album_id': 'album.id', 'duration_ms': 'duration_ms', 'explicit': 'explicit',
+    'popularity': 'popularity', 'track_number': 'track_number', 'disc_number': 'disc_number',
+    'isrc': 'external_ids.isrc', 'uri': 'uri',
+}
+ARTIST_FIELDS = {
+    'id': 'id', 'name': 'name', 'popularity': 'popularity', 'followers': 'followers.total', 'genres': 'genres', 'uri': 'uri',
+}
+ALBUM_FIELDS = {
+    'id': 'id', 'name': 'name', 'album_type': 'album_type', 'release_date': 'release_date',
+    'release_date_precision': 'release_date_precision', 'total_tracks': 'total_tracks', 'label': 'label',
+    'popularity': 'popularity', 'uri': 'uri',
+}
+AUDIO_FEATURE_FIELDS = {
+    'track_id': 'id', 'danceability': 'danceability', 'energy': 'energy', 'key': 'key', 'loudness': 'loudness',
+    'mode': 'mode', 'speechiness': 'speechiness', 'acousticness': 'acousticness',
+    'instrumentalness': 'instrumentalness', 'liveness': 'liveness', 'valence': 'valence', 'tempo': 'tempo',
+    'time_signature': 'time_signature', 'duration_ms': 'duration_ms',
+}
+
+# Written as given on every upsert, the other columns keep their stored value when the batch has none
+_ALWAYS_SET = ('synced_at', 'removed_at')
+
+# Keeps IN (...) lists well below SQLite's bound parameter limit
+_IN_CLAUSE_BATCH = 500
+
+
+"""
+Selects the columns of a table from a batch of objects flattened with pandas.json_normalize
+Parameters:
+    - normalized (pd.DataFrame) - The flattened objects, one column per dotted path
+    - fields (Dict[str, str]) - Table column mapped to its dotted path, the key column first
+    - prefix (str) - Prefix of the paths, e.g. 'album.' to read the albums nested in tracks
+Returns:
+    - A DataFrame with one column per field and a row per object with a key, missing values as None (pd.DataFrame)
+"""
+def select_fields(normalized, fields: Dict[str, str], prefix: str = ''):
+    frame = normalized.reindex(columns=[prefix + path for path in fields.values()])
+    frame.columns = list(fields)
+    frame = frame[frame[next(iter(fields))].notna()]
+    # Boxed as Python objects, sqlite3 cannot bind numpy scalars
+    return frame.astype(object).where(frame.notna(), None)
+
+
+"""Flattens a batch of JSON objects into the columns of a table, see select_fields"""
+def flatten(items: List[Dict[str, Any]], fields: Dict[str, str]):
+    # Imported on first use, pandas is slow to import and only the loader needs it
+    import pandas as pd
+
+    return select_fields(pd.json_normalize(items), fields)
+
+
+def _rows(frame, *extra) -> List[tuple]:
+    return [row + extra for row in frame.itertuples(index=False, name=None)]
+
+
+class SpotifyCatalogAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "BATCH_LOADED": "Loaded {count} {entity} into the catalog in {seconds:.3f}s.",
+        "BATCH_LOAD_FAIL": "Failed to load {count} {entity} into the catalog: {error}",
+        "BACKFILLED": "Backfilled the catalog with {tracks} tracks and {audio_features} audio features from stored JSON.",
+    }
+
+    def __init__(self, sqlite_api: SQLiteAPI):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self._tables_created = False
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    """
+    Creates the catalog tables and their indexes if they do not exist
+    Returns:
+        - Whether the tables had to be created (bool)
+    """
+    def create_tables(self) -> bool:
+        if self._tables_created:
+            return False
+        created = False
+        for table_name, columns in TABLE_COLUMNS.items():
+            _, status_code = self.sqlite_api.create_table(table_name, columns)
+            created = created or status_code == 201
+        for statement in TABLE_INDEXES:
+            self.sqlite_api._execute(statement)
+        self.sqlite_api.db.commit()
+        self._tables_created = True
+        return created
+
+    def _upsert(self, table_name: str, columns: List[str], rows: List[tuple]):
+        if not rows:
+            return
+        key = columns[0]
+        update_clause = ', '.join(
+            f"{column} = excluded.{column}" if column in _ALWAYS_SET else f"{column} = COALESCE(excluded.{column}, {column})"
+            for column in columns[1:]
+        )
+        self.sqlite_api._executemany(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT({key}) DO UPDATE SET {update_clause}",
+            rows
+        )
+
+    def _load(self, entity: str, count: int, write) -> Tuple[Any, int]:
+        start = time.perf_counter()
+        try:
+            self.create_tables()
+            with self.sqlite_api.transaction(immediate=True):
+                written = write()
+        except Exception as e:
+            message = self.MESSAGES["BATCH_LOAD_FAIL"].format(count=count, entity=entity, error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+        # Write hooks are told once the batch is committed, with the keys of each table written
+        for table_name, keys in written.items():
+            if keys:
+                self.sqlite_api.notify_write(table_name, keys)
+        seconds = time.perf_counter() - start
+        self.logger.debug(self.MESSAGES["BATCH_LOADED"].format(count=count, entity=entity, seconds=seconds))
+        return {table_name: len(keys) for table_name, keys in written.items()}, 200
+
+    """
+    Loads a batch of track objects, along with the albums and artists nested in them
+    Parameters:
+        - tracks (List[dict]) - Track objects as returned by SpotifyAPI.get_tracks_data, None entries are skipped
+    Returns:
+        - The number of rows written per table (Dict[str, int])
+        - HTTP Status Code (int)
+    """
+    def load_tracks(self, tracks: List[Optional[Dict[str, Any]]]) -> Tuple[Any, int]:
+        tracks = [track for track in tracks if track and track.get('id')]
+        if not tracks:
+            return {}, 200
+
+        def write():
+            import pandas as pd
+
+            now = time.time()
+            normalized = pd.json_normalize(tracks)
+            track_frame = select_fields(normalized, TRACK_FIELDS)
+            album_frame = select_fields(normalized, ALBUM_FIELDS, prefix='album.').drop_duplicates('id', keep='last')
+            # Built directly, json_normalize with a record_path copies every track once per artist
+            links = pd.DataFrame(
+                [
+                    (track['id'], position, artist.get('id'), artist.get('name'), artist.get('uri'))
+                    for track in tracks for position, artist in enumerate(track.get('artists') or ())
+                ],
+                columns=['track_id', 'position', 'id', 'name', 'uri'],
+            )
+            links = links[links['id'].notna()].drop_duplicates(['track_id', 'id'])
+            artist_frame = select_fields(links, ARTIST_FIELDS).drop_duplicates('id', keep='last')
+
+            track_ids = track_frame['id'].tolist()
+            # Summaries grouped by artist also recompute the artists a track moves away from
+            self.sqlite_api._notify_write('before', TRACKS_TABLE, track_ids)
+
+            self._upsert(ALBUMS_TABLE, list(ALBUM_FIELDS) + ['synced_at'], _rows(album_frame, now))
+            self._upsert(ARTISTS_TABLE, list(ARTIST_FIELDS) + ['synced_at'], _rows(artist_frame, now))
+            self._upsert(TRACKS_TABLE, list(TRACK_FIELDS) + ['synced_at', 'removed_at'], _rows(track_frame, now, None))
+
+            # The artists of a track are replaced as a whole, their order is part of the track
+            for i in range(0, len(track_ids), _IN_CLAUSE_BATCH):
+                batch = track_ids[i:i + _IN_CLAUSE_BATCH]
+                self.sqlite_api._execute(
+                    f"DELETE FROM {TRACK_ARTISTS_TABLE} WHERE track_id IN ({', '.join('?' for _ in batch)})", batch
+                )
+            self.sqlite_api._executemany(
+                f"INSERT INTO {TRACK_ARTISTS_TABLE} (track_id, artist_id, position) VALUES (?, ?, ?)",
+                list(zip(links['track_id'], links['id'], links['position'].tolist()))
+            )
+            return {
+                ALBUMS_TABLE: album_frame['id'].tolist(),
+                ARTISTS_TABLE: artist_frame['id'].tolist(),
+                TRACKS_TABLE: track_ids,
+                TRACK_ARTISTS_TABLE: track_ids,
+            }
+
+        return self._load('tracks', len(tracks), write)
+
+    """
+    Loads a batch of artist objects as returned by SpotifyAPI.get_artists_data
+    Genres are stored as a JSON array
+    """
+    def load_artists(self, artists: List[Optional[Dict[str, Any]]]) -> Tuple[Any, int]:
+        artists = [artist for artist in artists if artist and artist.get('id')]
+        if not artists:
+            return {}, 200
+
+        def write():
+            frame = flatten(artists, ARTIST_FIELDS).drop_duplicates('id', keep='last')
+            frame['genres'] = [json.dumps(genres) if isinstance(genres, list) else genres for genres in frame['genres']]
+            self._upsert(ARTISTS_TABLE, list(ARTIST_FIELDS) + ['synced_at'], _rows(frame, time.time()))
+            return {ARTISTS_TABLE: frame['id'].tolist()}
+
+        return self._load('artists', len(artists), write)
+
+    """
+    Loads a batch of album objects as returned by SpotifyAPI.get_albums_data
+    The track listings of the albums are not loaded, tracks are loaded from their own objects
+    """
+    def load_albums(self, albums: List[Optional[Dict[str, Any]]]) -> Tuple[Any, int]:
+        albums = [album for album in albums if album and album.get('id')]
+        if not albums:
+            return {}, 200
+
+        def write():
+            frame = flatten(albums, ALBUM_FIELDS).drop_duplicates('id', keep='last')
+            self._upsert(ALBUMS_TABLE, list(ALBUM_FIELDS) + ['synced_at'], _rows(frame, time.time()))
+            return {ALBUMS_TABLE: frame['id'].tolist()}
+
+        return self._load('albums', len(albums), write)
+
+    """
+    Loads a batch of audio feature objects as returned by SpotifyAPI.get_tracks_audio_features
+    """
+    def load_audio_features(self, audio_features: List[Optional[Dict[str, Any]]]) -> Tuple[Any, int]:
+        audio_features = [features for features in audio_features if features and features.get('id')]
+        if not audio_features:
+            return {}, 200
+
+        def write():
+            frame = flatten(audio_features, AUDIO_FEATURE_FIELDS).drop_duplicates('track_id', keep='last')
+            # Summaries grouped by key also recompute the key a track moves away from
+            self.sqlite_api._notify_write('before', AUDIO_FEATURES_TABLE, frame['track_id'].tolist())
+            self._upsert(AUDIO_FEATURES_TABLE, list(AUDIO_FEATURE_FIELDS) + ['synced_at'], _rows(frame, time.time()))
+            return {AUDIO_FEATURES_TABLE: frame['track_id'].tolist()}
+
+        return self._load('audio features', len(audio_features), write)
+
+    """
+    Marks tracks as removed from the library, summaries only count tracks that are not
+    Parameters:
+        - track_ids (List[str]) - The ids of the removed tracks
+        - removed_at (float) - The time of removal
+    """
+    def remove_tracks(self, track_ids: List[str], removed_at: float):
+        if not track_ids:
+            return
+        self.create_tables()
+        with self.sqlite_api.transaction(immediate=True):
+            self.sqlite_api._executemany(
+                f"UPDATE {TRACKS_TABLE} SET removed_at = ? WHERE id = ?", [(removed_at, track_id) for track_id in track_ids]
+            )
+        self.sqlite_api.notify_write(TRACKS_TABLE, track_ids)
+
+    """
+    Loads the catalog from JSON documents stored by an earlier sync, in batches
+    Parameters:
+        - tracks_table (str) - The table of track JSON, with id, data and removed_at columns
+        - audio_features_table (str) - The table of audio feature JSON, with id and data columns
+        - batch_size (int) - Documents loaded per transaction
+    Returns:
+        - The number of tracks and audio features loaded (Dict[str, int])
+        - HTTP Status Code (int)
+    """
+    def backfill(self, tracks_table: str, audio_features_table: str, batch_size: int = 5000) -> Tuple[Any, int]:
+        loaded = {'tracks': 0, 'audio_features': 0}
+        sources = (
+            ('tracks', tracks_table, self.load_tracks),
+            ('audio_features', audio_features_table, self.load_audio_features),
+        )
+        # A cursor of its own, the loader uses the shared one between batches
+        cursor = self.sqlite_api.db.cursor()
+        try:
+            for name, table_name, load in sources:
+                if not self.sqlite_api._table_exists(table_name):
+                    continue
+                cursor.execute(f"SELECT data FROM {table_name}")
+                while documents := cursor.fetchmany(batch_size):
+                    message, status_code = load([json.loads(data) for (data,) in documents])
+                    if status_code != 200:
+                        return message, status_code
+                    loaded[name] += len(documents)
+
+            if self.sqlite_api._table_exists(tracks_table):
+                cursor.execute(f"SELECT id, removed_at FROM {tracks_table} WHERE removed_at IS NOT NULL")
+                for removed_at, track_ids in _group_by_time(cursor.fetchall()).items():
+                    self.remove_tracks(track_ids, removed_at)
+        finally:
+            cursor.close()
+
+        self.logger.info(self.MESSAGES["BACKFILLED"].format(**loaded))
+        return loaded, 200
+
+
+def _group_by_time(rows: List[tuple]) -> Dict[float, List[str]]:
+    groups: Dict[float, List[str]] = {}
+    for track_id, removed_at in rows:
+        groups.setdefault(removed_at, []).append(track_id)
+    return groups
@@ -0,0 +1,240 @@
+"""
+This class is responsible for the ETL jobs the scheduler runs in the background: refreshing stale summary views,
+syncing the configured Spotify playlists, refreshing audio features, fetching audio analysis
+and backfilling lyrics from Genius.
+Jobs work in small steps on the connection of their run and call the run's checkpoint between steps,
+so they pause while the dashboard is being served and stop promptly on shutdown.
+Jobs needing credentials are registered as disabled when the credentials are not configured.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional, List, Dict, Any, Callable
+from app.api.sqlite_api import SQLiteAPI
+from app.api import catalog_api
+from app.api.catalog_api import SpotifyCatalogAPI
+from app.api.scheduler_api import SchedulerAPI, JobContext
+
+LYRICS_TABLE = 'track_lyrics'
+
+LYRICS_TABLE_COLUMNS = [
+    f'track_id TEXT PRIMARY KEY REFERENCES {catalog_api.TRACKS_TABLE}(id)',
+    'url TEXT',
+    'lyrics TEXT',
+    'fetched_at REAL',
+]
+
+
+class ETLJobsAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "MISSING_SPOTIFY_CREDENTIALS": "Spotify credentials are not configured (NOTELAB_SPOTIFY_CLIENT_ID, NOTELAB_SPOTIFY_CLIENT_SECRET).",
+        "MISSING_PLAYLISTS": "No playlists are configured (NOTELAB_SYNC_PLAYLISTS).",
+        "MISSING_GENIUS_TOKEN": "A Genius access token is not configured (NOTELAB_GENIUS_ACCESS_TOKEN).",
+        "JOB_STEP_FAIL": "{step} failed with status {status}: {message}",
+    }
+
+    DESCRIPTIONS = {
+        'refresh_views': "Refreshes the summary views marked stale by writes.",
+        'sync_playlists': "Syncs the tracks of the configured Spotify playlists into the catalog.",
+        'refresh_audio_features': "Fetches audio features of catalog tracks without any, or with the oldest.",
+        'fetch_audio_analysis': "Fetches and stores the packed audio analysis of catalog tracks without one.",
+        'backfill_lyrics': "Resolves catalog tracks on Genius and stores their lyrics.",
+    }
+
+    """
+    Parameters:
+        - sqlite_api (SQLiteAPI) - The shared API, whose database the jobs write to
+        - view_api (MaterializedViewAPI) - The summary views refreshed by refresh_views
+        - spotify_client_id (str), spotify_client_secret (str) - Client credentials of the Spotify app
+        - genius_access_token (str) - Access token of the Genius API
+        - playlist_ids (List[str]) - The Spotify playlists synced by sync_playlists
+        - retries (int), delay (float) - Retries per external request and the base delay between them
+        - chunk_size (int) - Tracks processed per step of the Spotify jobs
+        - lyrics_chunk_size (int) - Tracks processed per step of backfill_lyrics
+        - lyrics_limit (int) - Tracks backfilled per run at most
+        - analysis_chunk_size (int) - Tracks processed per step of fetch_audio_analysis, one request each
+        - analysis_limit (int) - Tracks whose audio analysis is fetched per run at most
+        - get_similarity_api (Callable) - Returns the served SimilarityAPI, whose index the Spotify jobs add fetched audio features to
+    """
+    def __init__(self, sqlite_api: SQLiteAPI, view_api, spotify_client_id: str = '', spotify_client_secret: str = '',
+                 genius_access_token: str = '', playlist_ids: Optional[List[str]] = None, retries: int = 3, delay: float = 1.0,
+                 chunk_size: int = 500, lyrics_chunk_size: int = 25, lyrics_limit: int = 500,
+                 analysis_chunk_size: int = 25, analysis_limit: int = 500, get_similarity_api: Optional[Callable[[], Any]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.view_api = view_api
+        self.spotify_client_id = spotify_client_id
+        self.spotify_client_secret = spotify_client_secret
+        self.genius_access_token = genius_access_token
+        self.playlist_ids = playlist_ids or []
+        self.retries = retries
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.lyrics_chunk_size = lyrics_chunk_size
+        self.lyrics_limit = lyrics_limit
+        self.analysis_chunk_size = analysis_chunk_size
+        self.analysis_limit = analysis_limit
+        self.get_similarity_api = get_similarity_api
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    def _spotify_disabled_reason(self) -> Optional[str]:
+        if not (self.spotify_client_id and self.spotify_client_secret):
+            return self.MESSAGES["MISSING_SPOTIFY_CREDENTIALS"]
+        return None
+
+    """
+    Declares the jobs on the scheduler
+    Parameters:
+        - scheduler (SchedulerAPI) - The scheduler running the jobs
+        - schedules (Dict[str, str]) - Cron expression per job name, jobs without one only run on request
+    """
+    def register(self, scheduler: SchedulerAPI, schedules: Dict[str, str]):
+        disabled_reasons = {
+            'refresh_views': None,
+            'sync_playlists': self._spotify_disabled_reason() or (None if self.playlist_ids else self.MESSAGES["MISSING_PLAYLISTS"]),
+            'refresh_audio_features': self._spotify_disabled_reason(),
+            'fetch_audio_analysis': self._spotify_disabled_reason(),
+            'backfill_lyrics': None if self.genius_access_token else self.MESSAGES["MISSING_GENIUS_TOKEN"],
+        }
+        for name, reason in disabled_reasons.items():
+            scheduler.register(name, getattr(self, name), schedules.get(name), self.DESCRIPTIONS[name], reason)
+
+    def _check(self, step: str, result):
+        message, status_code = result
+        if status_code >= 300:
+            raise RuntimeError(self.MESSAGES["JOB_STEP_FAIL"].format(step=step, status=status_code, message=message))
+        return message
+
+    def _sync_api(self, context: JobContext):
+        # Imported on first use, aiohttp and the Spotify client are only needed by the Spotify jobs
+        from app.api.spotify_api import SpotifyAPI
+        from app.api.sync_api import SpotifySyncAPI
+
+        spotify_api = SpotifyAPI(self.spotify_client_id, self.spotify_client_secret, None, 0)
+        connection = context.connection
+        # The index served by /similarity, so tracks synced in the background can be searched without a rebuild
+        similarity_api = self.get_similarity_api() if self.get_similarity_api is not None else None
+        sync_api = SpotifySyncAPI(spotify_api, connection, similarity_api=similarity_api, catalog=SpotifyCatalogAPI(connection),
+                                  chunk_size=self.chunk_size, checkpoint=context.checkpoint)
+        sync_api.set_logger(self.logger)
+        return sync_api
+
+    def refresh_views(self, context: JobContext) -> Dict[str, Any]:
+        return self._check('Refreshing views', self.view_api.refresh_stale())
+
+    def sync_playlists(self, context: JobContext) -> Dict[str, Any]:
+        sync_api = self._sync_api(context)
+
+        async def sync():
+            summaries = {}
+            for done, playlist_id in enumerate(self.playlist_ids):
+                await asyncio.to_thread(context.checkpoint, playlists_synced=done, playlists=len(self.playlist_ids))
+                summaries[playlist_id] = self._check(
+                    f"Syncing playlist {playlist_id}", await sync_api.sync_playlist(playlist_id, self.retries, self.delay)
+                )
+            return summaries
+
+        return asyncio.run(sync())
+
+    def refresh_audio_features(self, context: JobContext) -> Dict[str, Any]:
+        sync_api = self._sync_api(context)
+        return self._check('Refreshing audio features', asyncio.run(sync_api.refresh_audio_features(self.retries, self.delay)))
+
+    def _pending_analysis(self, connection: SQLiteAPI, table_name: str) -> List[str]:
+        connection._execute(
+            f"SELECT t.id FROM {catalog_api.TRACKS_TABLE} t "
+            f"LEFT JOIN {table_name} a ON a.track_id = t.id "
+            f"WHERE t.removed_at IS NULL AND a.track_id IS NULL LIMIT ?",
+            (self.analysis_limit,)
+        )
+        return [row[0] for row in connection._fetchall()]
+
+    def fetch_audio_analysis(self, context: JobContext) -> Dict[str, Any]:
+        # Imported on first use, aiohttp, numpy and the Spotify client are only needed by this job
+        from app.api.spotify_api import SpotifyAPI
+        from app.api.audio_analysis_api import AudioAnalysisAPI, AUDIO_ANALYSIS_TABLE, AUDIO_ANALYSIS_COLUMNS
+
+        connection = context.connection
+        SpotifyCatalogAPI(connection).create_tables()
+        connection.create_table(AUDIO_ANALYSIS_TABLE, AUDIO_ANALYSIS_COLUMNS)
+        pending = self._pending_analysis(connection, AUDIO_ANALYSIS_TABLE)
+        summary = {'tracks': len(pending), 'stored': 0, 'failed': 0}
+
+        spotify_api = SpotifyAPI(self.spotify_client_id, self.spotify_client_secret, None, 0)
+        analysis_api = AudioAnalysisAPI(connection)
+        analysis_api.set_logger(self.logger)
+
+        async def fetch():
+            for i in range(0, len(pending), self.analysis_chunk_size):
+                await asyncio.to_thread(context.checkpoint, **summary)
+                chunk = pending[i:i + self.analysis_chunk_size]
+                result = self._check('Storing audio analysis', await analysis_api.fetch_and_store(spotify_api, chunk, self.retries, self.delay))
+                summary['stored'] += result['stored']
+                summary['failed'] += result['failed']
+            return summary
+
+        return asyncio.run(fetch())
+
+    def _pending_lyrics(self, connection: SQLiteAPI) -> List[tuple]:
+        connection._execute(
+            f"SELECT t.id, t.name, a.name FROM {catalog_api.TRACKS_TABLE} t "
+            f"JOIN {catalog_api.TRACK_ARTISTS_TABLE} ta ON ta.track_id = t.id AND ta.position = 0 "
+            f"JOIN {catalog_api.ARTISTS_TABLE} a ON a.id = ta.artist_id "
+            f"LEFT JOIN {LYRICS_TABLE} l ON l.track_id = t.id "
+            f"WHERE t.removed_at IS NULL AND l.track_id IS NULL AND t.name IS NOT NULL AND a.name IS NOT NULL LIMIT ?",
+            (self.lyrics_limit,)
+        )
+        return connection._fetchall()
+
+    def backfill_lyrics(self, context: JobContext) -> Dict[str, Any]:
+        # Imported on first use, the Genius client and the search cache are only needed by this job
+        from app.api.genius_api import GeniusAPI
+        from src.app.utils.cpu_pool import get_pool
+        from src.app.utils.search_cache import SearchCache
+
+        connection = context.connection
+        SpotifyCatalogAPI(connection).create_tables()
+        connection.create_table(LYRICS_TABLE, LYRICS_TABLE_COLUMNS)
+        pending = self._pending_lyrics(connection)
+        summary = {'tracks': len(pending), 'resolved': 0, 'fetched': 0, 'failed': 0}
+
+        genius_api = GeniusAPI(self.genius_access_token, None)
+        cache = SearchCache(namespace='genius')
+        # Lyrics pages are parsed in worker processes, parsing in the job thread would hold the GIL against requests
+        pool = get_pool()
+
+        async def backfill():
+            for i in range(0, len(pending), self.lyrics_chunk_size):
+                await asyncio.to_thread(context.checkpoint, **summary)
+                chunk = pending[i:i + self.lyrics_chunk_size]
+                urls, failures = await genius_api.resolve_songs(
+                    [song for _, song, _ in chunk], [artist for _, _, artist in chunk], self.retries, self.delay,
+                    cache=cache, pool=pool, field='url'
+                )
+                found = [url for url in urls if url]
+                lyrics = dict(zip(found, (await genius_api.scrape_lyrics_batch(found, self.retries, self.delay, pool=pool))[0])) if found else {}
+
+                now = time.time()
+                # Tracks without a match are stored without lyrics, so they are not searched again on every run,
+                # tracks whose search or scrape failed are left out and retried on the next run
+                rows = [
+                    [track_id, url, lyrics.get(url), now]
+                    for (track_id, song, artist), url in zip(chunk, urls)
+                    if (url is None and (song, artist) not in failures) or lyrics.get(url) is not None
+                ]
+                summary['resolved'] += len(found)
+                summary['fetched'] += len([row for row in rows if row[2] is not None])
+                summary['failed'] += len(chunk) - len(rows)
+                if rows:
+                    self._check('Storing lyrics', connection.upsert_rows(LYRICS_TABLE, rows))
+            return summary
+
+        try:
+            return asyncio.run(backfill())
+        finally:
+            cache.close()
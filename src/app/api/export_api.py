@@ -0,0 +1,200 @@
+"""
+This class is responsible for exporting SQLite tables and query results to columnar files.
+Rows are streamed from the cursor in fixed-size batches and written as Parquet or Arrow IPC files,
+so memory use is bounded by the batch size rather than the table size. Arrow IPC files can be
+memory-mapped for zero-copy reads with pyarrow.ipc.open_file(pyarrow.memory_map(path)).
+pyarrow is an optional dependency, only needed for exports.
+"""
+
+import logging
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Optional, List, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+from src.app.utils.query_compiler import compile_query, QueryValidationError
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def _arrow_type(declared_type: str):
+    # SQLite type affinity rules, see https://www.sqlite.org/datatype3.html
+    declared = (declared_type or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(name in declared for name in ('CHAR', 'CLOB', 'TEXT')):
+        return pa.string()
+    if 'BLOB' in declared:
+        return pa.binary()
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    return None
+
+
+def _infer_type(values: List[Any]):
+    # Columns without a declared type can mix storage classes, those are exported as text
+    try:
+        inferred = pa.array(values).type if values else pa.null()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return pa.string()
+    return pa.string() if pa.types.is_null(inferred) else inferred
+
+
+def _coerce(value, arrow_type):
+    # SQLite columns are dynamically typed, e.g. imported CSVs store missing numbers as 'NULL' text
+    if value is None:
+        return None
+    try:
+        if pa.types.is_integer(arrow_type):
+            return int(value)
+        if pa.types.is_floating(arrow_type):
+            return float(value)
+        if pa.types.is_string(arrow_type):
+            return value if isinstance(value, str) else str(value)
+        if pa.types.is_binary(arrow_type):
+            return value if isinstance(value, bytes) else str(value).encode()
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def _to_array(values: List[Any], arrow_type):
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return pa.array([_coerce(value, arrow_type) for value in values], type=arrow_type)
+
+
+class ExportAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "PYARROW_MISSING": "Exports require pyarrow, install it with 'pip install pyarrow'.",
+        "INVALID_FORMAT": "Unsupported export format '{format}', expected one of: {formats}.",
+        "EXPORT_SUCCESS": "Exported {rows} row(s) of '{table_name}' to {path} in {seconds:.3f}s.",
+        "EXPORT_FAIL": "Failed to export '{table_name}': {error}",
+        "EXPORT_INVALID_QUERY": "Invalid export query on table '{table_name}': {error}",
+    }
+
+    """
+    Parameters:
+        - sqlite_api (SQLiteAPI) - The shared API, whose database is exported
+        - export_dir (str) - Directory of exports written without a path
+        - batch_size (int) - Rows fetched and written per batch
+        - replica (ReadReplicaAPI) - Optional read replica, exports then stream from its read-only connections
+    """
+    def __init__(self, sqlite_api: SQLiteAPI, export_dir: str = 'src/database/exports', batch_size: int = 50_000, replica=None):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.replica = replica
+        self.export_dir = export_dir
+        self.batch_size = batch_size
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    """
+    Builds the Arrow schema of a result set
+    Declared column types are used where the result columns are table columns,
+    the rest (aggregates, untyped columns) are inferred from the first batch
+    """
+    def _schema(self, names: List[str], declared: Dict[str, str], first_batch: List[tuple]):
+        columns = list(zip(*first_batch)) if first_batch else [[] for _ in names]
+        fields = []
+        for name, values in zip(names, columns):
+            arrow_type = _arrow_type(declared.get(name))
+            if arrow_type is None:
+                arrow_type = _infer_type(values)
+            fields.append(pa.field(name, arrow_type))
+        return pa.schema(fields)
+
+    def _record_batch(self, schema, rows: List[tuple]):
+        columns = list(zip(*rows))
+        return pa.RecordBatch.from_arrays(
+            [_to_array(list(values), field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    def _open_writer(self, path: str, export_format: str, schema):
+        if export_format == 'parquet':
+            return pq.ParquetWriter(path, schema, compression='zstd')
+        return pa.ipc.new_file(path, schema)
+
+    """
+    Exports a table, or a query spec over it, to a Parquet or Arrow IPC file
+    Parameters:
+        - table_name (str) - The table to export
+        - export_format (str) - 'parquet' or 'arrow'
+        - path (str) - The output file, defaults to a new file in the export directory
+        - spec (dict) - An optional query spec (columns, filters, aggregates, ...), see app.utils.query_compiler
+    Returns:
+        - A dictionary with the "path", "rows", "bytes" and "seconds" of the export, or a message on failure
+        - HTTP Status Code (int)
+    """
+    def export(self, table_name: str, export_format: str = 'parquet', path: Optional[str] = None, spec: Optional[Dict[str, Any]] = None) -> Tuple[Any, int]:
+        if pa is None:
+            self.logger.error(self.MESSAGES["PYARROW_MISSING"])
+            return self.MESSAGES["PYARROW_MISSING"], 501
+        if export_format not in FORMATS:
+            return self.MESSAGES["INVALID_FORMAT"].format(format=export_format, formats=', '.join(FORMATS)), 400
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+
+        # A long export holds a read-only connection of the replica rather than a read lock on the shared one
+        with self.replica.reader() if self.replica is not None else nullcontext(self.sqlite_api) as source:
+            return self._export(source, table_name, export_format, path, spec)
+
+    def _export(self, source: SQLiteAPI, table_name: str, export_format: str, path: Optional[str], spec: Optional[Dict[str, Any]]) -> Tuple[Any, int]:
+        # A separate cursor, so other requests using the shared cursor don't interrupt the stream
+        cursor = source.db.cursor()
+        generated_path = path is None
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+            if cursor.fetchone() is None:
+                return self.sqlite_api.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name), 404
+
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            declared = {info[1]: info[2] for info in cursor.fetchall()}
+            try:
+                query, parameters = compile_query(table_name, list(declared), spec or {})
+            except QueryValidationError as e:
+                return self.MESSAGES["EXPORT_INVALID_QUERY"].format(table_name=table_name, error=str(e)), 400
+
+            if path is None:
+                os.makedirs(self.export_dir, exist_ok=True)
+                path = os.path.join(self.export_dir, f"{table_name}-{uuid.uuid4().hex[:8]}{FORMATS[export_format]}")
+
+            start = time.perf_counter()
+            cursor.execute(query, parameters)
+            names = [column[0] for column in cursor.description]
+            rows = cursor.fetchmany(self.batch_size)
+            schema = self._schema(names, declared, rows)
+
+            row_count = 0
+            with self._open_writer(path, export_format, schema) as writer:
+                while rows:
+                    writer.write_batch(self._record_batch(schema, rows))
+                    row_count += len(rows)
+                    rows = cursor.fetchmany(self.batch_size)
+
+            seconds = time.perf_counter() - start
+            self.logger.info(self.MESSAGES["EXPORT_SUCCESS"].format(rows=row_count, table_name=table_name, path=path, seconds=seconds))
+            return {"path": path, "format": export_format, "rows": row_count, "bytes": os.path.getsize(path), "seconds": seconds}, 200
+
+        except Exception as e:
+            message = self.MESSAGES["EXPORT_FAIL"].format(table_name=table_name, error=str(e))
+            self.logger.error(message)
+            if generated_path and path is not None and os.path.exists(path):
+                os.remove(path)
+            return message, 500
+
+        finally:
+            cursor.close()
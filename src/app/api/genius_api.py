@@ -1,10 +1,50 @@
-import asyncio
 import re
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 import aiohttp
-import requests
-from bs4 import BeautifulSoup
-from src.server.api.api_handler import get_response
+from src.app.utils.async_request_handler import get_response
+from src.app.utils.batch_executor import gather_partial
+from src.utils import song_querifier
+
+_LYRICS_CONTAINER = re.compile(r'^Lyrics__Container')
+_SECTION_HEADER = re.compile(r'\[.*?]')
+
+"""Returns the compact form of the song hits of one search, only what resolving and scraping need"""
+def compact_hits(hits):
+    compacted = []
+    for hit in hits:
+        if hit.get('type', 'song') != 'song':
+            continue
+        result = hit.get('result') or {}
+        title = result.get('title') or ''
+        artist = (result.get('primary_artist') or {}).get('name') or ''
+        compacted.append({
+            'id': result.get('id'),
+            'title': title,
+            'artist': artist,
+            'url': result.get('url'),
+            # Querified once here, so cached hits are scored without formatting them again
+            'key': [song_querifier.querify_song(title), song_querifier.querify_artist(artist)],
+        })
+    return compacted
+
+"""Extracts the lyrics text of a Genius song page"""
+def parse_lyrics(html):
+    # Imported on first use, bs4 is only needed when lyrics are scraped
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    lyrics_div = soup.find('div', class_=_LYRICS_CONTAINER)
+    if lyrics_div:
+        text = lyrics_div.get_text("\n", strip=True)
+        text = ' '.join(text.splitlines())
+        return _SECTION_HEADER.sub(' ', text)
+    return "Lyrics not found"
+
+"""Applies a module-level function to each item, in the worker processes of the CPUPool when one is given"""
+async def _map(pool, function, items):
+    if pool is None:
+        return [function(item) for item in items]
+    return await pool.map(function, items)
 
 class GeniusAPI:
     def __init__(self, access_token, redirect_url):
@@ -61,30 +101,106 @@ class GeniusAPI:
                 response.raise_for_status()
                 return await response.json()
 
-    """Returns the matching Genius songs according to Song and Artist"""
-    async def get_songs_data(self, songs, artists, retries, delay):
+    """
+    Returns the matching Genius songs according to Song and Artist, None for queries that failed,
+    and the error of each failed query, keyed by the query
+    """
+    async def get_songs_data(self, songs, artists, retries, delay, checkpoint_path=None):
+        queries = [f'{song} {artist}' for song, artist in zip(songs, artists)]
         async with aiohttp.ClientSession() as session:
-            tasks = [
-            get_response(
-                base_url=self._BASE_URL,
-                endpoint='/search',
-                headers=self._get_headers(),
-                params={'q': f'{song} {artist}'},
-                session=session,
-                retries=retries,
-                delay=delay
-            ) for song, artist in zip(songs, artists)]
-            results = await asyncio.gather(*tasks)
-        return [result.get('response', {}).get('hits', []) for result in results]
+            tasks = {
+                query: lambda query=query: get_response(
+                    base_url=self._BASE_URL,
+                    endpoint='/search',
+                    headers=self._get_headers(),
+                    params={'q': query},
+                    session=session,
+                    retries=retries,
+                    delay=delay
+                ) for query in queries
+            }
+            batch = await gather_partial(tasks, checkpoint_path)
+        return [result.get('response', {}).get('hits', []) if result else None for result in batch.ordered(queries)], batch.failures
+
+    """
+    Returns the Genius id, or the given field such as 'url', of the song best matching each Song and Artist,
+    None where no hit matches closely enough or the search failed,
+    and the error of each failed search, keyed by the (song, artist) pair as given
+    Searches are keyed on the querified song and artist, so each distinct song is searched once,
+    and not at all when the given SearchCache already holds its hits
+    Formatting of songs and hits runs in the worker processes of pool (CPUPool) when one is given
+    """
+    async def resolve_songs(self, songs, artists, retries, delay, cache=None, min_score=0.5, checkpoint_path=None, pool=None, field='id'):
+        # Imported on first use, numpy is only needed when hits are scored
+        from src.utils import song_matcher
+
+        inputs = list(zip(songs, artists))
+        distinct = list(dict.fromkeys(inputs))
+        querified = dict(zip(distinct, await _map(pool, song_querifier.querify_pair, distinct)))
+        # Joined with the unit separator, a space would key ('a b', 'c') and ('a', 'b c') the same
+        keys = {pair: f'{song}\x1f{artist}' for pair, (song, artist) in querified.items()}
+        unique = {keys[pair]: querified[pair] for pair in querified}
+
+        hits_by_key = cache.get_many(unique) if cache is not None else {}
+        missing = [key for key in unique if key not in hits_by_key]
+        errors = {}
+        if missing:
+            results, failures = await self.get_songs_data(
+                [unique[key][0] for key in missing], [unique[key][1] for key in missing], retries, delay, checkpoint_path
+            )
+            # get_songs_data keys its failures on the search query
+            errors = {
+                key: failures.get(f'{unique[key][0]} {unique[key][1]}', '')
+                for key, hits in zip(missing, results) if hits is None
+            }
+            found = [(key, hits) for key, hits in zip(missing, results) if hits is not None]
+            fetched = dict(zip([key for key, _ in found], await _map(pool, compact_hits, [hits for _, hits in found])))
+            hits_by_key.update(fetched)
+            if cache is not None and fetched:
+                cache.put_many(fetched)
+
+        resolved_keys = [key for key in unique if key in hits_by_key]
+        best = song_matcher.best_hits(
+            [unique[key] for key in resolved_keys],
+            [[tuple(hit['key']) for hit in hits_by_key[key]] for key in resolved_keys],
+            min_score=min_score,
+        )
+        ids = {
+            key: hits_by_key[key][index][field]
+            for key, index in zip(resolved_keys, best) if index is not None
+        }
+        return [ids.get(keys[pair]) for pair in inputs], {pair: errors[keys[pair]] for pair in distinct if keys[pair] in errors}
 
     @staticmethod
     def scrape_lyrics(url):
+        # Imported on first use, requests is only needed when lyrics are scraped
+        import requests
+
         response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        lyrics_div = soup.find('div', class_=re.compile(r'^Lyrics__Container'))
-        if lyrics_div:
-            text = lyrics_div.get_text("\n", strip=True)
-            text = ' '.join(text.splitlines())
-            return re.sub(r'\[.*?]', ' ', text)
-        return "Lyrics not found"
+        return parse_lyrics(response.text)
+
+    """
+    Returns the lyrics of each Genius song page, None for pages that failed, and the error of each failed page, keyed by its url
+    Pages are fetched concurrently, then parsed in the worker processes of pool (CPUPool) when one is given,
+    so parsing neither blocks the event loop nor is limited to one core
+    """
+    async def scrape_lyrics_batch(self, urls, retries, delay, pool=None, checkpoint_path=None):
+        async with aiohttp.ClientSession() as session:
+            tasks = {}
+            for url in dict.fromkeys(urls):
+                parts = urlsplit(url)
+                tasks[url] = lambda parts=parts: get_response(
+                    base_url=f'{parts.scheme}://{parts.netloc}',
+                    endpoint=parts.path,
+                    headers={},
+                    params={},
+                    session=session,
+                    retries=retries,
+                    delay=delay,
+                    as_text=True
+                )
+            batch = await gather_partial(tasks, checkpoint_path)
 
+        pages = [(url, html) for url, html in batch.results.items() if html is not None]
+        lyrics = dict(zip([url for url, _ in pages], await _map(pool, parse_lyrics, [html for _, html in pages])))
+        return [lyrics.get(url) for url in urls], batch.failures
@@ -0,0 +1,276 @@
+"""
+This class is responsible for running background CSV import jobs into the SQLite Database.
+Files are parsed in parallel worker processes and written by a single serialized writer thread,
+so that uploads never block the request that submitted them.
+"""
+
+import io
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+
+JOBS_TABLE = 'import_jobs'
+
+JOBS_TABLE_COLUMNS = [
+    'job_id TEXT PRIMARY KEY',
+    'file_name TEXT',
+    'table_name TEXT',
+    'status TEXT',
+    'rows_total INTEGER',
+    'rows_written INTEGER',
+    'error TEXT',
+    'created_at REAL',
+    'updated_at REAL',
+]
+
+STATUS_QUEUED = 'queued'
+STATUS_PARSING = 'parsing'
+STATUS_WRITING = 'writing'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+"""
+Parses a CSV file into SQL column definitions and rows
+Runs inside a worker process, so it only receives and returns picklable values
+Parameters:
+    - file_name (str) - The name of the uploaded file, used to derive the table name
+    - content (bytes) - The raw contents of the CSV file
+Returns:
+    - The table name (str)
+    - The column definitions (List[str])
+    - The rows (List[List])
+"""
+def _parse_csv(file_name: str, content: bytes) -> Tuple[str, List[str], List[List]]:
+    import pandas as pd
+    from utils import pandas_to_sql
+
+    table_name = pandas_to_sql.to_snake_case(os.path.splitext(file_name)[0])
+    df = pd.read_csv(io.BytesIO(content))
+    columns = pandas_to_sql.columns_from_df(table_name, df)
+    rows = pandas_to_sql.rows_from_df(df)
+    return table_name, columns, rows
+
+
+class ImportAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "JOB_SUBMITTED": "Import job {job_id} submitted for file '{file_name}'.",
+        "JOB_PARSED": "Import job {job_id} parsed {rows} row(s) for table '{table_name}'.",
+        "JOB_DONE": "Import job {job_id} finished writing table '{table_name}'.",
+        "JOB_FAILED": "Import job {job_id} failed: {error}",
+        "JOB_NOT_FOUND": "Import job {job_id} not found.",
+        "NO_FILES": "No files provided for import.",
+        "WRITER_STARTED": "Import writer started on database {db_path}.",
+        "WRITER_STOPPED": "Import writer stopped.",
+    }
+
+    def __init__(self, sqlite_api: SQLiteAPI, max_workers: Optional[int] = None, chunk_size: int = 5000):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._jobs_lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._writer: Optional[threading.Thread] = None
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    @property
+    def db_path(self) -> Optional[str]:
+        # Read at use time, the shared connection may be opened after this instance is created
+        return self.sqlite_api.db_path
+
+    """
+    Starts the parser pool and the writer thread if they are not already running
+    """
+    def start(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._writer = threading.Thread(target=self._write_loop, name='import-writer', daemon=True)
+        self._writer.start()
+
+    """
+    Stops accepting work, waits for queued writes to finish and shuts down the worker pool
+    """
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    """
+    Submits CSV files for background import, one table per file
+    Parameters:
+        - files (List[Tuple[str, bytes]]) - The file names and contents to import
+        - force_create (bool) - Whether to replace tables that already exist
+    Returns:
+        - A dictionary containing the submitted job ids
+        - HTTP Status Code (int)
+    """
+    def submit(self, files: List[Tuple[str, bytes]], force_create: bool = False) -> Tuple[Dict[str, Any], int]:
+        if not files:
+            message = self.MESSAGES["NO_FILES"]
+            self.logger.warning(message)
+            return {"error": message}, 400
+
+        self.start()
+        job_ids = []
+        for file_name, content in files:
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            job = {
+                'job_id': job_id,
+                'file_name': file_name,
+                'table_name': None,
+                'status': STATUS_QUEUED,
+                'rows_total': None,
+                'rows_written': 0,
+                'error': None,
+                'created_at': now,
+                'updated_at': now,
+            }
+            with self._jobs_lock:
+                self._jobs[job_id] = job
+            self._queue.put(('save', job_id, None))
+
+            # Set before submitting, a fast parse could otherwise finish and be written before the job is marked as parsing
+            self._set_status(job_id, STATUS_PARSING)
+            future = self._executor.submit(_parse_csv, file_name, content)
+            future.add_done_callback(
+                lambda f, job_id=job_id: self._queue.put(('write', job_id, (f, force_create)))
+            )
+
+            self.logger.info(self.MESSAGES["JOB_SUBMITTED"].format(job_id=job_id, file_name=file_name))
+            job_ids.append(job_id)
+
+        return {"jobs": job_ids}, 202
+
+    """
+    Retrieves the status of import jobs
+    Active jobs are served from memory, finished jobs from previous runs from the jobs table
+    Parameters:
+        - job_ids (List[str]) - The ids of the jobs to retrieve, or None for all known jobs
+    Returns:
+        - A list of dictionaries representing the jobs
+        - HTTP Status Code (int)
+    """
+    def get_jobs(self, job_ids: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], int]:
+        with self._jobs_lock:
+            jobs = {job_id: dict(job) for job_id, job in self._jobs.items()}
+
+        missing = [job_id for job_id in job_ids if job_id not in jobs] if job_ids else None
+        if missing or not job_ids:
+            for job in self._read_persisted_jobs():
+                jobs.setdefault(job['job_id'], job)
+
+        if job_ids:
+            result = [jobs[job_id] for job_id in job_ids if job_id in jobs]
+        else:
+            result = sorted(jobs.values(), key=lambda job: job['created_at'], reverse=True)
+        return result, 200
+
+    """
+    Retrieves the status of a single import job
+    Parameters:
+        - job_id (str) - The id of the job
+    Returns:
+        - A dictionary representing the job if found, None otherwise
+        - HTTP Status Code (int)
+    """
+    def get_job(self, job_id: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        jobs, _ = self.get_jobs([job_id])
+        if not jobs:
+            self.logger.warning(self.MESSAGES["JOB_NOT_FOUND"].format(job_id=job_id))
+            return None, 404
+        return jobs[0], 200
+
+    def _read_persisted_jobs(self) -> List[Dict[str, Any]]:
+        rows, status_code = self.sqlite_api.get_rows(JOBS_TABLE, [])
+        return rows if status_code == 200 and rows else []
+
+    def _set_status(self, job_id: str, status: str, **fields):
+        with self._jobs_lock:
+            job = self._jobs[job_id]
+            job['status'] = status
+            job.update(fields)
+            job['updated_at'] = time.time()
+
+    """
+    Runs on the writer thread. All SQLite writes made by import jobs go through this loop,
+    so parsing can run in parallel while inserts stay serialized on a single connection
+    """
+    def _write_loop(self):
+        writer = SQLiteAPI()
+        writer.connect(self.db_path)
+        writer.create_table(JOBS_TABLE, JOBS_TABLE_COLUMNS)
+        self.logger.info(self.MESSAGES["WRITER_STARTED"].format(db_path=self.db_path))
+
+        try:
+            while True:
+                command = self._queue.get()
+                if command is None:
+                    break
+                action, job_id, payload = command
+                if action == 'save':
+                    self._save_job(writer, job_id)
+                elif action == 'write':
+                    future, force_create = payload
+                    self._write_job(writer, job_id, future, force_create)
+        finally:
+            writer.disconnect()
+            self.logger.info(self.MESSAGES["WRITER_STOPPED"])
+
+    def _write_job(self, writer: SQLiteAPI, job_id: str, future, force_create: bool):
+        try:
+            table_name, columns, rows = future.result()
+            self._set_status(job_id, STATUS_WRITING, table_name=table_name, rows_total=len(rows))
+            self._save_job(writer, job_id)
+            self.logger.info(self.MESSAGES["JOB_PARSED"].format(job_id=job_id, rows=len(rows), table_name=table_name))
+
+            # One transaction for the whole table, so a failed chunk leaves neither the table nor the chunks before it
+            with writer.transaction(immediate=True):
+                message, status_code = writer.create_table(table_name, columns, force_create=force_create)
+                if status_code >= 300:
+                    raise RuntimeError(message)
+
+                for i in range(0, len(rows), self.chunk_size):
+                    chunk = rows[i:i + self.chunk_size]
+                    message, status_code = writer.insert_rows(table_name, chunk)
+                    if status_code >= 300:
+                        raise RuntimeError(message)
+                    self._set_status(job_id, STATUS_WRITING, rows_written=i + len(chunk))
+
+            self._set_status(job_id, STATUS_DONE)
+            self.logger.info(self.MESSAGES["JOB_DONE"].format(job_id=job_id, table_name=table_name))
+
+        except Exception as e:
+            self._set_status(job_id, STATUS_FAILED, error=str(e))
+            self.logger.error(self.MESSAGES["JOB_FAILED"].format(job_id=job_id, error=str(e)))
+
+        self._save_job(writer, job_id)
+
+    def _save_job(self, writer: SQLiteAPI, job_id: str):
+        with self._jobs_lock:
+            job = dict(self._jobs[job_id])
+        row = [job[column.split(' ')[0]] for column in JOBS_TABLE_COLUMNS]
+        placeholders = ', '.join(['?' for _ in row])
+        try:
+            writer.cursor.execute(f"INSERT OR REPLACE INTO {JOBS_TABLE} VALUES ({placeholders})", row)
+            writer.db.commit()
+        except Exception as e:
+            self.logger.error(f"Failed to save import job {job_id}: {str(e)}")
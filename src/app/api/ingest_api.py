@@ -0,0 +1,226 @@
+"""
+This class is responsible for buffering small row inserts and writing them to the SQLite Database in group commits.
+Inserts from concurrent requests are queued per request, and a single writer thread flushes them together
+in one transaction once enough rows are pending or the oldest insert has waited long enough.
+Each request is written under its own savepoint, so a failing request does not fail the others in its batch,
+and callers are only answered once the transaction holding their rows has been committed.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+from src.app.utils import metrics
+
+
+@dataclass
+class PendingInsert:
+    table_name: str
+    rows: List[List[Any]]
+    submitted_at: float = field(default_factory=time.monotonic)
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[Tuple[str, int]] = None
+
+
+class IngestAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "WRITER_STARTED": "Ingest writer started on database {db_path}.",
+        "WRITER_STOPPED": "Ingest writer stopped.",
+        "BATCH_COMMITTED": "Committed {rows} row(s) from {requests} insert request(s) in {seconds:.4f}s.",
+        "BATCH_FAIL": "Failed to commit an ingest batch of {requests} insert request(s): {error}",
+        "INSERT_PENDING": "Row(s) for table '{table_name}' were queued but not committed within {timeout}s.",
+        "SHUTTING_DOWN": "The ingest buffer is shutting down, retry the insert.",
+    }
+
+    def __init__(self, sqlite_api: SQLiteAPI, max_batch_rows: int = 5000, max_delay: float = 0.002,
+                 max_pending_rows: int = 100_000, timeout: float = 30.0):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self.max_pending_rows = max_pending_rows
+        self.timeout = timeout
+
+        self._pending: deque = deque()
+        self._pending_rows = 0
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._writer: Optional[threading.Thread] = None
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    @property
+    def db_path(self) -> Optional[str]:
+        return self.sqlite_api.db_path
+
+    """
+    Starts the writer thread if it is not already running
+    """
+    def start(self):
+        with self._condition:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._stopping = False
+            self._writer = threading.Thread(target=self._write_loop, name='ingest-writer', daemon=True)
+            self._writer.start()
+
+    """
+    Stops accepting inserts and waits for the pending ones to be committed
+    """
+    def shutdown(self):
+        with self._condition:
+            if self._writer is None:
+                return
+            self._stopping = True
+            self._condition.notify_all()
+        self._writer.join()
+        self._writer = None
+
+    """
+    Queues rows to be inserted into a table and waits until they are committed
+    Parameters:
+        - table_name (str) - The name of the table to insert rows into
+        - rows (List[List[Any]]) - A list of row data, with values in table column order
+    Returns:
+        Response message (str)
+        HTTP Status Code (int), 201 once committed, 202 if still queued after the timeout
+    """
+    def insert_rows(self, table_name: str, rows: List[List[Any]]) -> Tuple[str, int]:
+        if not isinstance(rows, list) or not all(isinstance(row, (list, tuple)) for row in rows):
+            return self.sqlite_api.MESSAGES["INVALID_ROWS"].format(table_name=table_name), 400
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+
+        self.start()
+        pending = PendingInsert(table_name, rows)
+        with self._condition:
+            # Block writers while the buffer is full, so memory stays bounded under sustained load
+            while self._pending_rows >= self.max_pending_rows and not self._stopping:
+                self._condition.wait()
+            if self._stopping:
+                return self.MESSAGES["SHUTTING_DOWN"], 503
+            self._pending.append(pending)
+            self._pending_rows += len(rows)
+            self._condition.notify_all()
+
+        if not pending.done.wait(self.timeout):
+            message = self.MESSAGES["INSERT_PENDING"].format(table_name=table_name, timeout=self.timeout)
+            self.logger.warning(message)
+            return message, 202
+        return pending.result
+
+    """
+    Waits for the next batch, flushing early once it holds max_batch_rows rows
+    Returns None once stopped with nothing left to write
+    """
+    def _next_batch(self) -> Optional[List[PendingInsert]]:
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+            if not self._pending:
+                return None
+
+            deadline = self._pending[0].submitted_at + self.max_delay
+            while self._pending_rows < self.max_batch_rows and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch, rows = [], 0
+            while self._pending and (not batch or rows + len(self._pending[0].rows) <= self.max_batch_rows):
+                pending = self._pending.popleft()
+                batch.append(pending)
+                rows += len(pending.rows)
+            self._pending_rows -= rows
+            self._condition.notify_all()
+            return batch
+
+    """
+    Runs on the writer thread. Inserts are written on a dedicated connection, one transaction per batch
+    """
+    def _write_loop(self):
+        writer = SQLiteAPI()
+        writer.connect(self.db_path)
+        self.logger.info(self.MESSAGES["WRITER_STARTED"].format(db_path=self.db_path))
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                self._write_batch(writer, batch)
+        finally:
+            writer.disconnect()
+            self.logger.info(self.MESSAGES["WRITER_STOPPED"])
+
+    def _insert_query(self, writer: SQLiteAPI, table_name: str, queries: Dict[str, Any]):
+        if table_name not in queries:
+            if not writer._table_exists(table_name):
+                queries[table_name] = None
+            else:
+                writer._execute(f"PRAGMA table_info({table_name})")
+                columns_info = writer._fetchall()
+                placeholders = ', '.join(['?' for _ in columns_info])
+                column_names = ', '.join(info[1] for info in columns_info)
+                queries[table_name] = (f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})", columns_info)
+        return queries[table_name]
+
+    def _write_batch(self, writer: SQLiteAPI, batch: List[PendingInsert]):
+        messages = self.sqlite_api.MESSAGES
+        start = time.perf_counter()
+        queries: Dict[str, Any] = {}
+        written: List[PendingInsert] = []
+        try:
+            writer._execute("BEGIN")
+            for pending in batch:
+                query = self._insert_query(writer, pending.table_name, queries)
+                if query is None:
+                    pending.result = messages["TABLE_NOT_FOUND"].format(table_name=pending.table_name), 404
+                    continue
+                writer._execute("SAVEPOINT ingest_request")
+                try:
+                    writer._executemany(query[0], pending.rows)
+                    writer._execute("RELEASE ingest_request")
+                    written.append(pending)
+                except Exception as e:
+                    writer._execute("ROLLBACK TO ingest_request")
+                    writer._execute("RELEASE ingest_request")
+                    pending.result = messages["ROWS_INSERTION_FAIL"].format(table_name=pending.table_name) + f" {str(e)}", 500
+            writer.db.commit()
+
+        except Exception as e:
+            writer.db.rollback()
+            self.logger.error(self.MESSAGES["BATCH_FAIL"].format(requests=len(batch), error=str(e)))
+            for pending in batch:
+                if pending in written or pending.result is None:
+                    pending.result = messages["ROWS_INSERTION_FAIL"].format(table_name=pending.table_name) + f" {str(e)}", 500
+            written = []
+
+        rows = sum(len(pending.rows) for pending in written)
+        seconds = time.perf_counter() - start
+        metrics.INGEST_BATCH_ROWS.observe(rows)
+        metrics.INGEST_BATCH_SECONDS.observe(seconds)
+        self.logger.debug(self.MESSAGES["BATCH_COMMITTED"].format(rows=rows, requests=len(written), seconds=seconds))
+
+        # Write hooks observe the shared connection, tell them once the rows are visible to it
+        if self.sqlite_api._write_hooks:
+            keys_by_table: Dict[str, Optional[List[Any]]] = {}
+            for pending in written:
+                keys = SQLiteAPI._row_keys(pending.rows, queries[pending.table_name][1])
+                if keys is None:
+                    keys_by_table[pending.table_name] = None
+                elif keys_by_table.get(pending.table_name, []) is not None:
+                    keys_by_table.setdefault(pending.table_name, []).extend(keys)
+            for table_name, keys in keys_by_table.items():
+                self.sqlite_api.notify_write(table_name, keys)
+
+        for pending in written:
+            pending.result = messages["ROWS_INSERTION_SUCCESS"].format(table_name=pending.table_name), 201
+        for pending in batch:
+            pending.done.set()
@@ -0,0 +1,234 @@
+"""
+This class is responsible for storage maintenance of the SQLite Database.
+Free pages left by dropped tables and deleted rows are returned to the file system with
+PRAGMA incremental_vacuum in small steps, each its own short write transaction, instead of a full VACUUM
+that rewrites the whole file and blocks every request. ANALYZE and PRAGMA optimize keep the query planner
+statistics current. Tasks run on a background thread with a dedicated connection, or on request.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+# Rows ANALYZE samples per index, bounds its cost on large tables
+ANALYSIS_LIMIT = 1000
+
+
+class MaintenanceAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "SCHEDULER_STARTED": "Maintenance scheduler started on database {db_path}.",
+        "SCHEDULER_STOPPED": "Maintenance scheduler stopped.",
+        "TASK_DONE": "Maintenance task '{task}' finished in {seconds:.3f}s: {result}",
+        "TASK_FAIL": "Maintenance task '{task}' failed: {error}",
+        "TASK_NOT_FOUND": "Maintenance task '{task}' not found, expected one of: {tasks}.",
+        "TASK_RUNNING": "Another maintenance task is running, retry later.",
+        "STATS_FAIL": "Failed to read storage stats: {error}",
+    }
+
+    """
+    Parameters:
+        - sqlite_api (SQLiteAPI) - The shared API, whose database is maintained
+        - interval (float) - Seconds between scheduler wake-ups
+        - vacuum_step_pages (int) - Pages freed per incremental_vacuum transaction
+        - vacuum_step_pause (float) - Seconds between vacuum steps, leaving the write lock to requests
+        - vacuum_max_pages (int) - Pages freed per scheduled run at most
+        - analyze_interval (float) - Seconds between ANALYZE runs
+        - optimize_interval (float) - Seconds between PRAGMA optimize runs
+    """
+    def __init__(self, sqlite_api: SQLiteAPI, interval: float = 300, vacuum_step_pages: int = 256,
+                 vacuum_step_pause: float = 0.05, vacuum_max_pages: int = 65536,
+                 analyze_interval: float = 6 * 3600, optimize_interval: float = 3600):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.interval = interval
+        self.vacuum_step_pages = vacuum_step_pages
+        self.vacuum_step_pause = vacuum_step_pause
+        self.vacuum_max_pages = vacuum_max_pages
+
+        self.tasks = {
+            'incremental_vacuum': (self._incremental_vacuum, interval),
+            'analyze': (self._analyze, analyze_interval),
+            'optimize': (self._optimize, optimize_interval),
+            # Only run on request, it rewrites the file once with a full VACUUM
+            'enable_incremental_vacuum': (self._enable_incremental_vacuum, None),
+        }
+        self._history: Dict[str, Dict[str, Any]] = {}
+        self._task_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._connection: Optional[SQLiteAPI] = None
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    @property
+    def db_path(self) -> Optional[str]:
+        return self.sqlite_api.db_path
+
+    """
+    Starts the scheduler thread if it is not already running
+    """
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._schedule_loop, name='maintenance-scheduler', daemon=True)
+        self._thread.start()
+
+    """
+    Stops the scheduler, waiting for a running task to finish its current step
+    """
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._task_lock:
+            if self._connection is not None:
+                self._connection.disconnect()
+                self._connection = None
+
+    def _writer(self) -> SQLiteAPI:
+        # Created on first use, tasks never share the cursor used by requests
+        if self._connection is None:
+            self._connection = SQLiteAPI()
+            self._connection.connect(self.db_path)
+        return self._connection
+
+    def _schedule_loop(self):
+        self.logger.info(self.MESSAGES["SCHEDULER_STARTED"].format(db_path=self.db_path))
+        while not self._stop.wait(self.interval):
+            now = time.time()
+            for task, (_, task_interval) in self.tasks.items():
+                if task_interval is None or self._stop.is_set():
+                    continue
+                last_run = self._history.get(task, {}).get('finished_at', 0)
+                if now - last_run >= task_interval:
+                    self.run_task(task, wait=False)
+        self.logger.info(self.MESSAGES["SCHEDULER_STOPPED"])
+
+    """
+    Runs a maintenance task now
+    Parameters:
+        - task (str) - The name of the task, one of MaintenanceAPI.tasks
+        - wait (bool) - Whether to wait for a running task to finish first
+    Returns:
+        - A dictionary describing the run, or a message on failure
+        - HTTP Status Code (int)
+    """
+    def run_task(self, task: str, wait: bool = True) -> Tuple[Any, int]:
+        if task not in self.tasks:
+            return self.MESSAGES["TASK_NOT_FOUND"].format(task=task, tasks=', '.join(self.tasks)), 404
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        if not self._task_lock.acquire(blocking=wait):
+            return self.MESSAGES["TASK_RUNNING"], 409
+
+        try:
+            function, _ = self.tasks[task]
+            start = time.perf_counter()
+            run = {'task': task, 'started_at': time.time()}
+            try:
+                run['result'] = function(self._writer())
+                run['status'] = 'done'
+                status_code = 200
+            except Exception as e:
+                self._writer().db.rollback()
+                run['error'] = str(e)
+                run['status'] = 'failed'
+                status_code = 500
+            run['seconds'] = time.perf_counter() - start
+            run['finished_at'] = time.time()
+            self._history[task] = run
+
+            if status_code == 200:
+                self.logger.info(self.MESSAGES["TASK_DONE"].format(task=task, seconds=run['seconds'], result=run['result']))
+            else:
+                self.logger.error(self.MESSAGES["TASK_FAIL"].format(task=task, error=run['error']))
+            return run, status_code
+        finally:
+            self._task_lock.release()
+
+    def _pragma(self, writer: SQLiteAPI, name: str):
+        writer._execute(f"PRAGMA {name}")
+        return writer._fetchone()[0]
+
+    """
+    Frees up to vacuum_max_pages free pages, vacuum_step_pages at a time
+    Each step is its own transaction, so requests can write between steps
+    """
+    def _incremental_vacuum(self, writer: SQLiteAPI) -> Dict[str, Any]:
+        if self._pragma(writer, 'auto_vacuum') != 2:
+            return {'freed_pages': 0, 'skipped': "auto_vacuum is not incremental"}
+        freed = 0
+        while freed < self.vacuum_max_pages and not self._stop.is_set():
+            free_pages = self._pragma(writer, 'freelist_count')
+            if free_pages == 0:
+                break
+            step = min(self.vacuum_step_pages, free_pages, self.vacuum_max_pages - freed)
+            # The pragma frees one page per step of the statement, so it has to be read to the end
+            writer._execute(f"PRAGMA incremental_vacuum({step})")
+            writer._fetchall()
+            writer.db.commit()
+            freed += step
+            time.sleep(self.vacuum_step_pause)
+        return {'freed_pages': freed, 'freelist_count': self._pragma(writer, 'freelist_count')}
+
+    def _analyze(self, writer: SQLiteAPI) -> Dict[str, Any]:
+        writer._execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        writer._fetchall()
+        writer._execute("ANALYZE")
+        writer.db.commit()
+        return {'analysis_limit': ANALYSIS_LIMIT}
+
+    def _optimize(self, writer: SQLiteAPI) -> Dict[str, Any]:
+        writer._execute("PRAGMA optimize")
+        writer._fetchall()
+        writer.db.commit()
+        return {}
+
+    def _enable_incremental_vacuum(self, writer: SQLiteAPI) -> Dict[str, Any]:
+        mode = self._pragma(writer, 'auto_vacuum')
+        if mode == 2:
+            return {'auto_vacuum': AUTO_VACUUM_MODES[mode], 'vacuumed': False}
+        # Changing the mode of a database with tables only takes effect after a full VACUUM
+        writer._execute("PRAGMA auto_vacuum = INCREMENTAL")
+        writer._execute("VACUUM")
+        return {'auto_vacuum': AUTO_VACUUM_MODES[self._pragma(writer, 'auto_vacuum')], 'vacuumed': True}
+
+    """
+    Retrieves storage stats of the database: page usage, free pages and the last run of each task
+    Returns:
+        - A dictionary of stats
+        - HTTP Status Code (int)
+    """
+    def get_stats(self) -> Tuple[Any, int]:
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        try:
+            # Read on the shared connection, so stats are not held up by a running task
+            page_size = self._pragma(self.sqlite_api, 'page_size')
+            page_count = self._pragma(self.sqlite_api, 'page_count')
+            freelist_count = self._pragma(self.sqlite_api, 'freelist_count')
+            auto_vacuum = self._pragma(self.sqlite_api, 'auto_vacuum')
+            return {
+                'auto_vacuum': AUTO_VACUUM_MODES.get(auto_vacuum, auto_vacuum),
+                'page_size': page_size,
+                'page_count': page_count,
+                'freelist_count': freelist_count,
+                'file_bytes': os.path.getsize(self.db_path),
+                'free_bytes': freelist_count * page_size,
+                'free_ratio': freelist_count / page_count if page_count else 0.0,
+                'tasks': {task: self._history.get(task) for task in self.tasks},
+            }, 200
+        except Exception as e:
+            message = self.MESSAGES["STATS_FAIL"].format(error=str(e))
+            self.logger.error(message)
+            return message, 500
@@ -0,0 +1,371 @@
+"""
+This class is responsible for the materialized summary views read by the Dashboard.
+Each view is a declared summary query over the normalized catalog tables, stored as a real table.
+Views grouped by a key are refreshed incrementally from SQLiteAPI write hooks: only the groups touched
+by the written rows, before and after the write, are recomputed. Views without a key are marked stale
+on writes and recomputed in full on their next read. Refresh times and staleness are recorded per view.
+Views are read and refreshed on a connection of their own, as write hooks and the refresh job run on other threads
+than the requests using the shared connection.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional, List, Dict, Any, Set, Tuple
+from app.api.sqlite_api import SQLiteAPI
+from src.app.utils.query_compiler import compile_query, QueryValidationError
+from app.api.catalog_api import TRACKS_TABLE, ARTISTS_TABLE, TRACK_ARTISTS_TABLE, AUDIO_FEATURES_TABLE
+
+METADATA_TABLE = 'materialized_views'
+
+METADATA_COLUMNS = [
+    'name TEXT PRIMARY KEY',
+    'refreshed_at REAL',
+    'refresh_seconds REAL',
+    'refresh_mode TEXT',
+    'row_count INTEGER',
+    'source_changed_at REAL',
+    'pending_changes INTEGER',
+    'stale INTEGER',
+]
+
+# Keeps IN (...) lists well below SQLite's bound parameter limit
+_IN_CLAUSE_BATCH = 500
+
+
+class ViewDefinition:
+    """
+    A summary query materialized into a table
+    Parameters:
+        - name (str) - The name of the view table
+        - columns (List[str]) - Column definitions of the view table, the key column first if keyed
+        - select (str) - The summary query, with a {key_filter} placeholder inside its WHERE clause
+        - sources (Dict[str, Optional[str]]) - Source table mapped to a query selecting the view keys of
+                                               the source rows whose primary key is IN ({ids}), None if unkeyed
+        - key_expression (str) - The SQL expression of the key in the select, None for views refreshed in full
+        - description (str) - Shown alongside the view metadata
+    """
+
+    def __init__(self, name: str, columns: List[str], select: str, sources: Dict[str, Optional[str]], key_expression: Optional[str] = None, description: str = ''):
+        self.name = name
+        self.columns = columns
+        self.select = select
+        self.sources = sources
+        self.key_expression = key_expression
+        self.key_column = columns[0].split()[0] if key_expression else None
+        self.description = description
+
+    @property
+    def incremental(self) -> bool:
+        return self.key_expression is not None
+
+
+VIEWS = [
+    ViewDefinition(
+        name='mv_top_artists',
+        columns=['artist_id TEXT PRIMARY KEY', 'artist_name TEXT', 'track_count INTEGER', 'avg_popularity REAL'],
+        select=(
+            f"SELECT ta.artist_id AS artist_id, MAX(a.name) AS artist_name, COUNT(*) AS track_count, AVG(t.popularity) AS avg_popularity "
+            f"FROM {TRACK_ARTISTS_TABLE} ta JOIN {TRACKS_TABLE} t ON t.id = ta.track_id LEFT JOIN {ARTISTS_TABLE} a ON a.id = ta.artist_id "
+            f"WHERE t.removed_at IS NULL {{key_filter}} "
+            f"GROUP BY ta.artist_id"
+        ),
+        sources={
+            TRACKS_TABLE: f"SELECT DISTINCT artist_id FROM {TRACK_ARTISTS_TABLE} WHERE track_id IN ({{ids}})",
+            ARTISTS_TABLE: f"SELECT id FROM {ARTISTS_TABLE} WHERE id IN ({{ids}})",
+        },
+        key_expression="ta.artist_id",
+        description='Number of live tracks and average popularity per artist.',
+    ),
+    ViewDefinition(
+        name='mv_key_distribution',
+        columns=['key INTEGER PRIMARY KEY', 'major_count INTEGER', 'minor_count INTEGER', 'track_count INTEGER'],
+        select=(
+            f"SELECT f.key AS key, SUM(f.mode = 1) AS major_count, SUM(f.mode = 0) AS minor_count, COUNT(*) AS track_count "
+            f"FROM {AUDIO_FEATURES_TABLE} f JOIN {TRACKS_TABLE} t ON t.id = f.track_id "
+            f"WHERE t.removed_at IS NULL AND f.key IS NOT NULL {{key_filter}} "
+            f"GROUP BY f.key"
+        ),
+        sources={
+            AUDIO_FEATURES_TABLE: f"SELECT DISTINCT key FROM {AUDIO_FEATURES_TABLE} WHERE track_id IN ({{ids}})",
+            TRACKS_TABLE: f"SELECT DISTINCT key FROM {AUDIO_FEATURES_TABLE} WHERE track_id IN ({{ids}})",
+        },
+        key_expression="f.key",
+        description='Number of live tracks per musical key, split by mode.',
+    ),
+    ViewDefinition(
+        name='mv_audio_feature_averages',
+        columns=[
+            'track_count INTEGER', 'danceability REAL', 'energy REAL', 'valence REAL', 'acousticness REAL',
+            'instrumentalness REAL', 'speechiness REAL', 'liveness REAL', 'loudness REAL', 'tempo REAL',
+        ],
+        select=(
+            f"SELECT COUNT(*), AVG(f.danceability), AVG(f.energy), AVG(f.valence), AVG(f.acousticness), "
+            f"AVG(f.instrumentalness), AVG(f.speechiness), AVG(f.liveness), AVG(f.loudness), AVG(f.tempo) "
+            f"FROM {AUDIO_FEATURES_TABLE} f JOIN {TRACKS_TABLE} t ON t.id = f.track_id "
+            f"WHERE t.removed_at IS NULL {{key_filter}}"
+        ),
+        sources={AUDIO_FEATURES_TABLE: None, TRACKS_TABLE: None},
+        description='Average audio features over the live library.',
+    ),
+]
+
+
+class MaterializedViewAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "VIEW_NOT_FOUND": "View '{name}' not found.",
+        "VIEW_REFRESHED": "View '{name}' refreshed ({mode}) in {seconds:.3f}s.",
+        "VIEW_REFRESH_FAIL": "Failed to refresh view '{name}': {error}",
+        "VIEW_SOURCES_MISSING": "View '{name}' left empty, source table(s) {tables} do not exist yet.",
+        "VIEW_RETRIEVAL_FAIL": "Failed to retrieve view '{name}': {error}",
+    }
+
+    def __init__(self, sqlite_api: SQLiteAPI, views: Optional[List[ViewDefinition]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.views: Dict[str, ViewDefinition] = {view.name: view for view in (views if views is not None else VIEWS)}
+        self._views_by_source: Dict[str, List[ViewDefinition]] = {}
+        for view in self.views.values():
+            for source in view.sources:
+                self._views_by_source.setdefault(source, []).append(view)
+
+        # Keys of each view touched by writes that are not yet refreshed, None meaning a full refresh is needed
+        self._dirty_keys: Dict[str, Optional[Set[Any]]] = {}
+        self._created = False
+        self._lock = threading.RLock()
+        self._connection: Optional[SQLiteAPI] = None
+        sqlite_api.add_write_hook(self._on_write)
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    def shutdown(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.disconnect()
+                self._connection = None
+
+    def _writer(self) -> SQLiteAPI:
+        # Created on first use, without write hooks, as its writes are only to the view tables
+        if self._connection is None:
+            connection = SQLiteAPI()
+            message, status_code = connection.connect(self.sqlite_api.db_path)
+            if status_code >= 300:
+                raise RuntimeError(message)
+            self._connection = connection
+        return self._connection
+
+    def _ensure_created(self):
+        if self._created:
+            return
+        with self._lock:
+            if self._created:
+                return
+            connection = self._writer()
+            connection.create_table(METADATA_TABLE, METADATA_COLUMNS)
+            for view in self.views.values():
+                if not connection._table_exists(view.name):
+                    connection.create_table(view.name, view.columns)
+                    self._dirty_keys[view.name] = None
+            # Views left stale by a previous process are refreshed in full on their next read
+            connection._execute(f"SELECT name FROM {METADATA_TABLE} WHERE stale = 1")
+            for (name,) in connection._fetchall():
+                if name in self.views:
+                    self._dirty_keys[name] = None
+            self._created = True
+
+    """
+    SQLiteAPI write hook: records the view keys touched by written rows and refreshes keyed views
+    Keys are collected before the write as well, so groups that rows move out of are recomputed too
+    Before the write only reads are made, the writer may already hold the write lock of its transaction
+    """
+    def _on_write(self, phase: str, table_name: str, keys: Optional[List[Any]]):
+        views = self._views_by_source.get(table_name)
+        if not views or not self.sqlite_api.connected:
+            return
+        with self._lock:
+            for view in views:
+                self._mark_dirty(view, table_name, keys)
+            if phase != 'after':
+                return
+            self._ensure_created()
+            now = time.time()
+            for view in views:
+                self._record_change(view, now)
+                if view.incremental:
+                    self._refresh(view)
+
+    def _mark_dirty(self, view: ViewDefinition, table_name: str, keys: Optional[List[Any]]):
+        if view.name in self._dirty_keys and self._dirty_keys[view.name] is None:
+            return
+        keys_query = view.sources[table_name]
+        if keys is None or keys_query is None or not view.incremental:
+            self._dirty_keys[view.name] = None
+            return
+        dirty = self._dirty_keys.setdefault(view.name, set())
+        connection = self._writer()
+        for i in range(0, len(keys), _IN_CLAUSE_BATCH):
+            batch = keys[i:i + _IN_CLAUSE_BATCH]
+            connection._execute(keys_query.format(ids=', '.join('?' for _ in batch)), batch)
+            dirty.update(row[0] for row in connection._fetchall() if row[0] is not None)
+
+    def _record_change(self, view: ViewDefinition, now: float):
+        connection = self._writer()
+        with connection.transaction(immediate=True):
+            connection._execute(
+                f"INSERT INTO {METADATA_TABLE} (name, source_changed_at, pending_changes, stale) VALUES (?, ?, 1, 1) "
+                f"ON CONFLICT(name) DO UPDATE SET source_changed_at = excluded.source_changed_at, "
+                f"pending_changes = COALESCE(pending_changes, 0) + 1, stale = 1",
+                (view.name, now)
+            )
+
+    """
+    Recomputes the dirty part of a view, or all of it
+    Parameters:
+        - view (ViewDefinition) - The view to refresh
+        - full (bool) - Recompute the whole view even if only some keys are dirty
+    Returns:
+        - The refresh mode used, 'full', 'incremental' or None if nothing was dirty
+    """
+    def _refresh(self, view: ViewDefinition, full: bool = False) -> Optional[str]:
+        if view.name not in self._dirty_keys and not full:
+            return None
+        dirty = None if full else self._dirty_keys.get(view.name)
+        start = time.perf_counter()
+        connection = self._writer()
+
+        missing = [source for source in view.sources if not connection._table_exists(source)]
+        with connection.transaction(immediate=True):
+            if missing:
+                connection._execute(f"DELETE FROM {view.name}")
+                self.logger.info(self.MESSAGES["VIEW_SOURCES_MISSING"].format(name=view.name, tables=', '.join(missing)))
+                mode = 'full'
+            elif dirty is None:
+                connection._execute(f"DELETE FROM {view.name}")
+                connection._execute(f"INSERT INTO {view.name} {view.select.format(key_filter='')}")
+                mode = 'full'
+            else:
+                keys = list(dirty)
+                for i in range(0, len(keys), _IN_CLAUSE_BATCH):
+                    batch = keys[i:i + _IN_CLAUSE_BATCH]
+                    placeholders = ', '.join('?' for _ in batch)
+                    connection._execute(f"DELETE FROM {view.name} WHERE {view.key_column} IN ({placeholders})", batch)
+                    key_filter = f"AND {view.key_expression} IN ({placeholders})"
+                    connection._execute(f"INSERT INTO {view.name} {view.select.format(key_filter=key_filter)}", batch)
+                mode = 'incremental'
+
+            connection._execute(f"SELECT COUNT(*) FROM {view.name}")
+            row_count = connection._fetchone()[0]
+            seconds = time.perf_counter() - start
+            connection._execute(
+                f"INSERT INTO {METADATA_TABLE} (name, refreshed_at, refresh_seconds, refresh_mode, row_count, pending_changes, stale) "
+                f"VALUES (?, ?, ?, ?, ?, 0, 0) ON CONFLICT(name) DO UPDATE SET refreshed_at = excluded.refreshed_at, "
+                f"refresh_seconds = excluded.refresh_seconds, refresh_mode = excluded.refresh_mode, "
+                f"row_count = excluded.row_count, pending_changes = 0, stale = 0",
+                (view.name, time.time(), seconds, mode, row_count)
+            )
+
+        self._dirty_keys.pop(view.name, None)
+        self.logger.debug(self.MESSAGES["VIEW_REFRESHED"].format(name=view.name, mode=mode, seconds=seconds))
+        return mode
+
+    """
+    Refreshes a view
+    Parameters:
+        - name (str) - The name of the view
+        - full (bool) - Recompute the whole view instead of only its dirty keys
+    Returns:
+        - The metadata of the view after the refresh
+        - HTTP Status Code (int)
+    """
+    def refresh(self, name: str, full: bool = False) -> Tuple[Any, int]:
+        view = self.views.get(name)
+        if view is None:
+            return self.MESSAGES["VIEW_NOT_FOUND"].format(name=name), 404
+        try:
+            self._ensure_created()
+            with self._lock:
+                self._refresh(view, full=full)
+            return self._get_metadata(name), 200
+        except Exception as e:
+            message = self.MESSAGES["VIEW_REFRESH_FAIL"].format(name=name, error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+    """Refreshes every view with pending changes, e.g. from a periodic job"""
+    def refresh_stale(self) -> Tuple[Any, int]:
+        try:
+            self._ensure_created()
+            with self._lock:
+                refreshed = {name: self._refresh(self.views[name]) for name in list(self._dirty_keys)}
+            return {"refreshed": refreshed}, 200
+        except Exception as e:
+            message = self.MESSAGES["VIEW_REFRESH_FAIL"].format(name='*', error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+    def _get_metadata(self, name: str) -> Dict[str, Any]:
+        connection = self._writer()
+        connection._execute(
+            f"SELECT refreshed_at, refresh_seconds, refresh_mode, row_count, source_changed_at, pending_changes, stale "
+            f"FROM {METADATA_TABLE} WHERE name = ?",
+            (name,)
+        )
+        row = connection._fetchone() or (None,) * 7
+        metadata = dict(zip(['refreshed_at', 'refresh_seconds', 'refresh_mode', 'row_count', 'source_changed_at', 'pending_changes', 'stale'], row))
+        metadata['stale'] = bool(metadata['stale']) or name in self._dirty_keys
+        metadata['age_seconds'] = time.time() - metadata['refreshed_at'] if metadata['refreshed_at'] else None
+        view = self.views[name]
+        metadata.update(name=name, description=view.description, incremental=view.incremental)
+        return metadata
+
+    """
+    Returns the definition and staleness metadata of every view
+    Returns:
+        - A dictionary with a "views" list
+        - HTTP Status Code (int)
+    """
+    def get_views(self) -> Tuple[Any, int]:
+        try:
+            self._ensure_created()
+            with self._lock:
+                return {"views": [self._get_metadata(name) for name in self.views]}, 200
+        except Exception as e:
+            message = self.MESSAGES["VIEW_RETRIEVAL_FAIL"].format(name='*', error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+    """
+    Returns the rows of a view, refreshing it first if it has pending changes
+    Parameters:
+        - name (str) - The name of the view
+        - spec (dict) - An optional query spec (order_by, limit, filters, ...) applied to the view table
+    Returns:
+        - A dictionary with the "columns", "rows" and "metadata" of the view
+        - HTTP Status Code (int)
+    """
+    def get_view(self, name: str, spec: Optional[Dict[str, Any]] = None) -> Tuple[Any, int]:
+        view = self.views.get(name)
+        if view is None:
+            return self.MESSAGES["VIEW_NOT_FOUND"].format(name=name), 404
+        try:
+            self._ensure_created()
+            with self._lock:
+                self._refresh(view)
+                connection = self._writer()
+                connection._execute(f"PRAGMA table_info({name})")
+                columns = [info[1] for info in connection._fetchall()]
+                try:
+                    query, parameters = compile_query(name, columns, spec or {})
+                except QueryValidationError as e:
+                    return str(e), 400
+                cursor = connection._execute(query, parameters)
+                result_columns = [column[0] for column in cursor.description]
+                rows = connection._fetchall()
+                return {"columns": result_columns, "rows": rows, "metadata": self._get_metadata(name)}, 200
+        except Exception as e:
+            message = self.MESSAGES["VIEW_RETRIEVAL_FAIL"].format(name=name, error=str(e))
+            self.logger.error(message)
+            return message, 500
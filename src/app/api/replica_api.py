@@ -0,0 +1,267 @@
+"""
+This class is responsible for serving reads of the SQLite Database from read-only connections.
+Reads are taken off the shared connection, which stays with the writes: each read checks out a connection
+of a small pool, opened with query_only and memory-mapped I/O, so reads run in parallel and read pages
+straight from the OS page cache instead of copying them through system calls.
+In 'direct' mode the pool reads the database file itself and sees every committed write,
+the writer keeps the database in WAL mode so reads and writes do not wait for each other.
+In 'snapshot' mode the pool reads a copy refreshed every snapshot_interval seconds with the backup API,
+so long analytical scans run off the database file entirely, at the cost of reads lagging writes by up to
+one interval. Until the first snapshot is taken, reads use the database file.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple
+from app.api.sqlite_api import SQLiteAPI
+
+MODE_OFF = 'off'
+MODE_DIRECT = 'direct'
+MODE_SNAPSHOT = 'snapshot'
+MODES = (MODE_OFF, MODE_DIRECT, MODE_SNAPSHOT)
+
+# Pages a snapshot copies per step, the read lock on the database is released between steps
+SNAPSHOT_STEP_PAGES = 1024
+# A write between two steps restarts the copy, after this many restarts it is copied again in one step
+SNAPSHOT_MAX_RESTARTS = 3
+
+
+class _SnapshotRestarted(Exception):
+    pass
+
+
+class ReadReplicaAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "INVALID_MODE": "Invalid read replica mode '{mode}', expected one of: {modes}.",
+        "REPLICA_STARTED": "Read replica started in {mode} mode on {path}.",
+        "REPLICA_STOPPED": "Read replica stopped.",
+        "SNAPSHOT_TAKEN": "Snapshot of {db_path} taken in {seconds:.3f}s ({pages} pages).",
+        "SNAPSHOT_FAIL": "Failed to take a snapshot of {db_path}: {error}",
+        "READER_FAIL": "Failed to open a read-only connection to {path}: {error}",
+    }
+
+    """
+    Parameters:
+        - sqlite_api (SQLiteAPI) - The shared API, whose database is read
+        - mode (str) - 'direct', 'snapshot', or 'off' to read on the shared connection
+        - mmap_size (int) - Bytes of the file each reader maps into memory
+        - max_readers (int) - Read-only connections open at most, further reads wait for one
+        - snapshot_path (str) - The snapshot file, defaults to <database>_snapshot next to the database
+        - snapshot_interval (float) - Seconds between snapshots
+    Raises:
+        - ValueError if the mode is not one of MODES
+    """
+    def __init__(self, sqlite_api: SQLiteAPI, mode: str = MODE_DIRECT, mmap_size: int = 256 * 2**20, max_readers: int = 8,
+                 snapshot_path: Optional[str] = None, snapshot_interval: float = 60):
+        if mode not in MODES:
+            raise ValueError(self.MESSAGES["INVALID_MODE"].format(mode=mode, modes=', '.join(MODES)))
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.mode = mode
+        self.mmap_size = mmap_size
+        self.max_readers = max(1, max_readers)
+        self.snapshot_interval = snapshot_interval
+        self._snapshot_path = snapshot_path
+
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_readers)
+        self._lock = threading.Lock()
+        # Bumped whenever the file read changes, readers of an older generation are closed when returned
+        self._generation = 0
+        self._source: Optional[str] = None
+        self._snapshot_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        if self._snapshot_path is None and self.sqlite_api.db_path is not None:
+            root, extension = os.path.splitext(self.sqlite_api.db_path)
+            return f"{root}_snapshot{extension}"
+        return self._snapshot_path
+
+    """
+    Starts taking snapshots in snapshot mode, reads are served from the database file until the first one is taken
+    """
+    def start(self):
+        self.logger.info(self.MESSAGES["REPLICA_STARTED"].format(mode=self.mode, path=self._source or self.sqlite_api.db_path))
+        if self.mode != MODE_SNAPSHOT or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._snapshot_loop, name='read-replica-snapshots', daemon=True)
+        self._thread.start()
+
+    """
+    Stops taking snapshots and closes the idle readers, readers in use are closed when they are returned
+    """
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._generation += 1
+        self._close_idle()
+        self.logger.info(self.MESSAGES["REPLICA_STOPPED"])
+
+    def _close_idle(self):
+        while True:
+            try:
+                reader, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            reader.disconnect()
+
+    def _snapshot_loop(self):
+        while not self._stop.is_set():
+            self.take_snapshot()
+            self._stop.wait(self.snapshot_interval)
+
+    """
+    Copies the database into the snapshot file with the backup API and switches readers over to it
+    The copy is written next to the snapshot and renamed over it, so readers never see a partial copy
+    and readers still open on the previous snapshot finish their reads on it
+    Returns:
+        - A dictionary describing the snapshot, or a message on failure
+        - HTTP Status Code (int)
+    """
+    def take_snapshot(self) -> Tuple[Any, int]:
+        db_path = self.sqlite_api.db_path
+        if db_path is None:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        snapshot_path = self.snapshot_path
+        partial_path = f"{snapshot_path}.partial"
+        start = time.perf_counter()
+        try:
+            source = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+            target = sqlite3.connect(partial_path)
+            try:
+                restarts = [0, None]
+
+                def progress(status, remaining, total):
+                    # More pages remaining than after the last step means a write restarted the copy
+                    if restarts[1] is not None and remaining > restarts[1]:
+                        restarts[0] += 1
+                        if restarts[0] > SNAPSHOT_MAX_RESTARTS:
+                            raise _SnapshotRestarted()
+                    restarts[1] = remaining
+
+                try:
+                    source.backup(target, pages=SNAPSHOT_STEP_PAGES, progress=progress)
+                except _SnapshotRestarted:
+                    # Under WAL a one-step copy only holds a read transaction, which writers do not wait for
+                    source.backup(target)
+                pages = target.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                target.close()
+                source.close()
+            os.replace(partial_path, snapshot_path)
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            message = self.MESSAGES["SNAPSHOT_FAIL"].format(db_path=db_path, error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self._source = snapshot_path
+            self._snapshot_at = time.time()
+            self._generation += 1
+        self._close_idle()
+        self.logger.debug(self.MESSAGES["SNAPSHOT_TAKEN"].format(db_path=db_path, seconds=seconds, pages=pages))
+        return {'path': snapshot_path, 'pages': pages, 'seconds': seconds}, 200
+
+    def _open_reader(self, path: str) -> SQLiteAPI:
+        reader = SQLiteAPI()
+        message, status_code = reader.connect(path, read_only=True, mmap_size=self.mmap_size)
+        if status_code != 200:
+            raise RuntimeError(self.MESSAGES["READER_FAIL"].format(path=path, error=message))
+        return reader
+
+    """
+    Checks out a read-only connection for the block, the shared connection in 'off' mode
+    Yields:
+        - A connected SQLiteAPI that must only be read from
+    """
+    @contextmanager
+    def reader(self):
+        if self.mode == MODE_OFF or not self.sqlite_api.connected:
+            yield self.sqlite_api
+            return
+
+        self._slots.acquire()
+        try:
+            with self._lock:
+                generation, source = self._generation, self._source or self.sqlite_api.db_path
+            try:
+                reader, reader_generation = self._idle.get_nowait()
+                if reader_generation != generation:
+                    reader.disconnect()
+                    reader = self._open_reader(source)
+            except queue.Empty:
+                reader = self._open_reader(source)
+
+            try:
+                yield reader
+            finally:
+                # A reader left in a transaction, e.g. by an unfinished fetch, would hold its snapshot open
+                if reader.db.in_transaction:
+                    reader.db.rollback()
+                with self._lock:
+                    current = self._generation
+                if generation == current:
+                    self._idle.put((reader, generation))
+                else:
+                    reader.disconnect()
+        finally:
+            self._slots.release()
+
+    """
+    Returns the mode, the file reads are served from and the age of the snapshot
+    """
+    def get_status(self) -> Tuple[Dict[str, Any], int]:
+        with self._lock:
+            source, snapshot_at = self._source, self._snapshot_at
+        return {
+            'mode': self.mode,
+            'source': self.sqlite_api.db_path if self.mode == MODE_OFF else source or self.sqlite_api.db_path,
+            'mmap_size': self.mmap_size if self.mode != MODE_OFF else 0,
+            'snapshot_age': time.time() - snapshot_at if snapshot_at is not None else None,
+            'idle_readers': self._idle.qsize(),
+        }, 200
+
+    def get_tables(self, orient: str = 'rows') -> Tuple[Any, int]:
+        with self.reader() as reader:
+            return reader.get_tables(orient)
+
+    def get_table(self, table_name: str, orient: str = 'records', limit: Optional[int] = None, offset: int = 0) -> Tuple[Any, int]:
+        with self.reader() as reader:
+            return reader.get_table(table_name, orient, limit, offset)
+
+    def get_table_schema(self, table_name: str) -> Tuple[Any, int]:
+        with self.reader() as reader:
+            return reader.get_table_schema(table_name)
+
+    def get_row(self, table_name: str, primary_key_value: str) -> Tuple[Any, int]:
+        with self.reader() as reader:
+            return reader.get_row(table_name, primary_key_value)
+
+    def get_rows(self, table_name: str, conditions: List[str], orient: str = 'records',
+                 limit: Optional[int] = None, offset: int = 0) -> Tuple[Any, int]:
+        with self.reader() as reader:
+            return reader.get_rows(table_name, conditions, orient, limit, offset)
+
+    def query_table(self, table_name: str, spec: Dict[str, Any]) -> Tuple[Any, int]:
+        with self.reader() as reader:
+            return reader.query_table(table_name, spec)
@@ -0,0 +1,512 @@
+"""
+This class is responsible for running declared ETL jobs in the background on cron schedules.
+Runs are recorded in the scheduler_runs table, which also prevents overlap: a job is only started after
+claiming it in a write transaction that finds no live run of it, from this process or another one sharing
+the database. Live runs refresh a heartbeat, so the claim of a run whose process died expires after a lease.
+At most max_concurrent jobs run at once, each on its own connection and marked as background work, so they
+pause while interactive requests are in flight and only spend the unreserved share of external rate budgets.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from app.api.sqlite_api import SQLiteAPI
+from src.app.utils import budgets, metrics
+from src.app.utils.cron import CronSchedule
+
+RUNS_TABLE = 'scheduler_runs'
+
+RUNS_TABLE_COLUMNS = [
+    'run_id TEXT PRIMARY KEY',
+    'job TEXT',
+    'trigger TEXT',
+    'status TEXT',
+    'owner TEXT',
+    'scheduled_at REAL',
+    'started_at REAL',
+    'heartbeat_at REAL',
+    'finished_at REAL',
+    'seconds REAL',
+    'progress TEXT',
+    'result TEXT',
+    'error TEXT',
+]
+
+RUNS_TABLE_INDEXES = [
+    f"CREATE INDEX IF NOT EXISTS idx_scheduler_runs_job ON {RUNS_TABLE} (job, scheduled_at)",
+]
+
+TRIGGER_SCHEDULE = 'schedule'
+TRIGGER_MANUAL = 'manual'
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_SKIPPED = 'skipped'
+STATUS_CANCELLED = 'cancelled'
+STATUS_ABANDONED = 'abandoned'
+
+# Runs in these statuses hold the claim on their job while their heartbeat is within the lease
+LIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# Columns decoded from JSON when runs are read
+_JSON_COLUMNS = ('progress', 'result')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ScheduledJob:
+    """
+    A job the scheduler can run
+    Parameters:
+        - name (str) - The name of the job
+        - function (Callable) - Called with a JobContext, returns a JSON serializable summary of the run
+        - schedule (CronSchedule) - When the job runs, None for jobs only run on request
+        - description (str) - Shown when jobs are listed
+        - disabled_reason (str) - Why the job cannot run, e.g. missing credentials, None if it can
+    """
+
+    def __init__(self, name: str, function: Callable[['JobContext'], Any], schedule: Optional[CronSchedule] = None,
+                 description: str = '', disabled_reason: Optional[str] = None):
+        self.name = name
+        self.function = function
+        self.schedule = schedule
+        self.description = description
+        self.disabled_reason = disabled_reason
+
+    @property
+    def enabled(self) -> bool:
+        return self.disabled_reason is None
+
+
+class JobContext:
+    """
+    Handed to a running job
+    Jobs do their work in steps and call checkpoint() between them, which records progress, stops the job
+    when the scheduler shuts down and pauses it while interactive requests are in flight
+    The scheduler thread refreshes the heartbeat of live runs, so long steps do not lose their claim
+    """
+
+    def __init__(self, scheduler: 'SchedulerAPI', job: ScheduledJob, run_id: str):
+        self.scheduler = scheduler
+        self.job = job
+        self.run_id = run_id
+        self._connection: Optional[SQLiteAPI] = None
+
+    """
+    A connection of the run's own, created on first use
+    Its writes are told to the write hooks of the shared connection, so views over the written tables stay current
+    """
+    @property
+    def connection(self) -> SQLiteAPI:
+        if self._connection is None:
+            self._connection = SQLiteAPI()
+            self._connection.connect(self.scheduler.db_path)
+            self._connection.add_write_hook(self.scheduler.sqlite_api._notify_write)
+        return self._connection
+
+    @property
+    def stopping(self) -> bool:
+        return self.scheduler._stop.is_set()
+
+    """
+    Marks the end of a step of the job
+    Parameters:
+        - progress - Keyword arguments recorded as the progress of the run, e.g. done=500, total=2000
+    Raises:
+        - JobCancelled if the scheduler is shutting down
+    """
+    def checkpoint(self, **progress):
+        if self.stopping:
+            raise JobCancelled()
+        if progress:
+            self.scheduler._heartbeat(self.run_id, progress)
+        budgets.interactive.wait_idle(self.scheduler.max_pause)
+        if self.stopping:
+            raise JobCancelled()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.disconnect()
+            self._connection = None
+
+
+class SchedulerAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "SCHEDULER_STARTED": "Job scheduler started with {jobs} scheduled job(s), {max_concurrent} at a time.",
+        "SCHEDULER_STOPPED": "Job scheduler stopped.",
+        "JOB_REGISTERED": "Job '{job}' registered with schedule '{schedule}'.",
+        "JOB_DISABLED": "Job '{job}' is disabled: {reason}",
+        "JOB_NOT_FOUND": "Job '{job}' not found, expected one of: {jobs}.",
+        "JOB_OVERLAP": "Job '{job}' is already running (run {run_id}).",
+        "JOB_QUEUED": "Job '{job}' queued as run {run_id} ({trigger}).",
+        "JOB_DONE": "Job '{job}' run {run_id} finished in {seconds:.3f}s: {result}",
+        "JOB_FAIL": "Job '{job}' run {run_id} failed: {error}",
+        "JOB_CANCELLED": "Job '{job}' run {run_id} cancelled by shutdown.",
+        "RUNS_ABANDONED": "Marked {runs} run(s) without a heartbeat for {lease}s as abandoned.",
+        "RUN_NOT_FOUND": "Run {run_id} not found.",
+        "HISTORY_FAIL": "Failed to record run {run_id}: {error}",
+    }
+
+    """
+    Parameters:
+        - sqlite_api (SQLiteAPI) - The shared API, whose database holds the run history
+        - max_concurrent (int) - Jobs running at once, runs beyond wait for a slot
+        - max_pause (float) - Seconds a job pauses at a checkpoint at most while interactive requests are in flight
+        - heartbeat_interval (float) - Seconds between heartbeats of a live run
+        - lease (float) - Seconds without a heartbeat after which a live run is considered abandoned
+        - history_per_job (int) - Finished runs kept per job
+    """
+    def __init__(self, sqlite_api: SQLiteAPI, max_concurrent: int = 1, max_pause: float = 5.0,
+                 heartbeat_interval: float = 15.0, lease: float = 120.0, history_per_job: int = 100):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_pause = max_pause
+        self.heartbeat_interval = heartbeat_interval
+        self.lease = lease
+        self.history_per_job = history_per_job
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._next_runs: Dict[str, float] = {}
+        self._running: Dict[str, str] = {}
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._history_lock = threading.Lock()
+        self._connection: Optional[SQLiteAPI] = None
+        self._tables_created = False
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    @property
+    def db_path(self) -> Optional[str]:
+        return self.sqlite_api.db_path
+
+    """
+    Declares a job
+    Parameters:
+        - name (str) - The name of the job
+        - function (Callable) - Called with a JobContext, returns a JSON serializable summary of the run
+        - schedule (str) - A cron expression, e.g. '0 * * * *', empty or None for jobs only run on request
+        - description (str) - Shown when jobs are listed
+        - disabled_reason (str) - Why the job cannot run, None if it can
+    Raises:
+        - ValueError if the schedule is not a valid cron expression
+    """
+    def register(self, name: str, function: Callable[[JobContext], Any], schedule: Optional[str] = None,
+                 description: str = '', disabled_reason: Optional[str] = None):
+        job = ScheduledJob(name, function, CronSchedule(schedule) if schedule else None, description, disabled_reason)
+        self.jobs[name] = job
+        if not job.enabled:
+            self.logger.info(self.MESSAGES["JOB_DISABLED"].format(job=name, reason=disabled_reason))
+        else:
+            self.logger.info(self.MESSAGES["JOB_REGISTERED"].format(job=name, schedule=schedule or 'on request'))
+        self._wake.set()
+        return job
+
+    """
+    Starts the scheduler thread if it is not already running
+    """
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.jobs)), thread_name_prefix='scheduled-job')
+        self._thread = threading.Thread(target=self._schedule_loop, name='job-scheduler', daemon=True)
+        self._thread.start()
+
+    """
+    Stops the scheduler, cancelling running jobs at their next checkpoint and waiting for them to stop
+    """
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._history_lock:
+            if self._connection is not None:
+                self._connection.disconnect()
+                self._connection = None
+
+    def _writer(self) -> SQLiteAPI:
+        # Created on first use, the history is never written on the cursor used by requests
+        if self._connection is None:
+            self._connection = SQLiteAPI()
+            self._connection.connect(self.db_path)
+        if not self._tables_created:
+            self._connection.create_table(RUNS_TABLE, RUNS_TABLE_COLUMNS)
+            for statement in RUNS_TABLE_INDEXES:
+                self._connection._execute(statement)
+            self._connection.db.commit()
+            self._tables_created = True
+        return self._connection
+
+    def _schedule_loop(self):
+        scheduled = [job for job in self.jobs.values() if job.enabled and job.schedule is not None]
+        self.logger.info(self.MESSAGES["SCHEDULER_STARTED"].format(jobs=len(scheduled), max_concurrent=self.max_concurrent))
+        while not self._stop.is_set():
+            now = time.time()
+            for job in self.jobs.values():
+                if not job.enabled or job.schedule is None:
+                    self._next_runs.pop(job.name, None)
+                    continue
+                due = self._next_runs.get(job.name)
+                if due is None:
+                    self._next_runs[job.name] = job.schedule.next_after(now)
+                elif due <= now:
+                    self._dispatch(job, TRIGGER_SCHEDULE, due)
+                    # Fires missed while the process was down or busy are coalesced into this one run
+                    self._next_runs[job.name] = job.schedule.next_after(now)
+
+            for run_id in list(self._running.values()):
+                self._heartbeat(run_id)
+
+            wait = min(self._next_runs.values(), default=now + 60) - time.time()
+            self._wake.wait(max(0.0, min(wait, self.heartbeat_interval)))
+            self._wake.clear()
+        self.logger.info(self.MESSAGES["SCHEDULER_STOPPED"])
+
+    """
+    Runs a job now, unless a run of it is already live
+    Parameters:
+        - name (str) - The name of the job
+    Returns:
+        - A dictionary describing the queued run, or a message on failure
+        - HTTP Status Code (int)
+    """
+    def trigger(self, name: str) -> Tuple[Any, int]:
+        job = self.jobs.get(name)
+        if job is None:
+            return self.MESSAGES["JOB_NOT_FOUND"].format(job=name, jobs=', '.join(self.jobs)), 404
+        if not job.enabled:
+            return self.MESSAGES["JOB_DISABLED"].format(job=name, reason=job.disabled_reason), 409
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        self.start()
+        return self._dispatch(job, TRIGGER_MANUAL, time.time())
+
+    def _dispatch(self, job: ScheduledJob, trigger: str, scheduled_at: float) -> Tuple[Any, int]:
+        try:
+            run_id, live_run_id = self._claim(job.name, trigger, scheduled_at)
+        except Exception as e:
+            message = self.MESSAGES["HISTORY_FAIL"].format(run_id=job.name, error=str(e))
+            self.logger.error(message)
+            return message, 500
+
+        if live_run_id is not None:
+            message = self.MESSAGES["JOB_OVERLAP"].format(job=job.name, run_id=live_run_id)
+            self.logger.info(message)
+            return message, 409
+
+        self._running[job.name] = run_id
+        self._executor.submit(self._run, job, run_id)
+        self.logger.info(self.MESSAGES["JOB_QUEUED"].format(job=job.name, run_id=run_id, trigger=trigger))
+        return {'run_id': run_id, 'job': job.name, 'trigger': trigger, 'status': STATUS_QUEUED}, 202
+
+    """
+    Records a run of a job as queued, in the same transaction as checking that no run of it is live
+    A run found live is recorded as skipped instead, so the history shows every fire of the schedule
+    Returns:
+        - The id of the new run, None if it was skipped (str)
+        - The id of the live run, None if there is none (str)
+    """
+    def _claim(self, name: str, trigger: str, scheduled_at: float) -> Tuple[Optional[str], Optional[str]]:
+        now = time.time()
+        run_id = uuid.uuid4().hex
+        with self._history_lock:
+            writer = self._writer()
+            with writer.transaction(immediate=True):
+                writer._execute(
+                    f"UPDATE {RUNS_TABLE} SET status = ?, finished_at = ? "
+                    f"WHERE job = ? AND status IN ({', '.join('?' for _ in LIVE_STATUSES)}) AND heartbeat_at < ?",
+                    (STATUS_ABANDONED, now, name, *LIVE_STATUSES, now - self.lease)
+                )
+                if writer.cursor.rowcount > 0:
+                    self.logger.warning(self.MESSAGES["RUNS_ABANDONED"].format(runs=writer.cursor.rowcount, lease=self.lease))
+                writer._execute(
+                    f"SELECT run_id FROM {RUNS_TABLE} WHERE job = ? AND status IN ({', '.join('?' for _ in LIVE_STATUSES)}) LIMIT 1",
+                    (name, *LIVE_STATUSES)
+                )
+                live = writer._fetchone()
+                status = STATUS_QUEUED if live is None else STATUS_SKIPPED
+                writer._execute(
+                    f"INSERT INTO {RUNS_TABLE} (run_id, job, trigger, status, owner, scheduled_at, heartbeat_at, finished_at, error) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, name, trigger, status, self.owner, scheduled_at, now,
+                     None if live is None else now, None if live is None else self.MESSAGES["JOB_OVERLAP"].format(job=name, run_id=live[0]))
+                )
+        if live is not None:
+            return None, live[0]
+        return run_id, None
+
+    def _update(self, run_id: str, **fields):
+        for column in _JSON_COLUMNS:
+            if fields.get(column) is not None:
+                fields[column] = json.dumps(fields[column], default=str)
+        with self._history_lock:
+            try:
+                writer = self._writer()
+                writer._execute(
+                    f"UPDATE {RUNS_TABLE} SET {', '.join(f'{column} = ?' for column in fields)} WHERE run_id = ?",
+                    (*fields.values(), run_id)
+                )
+                writer.db.commit()
+            except Exception as e:
+                self._writer().db.rollback()
+                self.logger.error(self.MESSAGES["HISTORY_FAIL"].format(run_id=run_id, error=str(e)))
+
+    def _heartbeat(self, run_id: str, progress: Optional[Dict[str, Any]] = None):
+        fields = {'heartbeat_at': time.time()}
+        if progress is not None:
+            fields['progress'] = progress
+        self._update(run_id, **fields)
+
+    def _prune(self, name: str):
+        with self._history_lock:
+            writer = self._writer()
+            writer._execute(
+                f"DELETE FROM {RUNS_TABLE} WHERE job = ? AND status NOT IN ({', '.join('?' for _ in LIVE_STATUSES)}) AND run_id NOT IN ("
+                f"SELECT run_id FROM {RUNS_TABLE} WHERE job = ? ORDER BY scheduled_at DESC LIMIT ?)",
+                (name, *LIVE_STATUSES, name, self.history_per_job)
+            )
+            writer.db.commit()
+
+    """
+    Runs on a worker thread: waits for a concurrency slot, runs the job and records the outcome
+    """
+    def _run(self, job: ScheduledJob, run_id: str):
+        try:
+            # The scheduler thread keeps the claim of the run alive while it waits behind other jobs
+            while not self._slots.acquire(timeout=1.0):
+                if self._stop.is_set():
+                    self._finish(job, run_id, STATUS_CANCELLED, 0.0)
+                    return
+
+            context = JobContext(self, job, run_id)
+            start = time.perf_counter()
+            try:
+                self._update(run_id, status=STATUS_RUNNING, started_at=time.time(), heartbeat_at=time.time())
+                with budgets.background():
+                    context.checkpoint()
+                    result = job.function(context)
+                self._finish(job, run_id, STATUS_DONE, time.perf_counter() - start, result=result)
+            except JobCancelled:
+                self._finish(job, run_id, STATUS_CANCELLED, time.perf_counter() - start)
+            except Exception as e:
+                self._finish(job, run_id, STATUS_FAILED, time.perf_counter() - start, error=str(e))
+            finally:
+                context.close()
+                self._slots.release()
+        finally:
+            self._running.pop(job.name, None)
+
+    def _finish(self, job: ScheduledJob, run_id: str, status: str, seconds: float, result: Any = None, error: Optional[str] = None):
+        self._update(run_id, status=status, finished_at=time.time(), seconds=seconds, result=result, error=error)
+        metrics.SCHEDULER_JOB_SECONDS.observe(seconds, job.name, status)
+        if status == STATUS_DONE:
+            self.logger.info(self.MESSAGES["JOB_DONE"].format(job=job.name, run_id=run_id, seconds=seconds, result=result))
+        elif status == STATUS_FAILED:
+            self.logger.error(self.MESSAGES["JOB_FAIL"].format(job=job.name, run_id=run_id, error=error))
+        else:
+            self.logger.info(self.MESSAGES["JOB_CANCELLED"].format(job=job.name, run_id=run_id))
+        try:
+            self._prune(job.name)
+        except Exception as e:
+            self.logger.error(self.MESSAGES["HISTORY_FAIL"].format(run_id=run_id, error=str(e)))
+
+    def _read_runs(self, where: str = '', parameters=(), limit: int = 50) -> List[Dict[str, Any]]:
+        columns = [column.split(' ')[0] for column in RUNS_TABLE_COLUMNS]
+        with self._history_lock:
+            writer = self._writer()
+            writer._execute(
+                f"SELECT {', '.join(columns)} FROM {RUNS_TABLE} {where} ORDER BY scheduled_at DESC LIMIT ?",
+                (*parameters, limit)
+            )
+            rows = writer._fetchall()
+        runs = [dict(zip(columns, row)) for row in rows]
+        for run in runs:
+            for column in _JSON_COLUMNS:
+                if run[column] is not None:
+                    run[column] = json.loads(run[column])
+        return runs
+
+    """
+    Retrieves the run history, most recent first
+    Parameters:
+        - name (str) - Only runs of this job, None for every job
+        - status (str) - Only runs in this status, None for every status
+        - limit (int) - Runs returned at most
+    Returns:
+        - A list of dictionaries representing the runs
+        - HTTP Status Code (int)
+    """
+    def get_runs(self, name: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> Tuple[Any, int]:
+        if name is not None and name not in self.jobs:
+            return self.MESSAGES["JOB_NOT_FOUND"].format(job=name, jobs=', '.join(self.jobs)), 404
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        conditions = [(column, value) for column, value in (('job', name), ('status', status)) if value is not None]
+        where = f"WHERE {' AND '.join(f'{column} = ?' for column, _ in conditions)}" if conditions else ''
+        return self._read_runs(where, [value for _, value in conditions], max(1, limit)), 200
+
+    """
+    Retrieves a single run
+    Parameters:
+        - run_id (str) - The id of the run
+    Returns:
+        - A dictionary representing the run if found, a message otherwise
+        - HTTP Status Code (int)
+    """
+    def get_run(self, run_id: str) -> Tuple[Any, int]:
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        runs = self._read_runs("WHERE run_id = ?", (run_id,), 1)
+        if not runs:
+            return self.MESSAGES["RUN_NOT_FOUND"].format(run_id=run_id), 404
+        return runs[0], 200
+
+    """
+    Retrieves the declared jobs with their schedule, next run and last finished run
+    Returns:
+        - A list of dictionaries representing the jobs
+        - HTTP Status Code (int)
+    """
+    def get_jobs(self) -> Tuple[Any, int]:
+        if not self.sqlite_api.connected:
+            return self.sqlite_api.MESSAGES["NOT_CONNECTED"], 400
+        jobs = []
+        for job in self.jobs.values():
+            last_runs = self._read_runs(
+                f"WHERE job = ? AND status NOT IN ({', '.join('?' for _ in LIVE_STATUSES)})", (job.name, *LIVE_STATUSES), 1
+            )
+            jobs.append({
+                'name': job.name,
+                'description': job.description,
+                'schedule': job.schedule.expression if job.schedule is not None else None,
+                'enabled': job.enabled,
+                'disabled_reason': job.disabled_reason,
+                'next_run_at': self._next_runs.get(job.name),
+                'running': self._running.get(job.name),
+                'last_run': last_runs[0] if last_runs else None,
+            })
+        return jobs, 200
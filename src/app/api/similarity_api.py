@@ -0,0 +1,299 @@
+"""
+This class is responsible for nearest-neighbour similarity search over stored Spotify audio features.
+Small libraries are searched exactly with a float32 brute-force matrix product.
+Large libraries can additionally use an approximate inverted-file (IVF) index stored as memory-mapped files on disk.
+Features are standardized with the mean and standard deviation of the last full build, tracks added afterwards
+reuse them until build() is called again, e.g. after a large share of the library has been synced.
+"""
+
+import os
+import threading
+import logging
+from typing import Optional, List, Dict, Any, Tuple
+import numpy as np
+from app.api.sqlite_api import SQLiteAPI
+
+AUDIO_FEATURES_TABLE = 'spotify_audio_features'
+
+FEATURES = [
+    'danceability', 'energy', 'loudness', 'speechiness', 'acousticness',
+    'instrumentalness', 'liveness', 'valence', 'tempo',
+]
+
+
+class IVFIndex:
+    """
+    Approximate index that clusters vectors with k-means and only scans the closest clusters at query time.
+    Vectors are stored sorted by cluster in a memory-mapped file so the index doesn't need to fit in memory.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.rows: Optional[np.ndarray] = None
+        self.vectors: Optional[np.ndarray] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    """
+    Trains the clusters and writes the index files
+    Parameters:
+        - vectors (np.ndarray) - (n, d) float32 unit vectors
+        - n_lists (int) - The number of clusters, defaults to sqrt(n)
+        - iterations (int) - The number of k-means iterations
+        - sample_size (int) - The number of vectors used to train the clusters
+    """
+    def build(self, vectors: np.ndarray, n_lists: Optional[int] = None, iterations: int = 10, sample_size: int = 100_000):
+        n = len(vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+
+        sample = vectors[rng.choice(n, size=min(n, sample_size), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=min(n_lists, len(sample)), replace=False)].copy()
+        for _ in range(iterations):
+            assignment = self._nearest_centroids(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-9), centroids).astype(np.float32)
+
+        assignment = self._nearest_centroids(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=len(centroids))
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        np.save(self._path('centroids.npy'), centroids)
+        np.save(self._path('offsets.npy'), np.concatenate([[0], np.cumsum(counts)]))
+        np.save(self._path('rows.npy'), order.astype(np.int64))
+        stored = np.lib.format.open_memmap(self._path('vectors.npy'), mode='w+', dtype=np.float32, shape=vectors.shape)
+        stored[:] = vectors[order]
+        stored.flush()
+        del stored
+        self.load()
+
+    def load(self) -> bool:
+        if not os.path.exists(self._path('vectors.npy')):
+            return False
+        self.centroids = np.load(self._path('centroids.npy'))
+        self.offsets = np.load(self._path('offsets.npy'))
+        self.rows = np.load(self._path('rows.npy'))
+        self.vectors = np.load(self._path('vectors.npy'), mmap_mode='r')
+        return True
+
+    @staticmethod
+    def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 65_536) -> np.ndarray:
+        # Vectors and centroids are compared by inner product, as in the exact search
+        return np.concatenate([
+            np.argmax(vectors[i:i + batch_size] @ centroids.T, axis=1)
+            for i in range(0, len(vectors), batch_size)
+        ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+    """
+    Returns the candidate matrix rows and their scores for a query vector
+    Parameters:
+        - query (np.ndarray) - (d,) float32 unit vector
+        - n_probe (int) - The number of closest clusters to scan
+    """
+    def search(self, query: np.ndarray, n_probe: int) -> Tuple[np.ndarray, np.ndarray]:
+        n_probe = min(n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        ranges = [(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        rows = np.concatenate([self.rows[start:end] for start, end in ranges])
+        scores = np.concatenate([self.vectors[start:end] @ query for start, end in ranges])
+        return rows, scores
+
+
+class SimilarityAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "INDEX_BUILT": "Similarity index built with {count} track(s).",
+        "INDEX_UPDATED": "Similarity index updated with {count} track(s).",
+        "APPROXIMATE_INDEX_BUILT": "Approximate similarity index built with {count} track(s) in {index_dir}.",
+        "TRACK_NOT_INDEXED": "Track {track_id} has no audio features in the similarity index.",
+        "INDEX_EMPTY": "Similarity index is empty.",
+        "INVALID_K": "Invalid number of similar tracks {k}, expected at least 1.",
+    }
+
+    def __init__(self, sqlite_api: SQLiteAPI, index_dir: Optional[str] = None, approximate_threshold: int = 200_000, n_probe: int = 8):
+        self.logger = logging.getLogger(__name__)
+        self.sqlite_api = sqlite_api
+        self.index_dir = index_dir
+        self.approximate_threshold = approximate_threshold
+        self.n_probe = n_probe
+
+        self._lock = threading.RLock()
+        self._built = False
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.empty((0, len(FEATURES)), dtype=np.float32)
+        self._size = 0
+        self._mean: Optional[np.ndarray] = None
+        self._std: Optional[np.ndarray] = None
+        self._ivf: Optional[IVFIndex] = None
+        self._ivf_size = 0
+        # Rows of the approximate index whose features were replaced since it was built, scanned exactly instead
+        self._ivf_stale = np.zeros(0, dtype=bool)
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    """
+    Rebuilds the index from every row of the audio features table
+    Returns:
+        Response message (str)
+        HTTP Status Code (int)
+    """
+    def build(self) -> Tuple[str, int]:
+        columns = ', '.join([f"json_extract(data, '$.{feature}')" for feature in FEATURES])
+        self.sqlite_api.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name=?", (AUDIO_FEATURES_TABLE,))
+        if self.sqlite_api.cursor.fetchone() is None:
+            rows = []
+        else:
+            self.sqlite_api.cursor.execute(f"SELECT id, {columns} FROM {AUDIO_FEATURES_TABLE}")
+            rows = self.sqlite_api.cursor.fetchall()
+
+        raw = np.array([row[1:] for row in rows], dtype=np.float32).reshape(-1, len(FEATURES))
+        with self._lock:
+            self._mean = np.nanmean(raw, axis=0) if len(raw) else np.zeros(len(FEATURES), dtype=np.float32)
+            self._std = np.nanstd(raw, axis=0) if len(raw) else np.ones(len(FEATURES), dtype=np.float32)
+            self._std[self._std == 0] = 1.0
+
+            self._ids = [row[0] for row in rows]
+            self._positions = {track_id: i for i, track_id in enumerate(self._ids)}
+            self._matrix = self._normalize(raw)
+            self._size = len(self._ids)
+            self._built = True
+            self._rebuild_approximate()
+
+        message = self.MESSAGES["INDEX_BUILT"].format(count=self._size)
+        self.logger.info(message)
+        return message, 200
+
+    """
+    Adds or replaces tracks in the index without a full rebuild
+    New features are standardized with the statistics of the last build, which are not updated
+    Parameters:
+        - audio_features (List[dict]) - Audio feature objects as returned by the Spotify /audio-features endpoint
+    Returns:
+        Response message (str)
+        HTTP Status Code (int)
+    """
+    def add(self, audio_features: List[Dict[str, Any]]) -> Tuple[str, int]:
+        with self._lock:
+            if not self._built:
+                return self.build()
+
+            audio_features = [features for features in audio_features if features]
+            raw = np.array([[features.get(feature) for feature in FEATURES] for features in audio_features], dtype=np.float32)
+            vectors = self._normalize(raw.reshape(-1, len(FEATURES)))
+
+            new_rows = []
+            for features, vector in zip(audio_features, vectors):
+                position = self._positions.get(features['id'])
+                if position is None:
+                    new_rows.append((features['id'], vector))
+                else:
+                    self._matrix[position] = vector
+                    if position < self._ivf_size:
+                        self._ivf_stale[position] = True
+
+            if new_rows:
+                self._reserve(self._size + len(new_rows))
+                for track_id, vector in new_rows:
+                    self._positions[track_id] = self._size
+                    self._ids.append(track_id)
+                    self._matrix[self._size] = vector
+                    self._size += 1
+
+            # New tracks are searched exactly until they make up a sizeable share of the approximate index
+            if self._ivf is None and self._size >= self.approximate_threshold:
+                self._rebuild_approximate()
+            elif self._ivf is not None and self._size - self._ivf_size + self._ivf_stale.sum() > 0.1 * self._ivf_size:
+                self._rebuild_approximate()
+
+        message = self.MESSAGES["INDEX_UPDATED"].format(count=len(audio_features))
+        self.logger.info(message)
+        return message, 200
+
+    """
+    Finds the tracks most similar to a track by cosine similarity of standardized audio features
+    Parameters:
+        - track_id (str) - The Spotify id of the track
+        - k (int) - The number of similar tracks to return
+        - exact (bool) - Whether to bypass the approximate index
+    Returns:
+        - A list of dictionaries with "id" and "score", most similar first
+        - HTTP Status Code (int)
+    """
+    def query(self, track_id: str, k: int = 10, exact: bool = False) -> Tuple[Any, int]:
+        if k < 1:
+            message = self.MESSAGES["INVALID_K"].format(k=k)
+            self.logger.error(message)
+            return {"error": message}, 400
+
+        with self._lock:
+            if not self._built:
+                self.build()
+
+            if self._size == 0:
+                message = self.MESSAGES["INDEX_EMPTY"]
+                self.logger.info(message)
+                return {"error": message}, 404
+
+            position = self._positions.get(track_id)
+            if position is None:
+                message = self.MESSAGES["TRACK_NOT_INDEXED"].format(track_id=track_id)
+                self.logger.info(message)
+                return {"error": message}, 404
+
+            rows, scores = self._search(self._matrix[position], exact)
+            keep = rows != position
+            rows, scores = rows[keep], scores[keep]
+
+            k = min(k, len(rows))
+            if k == 0:
+                return [], 200
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [{"id": self._ids[rows[i]], "score": float(scores[i])} for i in top], 200
+
+    def _search(self, query: np.ndarray, exact: bool) -> Tuple[np.ndarray, np.ndarray]:
+        if exact or self._ivf is None:
+            return np.arange(self._size), self._matrix[:self._size] @ query
+
+        rows, scores = self._ivf.search(query, self.n_probe)
+        # Tracks appended or replaced since the approximate index was built are scanned exactly
+        fresh = ~self._ivf_stale[rows]
+        pending = np.concatenate([np.flatnonzero(self._ivf_stale), np.arange(self._ivf_size, self._size)])
+        rows = np.concatenate([rows[fresh], pending])
+        scores = np.concatenate([scores[fresh], self._matrix[pending] @ query])
+        return rows, scores
+
+    def _normalize(self, raw: np.ndarray) -> np.ndarray:
+        standardized = np.nan_to_num((raw - self._mean) / self._std).astype(np.float32)
+        norms = np.linalg.norm(standardized, axis=1, keepdims=True)
+        return standardized / np.maximum(norms, 1e-9)
+
+    def _reserve(self, capacity: int):
+        if capacity <= len(self._matrix):
+            return
+        grown = np.empty((max(capacity, 2 * len(self._matrix)), len(FEATURES)), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        self._matrix = grown
+
+    def _rebuild_approximate(self):
+        if self.index_dir is None or self._size < self.approximate_threshold:
+            self._ivf = None
+            self._ivf_size = 0
+            self._ivf_stale = np.zeros(0, dtype=bool)
+            return
+        ivf = IVFIndex(self.index_dir)
+        ivf.build(self._matrix[:self._size])
+        self._ivf = ivf
+        self._ivf_size = self._size
+        self._ivf_stale = np.zeros(self._size, dtype=bool)
+        self.logger.info(self.MESSAGES["APPROXIMATE_INDEX_BUILT"].format(count=self._size, index_dir=self.index_dir))
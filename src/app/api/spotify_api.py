@@ -1,8 +1,8 @@
 import asyncio
-import time
 import aiohttp
-import requests
-from src.server.api.api_handler import get_response
+from src.app.utils.async_request_handler import get_response
+from src.app.utils.token_manager import SpotifyTokenManager
+from src.app.utils.batch_executor import Checkpoint, stream_results, gather_partial
 
 class SpotifyAPI:
     def __init__(
@@ -13,140 +13,175 @@ class SpotifyAPI:
             token_expires,
         ):
         self._BASE_URL = 'https://api.spotify.com/v1'
-        self._client_id = client_id
-        self._client_secret = client_secret
-        self._access_token = access_token
-        self._token_expires = token_expires
+        self._token_manager = SpotifyTokenManager(client_id, client_secret, access_token, token_expires)
 
     def set_access_token(self, access_token):
-        self._access_token = access_token
+        self._token_manager.set_token(access_token, self._token_manager.token_expires)
 
     def set_token_expires(self, token_expires):
-        self._token_expires = token_expires
+        self._token_manager.set_token(self._token_manager.access_token, token_expires)
 
     def set_client_id(self, client_id):
-        self._client_id = client_id
+        self._token_manager.client_id = client_id
 
     def set_client_secret(self, client_secret):
-        self._client_secret = client_secret
-    
-    def _get_headers(self):
-        if not self._access_token or time.time() >= self._token_expires:
-            self.generate_access_token(self._client_id, self._client_secret)
-        return {'Authorization': f'Bearer {self._access_token}'}
-
-    def generate_access_token(self, client_id, client_secret):
-        response = requests.post(
-            url='https://accounts.spotify.com/api/token',
-            data={
-            'grant_type': 'client_credentials',
-            'client_id': client_id,
-            'client_secret': client_secret,
-        })
-        token_data = response.json()
-        self._access_token, self._token_expires = token_data['access_token']
-        self._token_expires = time.time() + token_data['expires_in']
-        print("Generated Access Token")
-
-    """Returns the matching Spotify Track URIs of tracks according to their Song and Artist"""
-    async def get_matching_tracks_uris(self, songs, artists, limit, retries, delay):
+        self._token_manager.client_secret = client_secret
+
+    """Requests a new access token using the client credentials flow"""
+    async def generate_access_token(self, client_id, client_secret):
+        self.set_client_id(client_id)
+        self.set_client_secret(client_secret)
+        return await self._token_manager.refresh()
+
+    """
+    Returns the matching Spotify Track URIs of tracks according to their Song and Artist, None where no match was found,
+    and the error of each failed search, keyed by the query
+    """
+    async def get_matching_tracks_uris(self, songs, artists, limit, retries, delay, checkpoint_path=None):
+        queries = [f'track:{song} artist:{artist}' for song, artist in zip(songs, artists)]
         async with aiohttp.ClientSession() as session:
-            tasks = [
-                get_response(
+            tasks = {
+                query: lambda query=query: get_response(
                     base_url=self._BASE_URL,
                     endpoint='/search',
                     params={
-                        'q': f'track:{song} artist:{artist}',
+                        'q': query,
                         'type': 'track',
                         'limit': limit
                     },
-                    headers=self._get_headers(),
+                    headers={},
+                    auth=self._token_manager,
                     session=session,
                     retries=retries,
                     delay=delay
-                ) for song, artist in zip(songs, artists)]
-            matches = await asyncio.gather(*tasks)
-        return [result.get('tracks', {}).get('items', [])['uri'] if result else None for result in matches]
+                ) for query in queries
+            }
+            batch = await gather_partial(tasks, checkpoint_path)
+        matches = [result.get('tracks', {}).get('items', []) if result else [] for result in batch.ordered(queries)]
+        return [items[0]['uri'] if items else None for items in matches], batch.failures
 
-    """Returns the json track data from a list of track ids"""
-    async def get_tracks_data(self, track_ids, retries, delay, batch_size=50):
+    """Returns the current snapshot id of a playlist, which changes whenever its tracks change"""
+    async def get_playlist_snapshot_id(self, playlist_id, retries, delay):
         async with aiohttp.ClientSession() as session:
-            tasks = [
-                get_response(
+            result = await get_response(
                 base_url=self._BASE_URL,
-                endpoint='/tracks',
-                params={'ids': ','.join(track_ids[i:i+batch_size])},
-                headers=self._get_headers(),
+                endpoint=f'/playlists/{playlist_id}',
+                params={'fields': 'snapshot_id'},
+                headers={},
+                auth=self._token_manager,
                 session=session,
                 retries=retries,
                 delay=delay
-            ) for i in range(0, len(track_ids), batch_size)]
-            results = await asyncio.gather(*tasks)
-        return [track for result in results for track in result['tracks']]
+            )
+        return result['snapshot_id']
 
-    """Returns the json artists data from a list of artist ids"""
-    async def get_artists_data(self, artist_ids, retries, delay, batch_size=50):
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                get_response(
-                    base_url=self._BASE_URL,
-                    endpoint='/artists',
-                    params={'ids': ','.join(artist_ids[i:i+batch_size])},
-                    headers=self._get_headers(),
-                    session=session,
-                    retries=retries,
-                    delay=delay
-                ) for i in range(0, len(artist_ids), batch_size)
-            ]
-            results = await asyncio.gather(*tasks)
-        return [artist for result in results for artist in result['artists']]
+    """Returns the ids of every track in a playlist"""
+    async def get_playlist_track_ids(self, playlist_id, retries, delay, batch_size=100):
+        return [track_id for track_id, _ in await self.get_playlist_items(playlist_id, retries, delay, batch_size)]
 
-    """Returns the json artists data from a list of artist ids"""
-    async def get_albums_data(self, album_ids, retries, delay, batch_size = 20):
+    """
+    Returns the id and added_at timestamp of every track in a playlist, in order
+    added_at changes when a track is removed and added again, e.g. to replace an outdated version
+    """
+    async def get_playlist_items(self, playlist_id, retries, delay, batch_size=100):
         async with aiohttp.ClientSession() as session:
-            tasks = [
-                get_response(
+            def page(offset):
+                return get_response(
                     base_url=self._BASE_URL,
-                    endpoint='/albums',
-                    params={'ids': ','.join(album_ids[i:i+batch_size])},
-                    headers=self._get_headers(),
+                    endpoint=f'/playlists/{playlist_id}/tracks',
+                    params={
+                        'fields': 'total,items(added_at,track(id))',
+                        'limit': batch_size,
+                        'offset': offset
+                    },
+                    headers={},
+                    auth=self._token_manager,
                     session=session,
                     retries=retries,
                     delay=delay
-                ) for i in range(0, len(album_ids), batch_size)
-            ]
-            results = await asyncio.gather(*tasks)
-        return [album for result in results for album in result['albums']]
+                )
+            first = await page(0)
+            tasks = [page(offset) for offset in range(batch_size, first['total'], batch_size)]
+            results = [first] + await asyncio.gather(*tasks)
+        return [
+            (item['track']['id'], item.get('added_at'))
+            for result in results for item in result['items']
+            if item.get('track') and item['track'].get('id')
+        ]
 
-    async def get_tracks_audio_features(self, track_ids, retries, delay, batch_size=50):
-        async with aiohttp.ClientSession() as session:
-            tasks = [
-                get_response(
-                    base_url=self._BASE_URL,
-                    endpoint='/audio-features',
-                    params={'ids': ','.join(track_ids[i:i+batch_size])},
-                    headers=self._get_headers(),
-                    session=session,
-                    retries=retries,
-                    delay=delay
-                ) for i in range(0, len(track_ids), batch_size)
-            ]
-            results = await asyncio.gather(*tasks)
-        return [track for result in results for track in result['audio_features']]
+    def _batch_tasks(self, session, endpoint, ids, retries, delay, batch_size):
+        batches = [ids[i:i+batch_size] for i in range(0, len(ids), batch_size)]
+        return {
+            ','.join(batch): lambda batch=batch: get_response(
+                base_url=self._BASE_URL,
+                endpoint=endpoint,
+                params={'ids': ','.join(batch)},
+                headers={},
+                auth=self._token_manager,
+                session=session,
+                retries=retries,
+                delay=delay
+            ) for batch in batches
+        }
+
+    """
+    Yields (ids, items, error) for each batch of ids as soon as its request completes
+    A failed batch is yielded with its error instead of cancelling the other batches
+    Batches already recorded in the checkpoint file are yielded without being requested again
+    """
+    async def stream_batches(self, endpoint, result_key, ids, retries, delay, batch_size=50, checkpoint_path=None):
+        checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+        try:
+            async with aiohttp.ClientSession() as session:
+                tasks = self._batch_tasks(session, endpoint, ids, retries, delay, batch_size)
+                async for key, result, error in stream_results(tasks, checkpoint):
+                    yield key.split(','), result[result_key] if error is None else None, error
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
 
-    async def get_tracks_audio_analysis(self, track_ids, retries, delay):
+    async def _get_batched(self, endpoint, result_key, ids, retries, delay, batch_size, checkpoint_path):
+        # Returned rather than kept on the client, so concurrent calls on one client do not see each other's failures
+        failures = {}
+        results = {}
+        async for batch_ids, items, error in self.stream_batches(endpoint, result_key, ids, retries, delay, batch_size, checkpoint_path):
+            if error is None:
+                results[','.join(batch_ids)] = items
+            else:
+                failures.update({item_id: str(error) for item_id in batch_ids})
+        batch_keys = [','.join(ids[i:i+batch_size]) for i in range(0, len(ids), batch_size)]
+        return [item for key in batch_keys for item in results.get(key, [])], failures
+
+    """Returns the json track data from a list of track ids, and the error of each id of a failed batch"""
+    async def get_tracks_data(self, track_ids, retries, delay, batch_size=50, checkpoint_path=None):
+        return await self._get_batched('/tracks', 'tracks', track_ids, retries, delay, batch_size, checkpoint_path)
+
+    """Returns the json artists data from a list of artist ids, and the error of each id of a failed batch"""
+    async def get_artists_data(self, artist_ids, retries, delay, batch_size=50, checkpoint_path=None):
+        return await self._get_batched('/artists', 'artists', artist_ids, retries, delay, batch_size, checkpoint_path)
+
+    """Returns the json albums data from a list of album ids, and the error of each id of a failed batch"""
+    async def get_albums_data(self, album_ids, retries, delay, batch_size=20, checkpoint_path=None):
+        return await self._get_batched('/albums', 'albums', album_ids, retries, delay, batch_size, checkpoint_path)
+
+    """Returns the json audio features from a list of track ids, and the error of each id of a failed batch"""
+    async def get_tracks_audio_features(self, track_ids, retries, delay, batch_size=50, checkpoint_path=None):
+        return await self._get_batched('/audio-features', 'audio_features', track_ids, retries, delay, batch_size, checkpoint_path)
+
+    """Returns the json audio analysis of each track id in order, None for tracks that failed, and the error of each failed track"""
+    async def get_tracks_audio_analysis(self, track_ids, retries, delay, checkpoint_path=None):
         async with aiohttp.ClientSession() as session:
-            tasks = [
-                get_response(
+            tasks = {
+                track_id: lambda track_id=track_id: get_response(
                     base_url=self._BASE_URL,
                     endpoint=f'/audio-analysis/{track_id}',
                     params={},
-                    headers=self._get_headers(),
+                    headers={},
+                    auth=self._token_manager,
                     session=session,
                     retries=retries,
                     delay=delay
                 ) for track_id in track_ids
-            ]
-            return await asyncio.gather(*tasks)
-
- 
\ No newline at end of file
+            }
+            batch = await gather_partial(tasks, checkpoint_path)
+        return batch.ordered(track_ids), batch.failures
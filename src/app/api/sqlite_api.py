@@ -6,7 +6,12 @@ import sqlite3
 import logging
 import os
 import re
+import time
+import urllib.parse
+from contextlib import contextmanager
 from typing import Optional, List, Dict, Any, Tuple
+from src.app.utils import metrics, query_guard
+from src.app.utils.query_compiler import compile_query, QueryValidationError
 
 class SQLiteAPI:
 
@@ -55,6 +60,9 @@ class SQLiteAPI:
         "TABLE_RETRIEVED": "Successfully retrieved rows from table '{table_name}'.",
         "TABLE_SCHEMA_RETRIEVED": "Successfully retrieved schema of table '{table_name}'.",
 
+        "ROW_RETRIEVAL_SUCCESS": "Successfully retrieved row {row_id} from table '{table_name}'.",
+        "ROW_NOT_FOUND": "Row {row_id} not found in table '{table_name}'.",
+
         "ROWS_FOUND": "Row(s) found in table '{table_name}'.",
         "ROWS_NOT_FOUND": "Row(s) not found in table '{table_name}'.",
 
@@ -68,15 +76,30 @@ class SQLiteAPI:
         "ROWS_UPDATE_SUCCESS": "Row(s) updated in table '{table_name}'.",
         "ROWS_UPDATE_FAIL": "Failed to update row(s) in table '{table_name}'.",
 
+        "ROWS_UPSERT_SUCCESS": "Row(s) upserted in table '{table_name}'.",
+        "ROWS_UPSERT_FAIL": "Failed to upsert row(s) in table '{table_name}'.",
+
         "ROWS_DELETED": "Row(s) deleted from table '{table_name}'.",
         "ROWS_DELETION_FAIL": "Failed to delete row(s) from table '{table_name}'.",
 
         "INVALID_ROWS": "Invalid row data for table '{table_name}'.",
 
+        "QUERY_SUCCESS": "Query on table '{table_name}' returned {row_count} row(s).",
+        "QUERY_INVALID": "Invalid query on table '{table_name}': {error}",
+        "QUERY_FAIL": "Failed to query table '{table_name}'.",
+
+        "INVALID_ORIENT": "Invalid result orient '{orient}', expected one of: {orients}.",
+        "INVALID_PAGE": "Invalid page, limit and offset must be non-negative integers.",
+
+        "QUERY_OVER_BUDGET": "Query on table '{table_name}' rejected: {error} Filter on an indexed column or page with limit and offset.",
+        "QUERY_TIMEOUT": "Query on table '{table_name}' was interrupted after {timeout:g}s, the time allowed for this route.",
+
         "DB_PATH_NOT_FOUND": "Database path {db_path} not found.",
         "INVALID_TABLE_NAME": "Invalid table name '{table_name}'."
     }
 
+    ORIENTS = ('records', 'rows', 'columns')
+
     valid_name_pattern = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
     valid_path_pattern = re.compile(r'^[a-zA-Z0-9](?:[a-zA-Z0-9 ._-]*[a-zA-Z0-9])?\.[a-zA-Z0-9_-]+$')
 
@@ -88,7 +111,9 @@ class SQLiteAPI:
         self.handler.setLevel(logging.INFO)
         self.formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         self.handler.setFormatter(self.formatter)
-        self.logger.addHandler(self.handler)
+        # Several instances may share the logger (e.g. background writers), only attach one handler
+        if not self.logger.handlers:
+            self.logger.addHandler(self.handler)
 
         self.logger.info(self.MESSAGES["SQLITE_INITIALIZING"])
         self.logger.info(self.MESSAGES["SQLITE_VERSION"].format(sqlite_version=sqlite3.sqlite_version_info))
@@ -98,6 +123,10 @@ class SQLiteAPI:
         self.db: Optional[sqlite3.Connection] = None
         self.cursor: Optional[sqlite3.Cursor] = None
         self.connected: bool = False
+        self._pending_statement = None
+        self._write_hooks = []
+        self._in_transaction = False
+        self.read_only: bool = False
 
     def __del__(self):
         self.disconnect()
@@ -111,6 +140,172 @@ class SQLiteAPI:
         self.disconnect()
         self.logger.info(self.MESSAGES["SQLITE_DISCONNECTED"])
 
+    """
+    Executes a statement on the cursor, recording its latency and row count
+    Statements returning rows are timed until their rows are fetched
+    """
+    def _execute(self, query: str, parameters=()) -> sqlite3.Cursor:
+        statement = metrics.statement_label(query)
+        start = time.perf_counter()
+        self.cursor.execute(query, parameters)
+        self._observe(statement, start)
+        return self.cursor
+
+    def _executemany(self, query: str, rows) -> sqlite3.Cursor:
+        statement = metrics.statement_label(query)
+        start = time.perf_counter()
+        self.cursor.executemany(query, rows)
+        self._observe(statement, start)
+        return self.cursor
+
+    def _observe(self, statement: str, start: float):
+        if self.cursor.description is not None:
+            self._pending_statement = (statement, start)
+            return
+        metrics.SQLITE_STATEMENT_SECONDS.observe(time.perf_counter() - start, statement)
+        if self.cursor.rowcount > 0:
+            metrics.SQLITE_ROWS.inc(statement, amount=self.cursor.rowcount)
+
+    def _fetchall(self) -> list:
+        rows = self.cursor.fetchall()
+        self._observe_fetch(len(rows))
+        return rows
+
+    def _fetchone(self):
+        row = self.cursor.fetchone()
+        self._observe_fetch(0 if row is None else 1)
+        return row
+
+    def _observe_fetch(self, row_count: int):
+        if self._pending_statement is None:
+            return
+        statement, start = self._pending_statement
+        self._pending_statement = None
+        metrics.SQLITE_STATEMENT_SECONDS.observe(time.perf_counter() - start, statement)
+        metrics.SQLITE_ROWS.inc(statement, amount=row_count)
+
+    """
+    Runs the statements of the block in one transaction, committed when the block exits and rolled back if it raises
+    The write methods do not commit on their own inside the block
+    Parameters:
+        - immediate (bool) - Whether to take the write lock up front, for blocks that write
+    """
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        self._execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        self._in_transaction = True
+        try:
+            yield self
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        finally:
+            self._in_transaction = False
+
+    def _commit(self):
+        if not self._in_transaction:
+            self.db.commit()
+
+    def _rollback(self):
+        if not self._in_transaction:
+            self.db.rollback()
+
+    """
+    Registers a function called around every write made through this instance
+    Parameters:
+        - hook (Callable) - Called as hook(phase, table_name, keys), where phase is 'before' or 'after'
+                            and keys are the primary key values written, or None if they are unknown
+    """
+    def add_write_hook(self, hook):
+        self._write_hooks.append(hook)
+
+    """
+    Tells the write hooks that rows of a table were changed outside of this class, e.g. with the cursor directly
+    Parameters:
+        - table_name (str) - The table that was written
+        - keys (List) - The primary key values of the changed rows, None if unknown
+    """
+    def notify_write(self, table_name: str, keys: Optional[List[Any]] = None):
+        self._notify_write('after', table_name, keys)
+
+    def _notify_write(self, phase: str, table_name: str, keys: Optional[List[Any]]):
+        for hook in self._write_hooks:
+            try:
+                hook(phase, table_name, keys)
+            except Exception as e:
+                # A failing hook must never fail the write it observes
+                self.logger.error(f"Write hook failed for table {table_name}: {str(e)}")
+
+    @staticmethod
+    def _row_keys(rows: List[List[Any]], columns_info: List[tuple]) -> Optional[List[Any]]:
+        pk_indexes = [index for index, info in enumerate(columns_info) if info[5] == 1]
+        if len(pk_indexes) != 1:
+            return None
+        return [row[pk_indexes[0]] for row in rows]
+
+    """
+    Fetches the result of the last statement in the given orient
+        - 'records': a list of dictionaries, one per row
+        - 'rows': {"columns": [...], "rows": [...]}, one tuple per row as fetched
+        - 'columns': {"columns": [...], "data": [...]}, one list per column, for column-oriented consumers such as DataFrames
+    """
+    def _fetch_result(self, orient: str) -> Any:
+        columns = [column[0] for column in self.cursor.description]
+        if orient == 'columns':
+            return {"columns": columns, "data": self._fetch_columns(len(columns))}
+        rows = self._fetchall()
+        if orient == 'rows':
+            return {"columns": columns, "rows": rows}
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _fetch_columns(self, column_count: int, batch_size: int = 10_000) -> List[list]:
+        # Transposed a batch at a time, so the row tuples of the whole result never exist at once
+        data = [[] for _ in range(column_count)]
+        row_count = 0
+        while rows := self.cursor.fetchmany(batch_size):
+            row_count += len(rows)
+            for column, values in zip(data, zip(*rows)):
+                column.extend(values)
+        self._observe_fetch(row_count)
+        return data
+
+    """
+    Rejects a read whose estimated cost exceeds the budget of the current request, see app.utils.query_guard
+    Parameters:
+        - query (str), parameters - The statement about to run
+        - stops_after (int) - Rows after which the statement stops, for statements reading their table without a filter
+    Raises:
+        - QueryBudgetExceeded if the statement is estimated to read more rows than the budget allows
+    """
+    def _check_cost(self, query: str, parameters=(), stops_after: Optional[int] = None):
+        budget = query_guard.current()
+        if budget is None or not budget.max_cost:
+            return
+        cost, plan = query_guard.estimate_cost(self.db, query, parameters, stops_after)
+        if cost > budget.max_cost:
+            raise query_guard.QueryBudgetExceeded(cost, budget.max_cost, plan)
+
+    """Returns the response to a read that was rejected or interrupted by its budget, None for other errors"""
+    def _budget_failure(self, table_name: str, error: Exception) -> Optional[Tuple[str, int]]:
+        if isinstance(error, query_guard.QueryBudgetExceeded):
+            message = self.MESSAGES["QUERY_OVER_BUDGET"].format(table_name=table_name, error=str(error))
+            self.logger.warning(message)
+            return message, 422
+        # Only the error of a statement stopped by the progress handler, e.g. not a lock that outlived the deadline
+        if isinstance(error, sqlite3.OperationalError) and str(error) == 'interrupted' and query_guard.timed_out():
+            message = self.MESSAGES["QUERY_TIMEOUT"].format(table_name=table_name, timeout=query_guard.current().timeout)
+            self.logger.warning(message)
+            return message, 503
+        return None
+
+    @staticmethod
+    def _page_clause(limit: Optional[int], offset: int) -> Tuple[str, list]:
+        if limit is None and not offset:
+            return "", []
+        # SQLite only accepts OFFSET after a LIMIT, -1 means no limit
+        return " LIMIT ? OFFSET ?", [limit if limit is not None else -1, offset]
+
     @staticmethod
     def to_snake_case(name: str) -> str:
         return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
@@ -123,11 +318,13 @@ class SQLiteAPI:
     Parameters:
         db_path (str) - The path to the database file
         force_connect (bool) - Whether to force a connection if already connected
+        read_only (bool) - Whether to open the file read-only, with query_only set, so the connection can never write
+        mmap_size (int) - Bytes of the file read through memory-mapped I/O, 0 to read with system calls
     Returns:
         Response message (str)
         HTTP Status Code (int)
     """
-    def connect(self, db_path:str, force_connect:bool=False) -> Tuple[str, int]:
+    def connect(self, db_path:str, force_connect:bool=False, read_only:bool=False, mmap_size:int=0) -> Tuple[str, int]:
 
         self.logger.info(self.MESSAGES["INITIALIZING_CONNECTION"].format(db_name=db_path))
         db_name = os.path.basename(db_path).split('.')[0]
@@ -156,8 +353,27 @@ class SQLiteAPI:
 
             self.db_path = db_path
             self.db_name = db_name
-            self.db = sqlite3.connect(db_path, check_same_thread=False)
-            self.cursor = self.db.cursor()
+            if read_only:
+                uri = f"file:{urllib.parse.quote(os.path.abspath(db_path))}?mode=ro"
+                self.db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                self.cursor = self.db.cursor()
+                self.cursor.execute("PRAGMA query_only = ON").fetchall()
+            else:
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.cursor = self.db.cursor()
+                # Pragmas are read to the end, a pragma statement left unfinished keeps the lock it took on the file
+                # Only applies to new databases, existing ones keep their mode until their next VACUUM
+                # Setting it takes the write lock even when unchanged, so it is only set while the file is empty
+                if self.cursor.execute("PRAGMA page_count").fetchone()[0] == 0:
+                    self.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL").fetchall()
+                # Readers see the last commit before their read began while writes go to the write-ahead log,
+                # so reads on the read-only connections never lock out writes; the mode persists in the file
+                self.cursor.execute("PRAGMA journal_mode = WAL").fetchall()
+            if mmap_size > 0:
+                self.cursor.execute(f"PRAGMA mmap_size = {int(mmap_size)}").fetchall()
+            # Interrupts statements that outlive the budget of their request, see app.utils.query_guard
+            self.db.set_progress_handler(query_guard.progress_handler, query_guard.PROGRESS_INSTRUCTIONS)
+            self.read_only = read_only
             self.connected = True
 
             message = self.MESSAGES["CONNECT_SUCCESS"].format(db_name=self.db_name)
@@ -226,18 +442,18 @@ class SQLiteAPI:
                 return False
 
             if not self.connected:
-                self.logger.info(self.MESSAGES["NOT_CONNECTED"])
+                self.logger.debug(self.MESSAGES["NOT_CONNECTED"])
                 return False
 
             query = "SELECT name FROM sqlite_master WHERE type='table' AND name=?;"
-            self.cursor.execute(query, (table_name,))
-            self.logger.info(f"Checking if table {table_name} exists in database {self.db_name}...")
-            exists = self.cursor.fetchone() is not None
+            self._execute(query, (table_name,))
+            self.logger.debug(f"Checking if table {table_name} exists in database {self.db_name}...")
+            exists = self._fetchone() is not None
             if exists:
-                self.logger.info(self.MESSAGES["TABLE_FOUND"].format(table_name=table_name))
+                self.logger.debug(self.MESSAGES["TABLE_FOUND"].format(table_name=table_name))
                 return True
             else:
-                self.logger.warning(self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name))
+                self.logger.debug(self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name))
                 return False
 
         except Exception as e:
@@ -277,9 +493,9 @@ class SQLiteAPI:
             columns = ", ".join(columns)
 
             query = f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})"
-            self.cursor.execute(query)
+            self._execute(query)
 
-            self.db.commit()
+            self._commit()
             message = self.MESSAGES["TABLE_CREATED"].format(table_name=table_name)
             self.logger.info(message)
 
@@ -310,9 +526,9 @@ class SQLiteAPI:
                 self.logger.warning(message)
                 return message, 404
 
-            self.cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
-            self.cursor.execute(f"VACUUM")
-            self.db.commit()
+            # Freed pages are reclaimed in small steps by MaintenanceAPI, a VACUUM here would rewrite the whole file
+            self._execute(f"DROP TABLE IF EXISTS {table_name}")
+            self._commit()
 
             message = self.MESSAGES["TABLE_DELETED"].format(table_name=table_name)
             self.logger.info(message)
@@ -325,9 +541,9 @@ class SQLiteAPI:
             return message, 500
 
     def get_primary_key_column(self, table_name: str) -> Optional[str]:
-        self.cursor.execute(f"PRAGMA table_info({table_name})")
+        self._execute(f"PRAGMA table_info({table_name})")
         primary_key_column = None
-        for column_info in self.cursor.fetchall():
+        for column_info in self._fetchall():
             if column_info[5] == 1:  # pk flag is column 5 in PRAGMA table_info
                 primary_key_column = column_info[1]  # Index 1 is column name
                 break
@@ -345,7 +561,7 @@ class SQLiteAPI:
     def get_row(self, table_name: str, primary_key_value: str) -> Tuple[Optional[dict], int]:
         try:
             if not self.connected:
-                self.logger.info(self.MESSAGES["NOT_CONNECTED"])
+                self.logger.debug(self.MESSAGES["NOT_CONNECTED"])
                 return None, 400
 
             if not self._table_exists(table_name):
@@ -355,21 +571,21 @@ class SQLiteAPI:
             primary_key_column = self.get_primary_key_column(table_name)
 
             query = f"SELECT * FROM {table_name} WHERE {primary_key_column} = ?"
-            self.cursor.execute(query, (primary_key_value,))
-            row = self.cursor.fetchone()
+            self._execute(query, (primary_key_value,))
+            row = self._fetchone()
 
             if row is None:
-                self.logger.info(self.MESSAGES["ROW_NOT_FOUND"].format(table_name=table_name, row_id=primary_key_value))
+                self.logger.debug(self.MESSAGES["ROW_NOT_FOUND"].format(table_name=table_name, row_id=primary_key_value))
                 return None, 404
 
             column_names = [description[0] for description in self.cursor.description]
             row_data = dict(zip(column_names, row))
 
-            self.logger.info(self.MESSAGES["ROW_RETRIEVAL_SUCCESS"].format(table_name=table_name, row_id=primary_key_value))
+            self.logger.debug(self.MESSAGES["ROW_RETRIEVAL_SUCCESS"].format(table_name=table_name, row_id=primary_key_value))
             return row_data, 200
 
         except Exception as e:
-            message = f"{self.MESSAGES['ROWS_RETRIEVAL_FAILED'].format(table_name=table_name)}: {str(e)}"
+            message = f"{self.MESSAGES['ROWS_RETRIEVAL_FAIL'].format(table_name=table_name)}: {str(e)}"
             self.logger.error(message)
             return None, 500
 
@@ -378,36 +594,99 @@ class SQLiteAPI:
     Parameters:
         - table_name (str) - The name of the table to retrieve rows from
         - conditions (List[str]) - A list of conditions to filter the rows by
+        - orient (str) - 'records', 'rows' or 'columns', see _fetch_result
+        - limit (int), offset (int) - The page of rows to return, all rows by default
     Returns:
-        - A list of dictionaries representing the rows of the table if found, None otherwise
+        - The rows of the table in the given orient if found, None otherwise
         - HTTP Status Code (int)
     """
-    def get_rows(self, table_name: str, conditions: List[str]) -> Tuple[Optional[List[dict]], int]:
+    def get_rows(self, table_name: str, conditions: List[str], orient: str = 'records',
+                 limit: Optional[int] = None, offset: int = 0) -> Tuple[Optional[Any], int]:
         try:
             if not self.connected:
-                self.logger.info(self.MESSAGES["NOT_CONNECTED"])
+                self.logger.debug(self.MESSAGES["NOT_CONNECTED"])
                 return None, 400
 
+            if orient not in self.ORIENTS:
+                return self.MESSAGES["INVALID_ORIENT"].format(orient=orient, orients=', '.join(self.ORIENTS)), 400
+
+            if (limit is not None and limit < 0) or offset < 0:
+                return self.MESSAGES["INVALID_PAGE"], 400
+
             if not self._table_exists(table_name):
                 self.logger.warning(self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name))
                 return None, 404
 
             condition_str = " AND ".join(conditions) if conditions else "1=1"  # Select all if no conditions
-            query = f"SELECT * FROM {table_name} WHERE {condition_str}"
-            self.cursor.execute(query)
-            columns = [column[0] for column in self.cursor.description]
-            rows = [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+            page, parameters = self._page_clause(limit, offset)
+            query = f"SELECT * FROM {table_name} WHERE {condition_str}{page}"
+            self._check_cost(query, parameters, stops_after=offset + limit if limit is not None and not conditions else None)
+            self._execute(query, parameters)
+            rows = self._fetch_result(orient)
 
             message = self.MESSAGES["ROWS_FOUND"].format(table_name=table_name)
-            self.logger.info(message)
+            self.logger.debug(message)
 
             return rows, 200
 
         except Exception as e:
-            message = f"{self.MESSAGES['ROWS_RETRIEVAL_FAILED'].format(table_name=table_name)}: {str(e)}"
+            if (failure := self._budget_failure(table_name, e)) is not None:
+                return failure
+            message = f"{self.MESSAGES['ROWS_RETRIEVAL_FAIL'].format(table_name=table_name)}: {str(e)}"
             self.logger.error(message)
             return None, 500
 
+    """
+    Runs a projection/aggregation query on a table, compiled from a spec to parameterized SQL
+    Parameters:
+        - table_name (str) - The name of the table to query
+        - spec (dict) - Columns, aggregates, filters, group_by, having, order_by, limit and offset,
+                        see app.utils.query_compiler for the format
+    Returns:
+        - A dictionary with the result "columns" and "rows" if successful, a message otherwise
+        - HTTP Status Code (int)
+    """
+    def query_table(self, table_name: str, spec: Dict[str, Any]) -> Tuple[Any, int]:
+        try:
+            if not self.connected:
+                message = self.MESSAGES["NOT_CONNECTED"]
+                self.logger.debug(message)
+                return message, 400
+
+            if not self._table_exists(table_name):
+                message = self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name)
+                self.logger.warning(message)
+                return message, 404
+
+            self._execute(f"PRAGMA table_info({table_name})")
+            columns = [info[1] for info in self._fetchall()]
+
+            try:
+                query, parameters = compile_query(table_name, columns, spec)
+            except QueryValidationError as e:
+                message = self.MESSAGES["QUERY_INVALID"].format(table_name=table_name, error=str(e))
+                self.logger.warning(message)
+                return message, 400
+
+            # Without a filter or aggregate, a limited query stops reading once its page is complete
+            unfiltered = not any(spec.get(key) for key in ('filters', 'aggregates', 'group_by', 'having'))
+            limit = spec.get('limit')
+            stops_after = limit + (spec.get('offset') or 0) if unfiltered and isinstance(limit, int) else None
+            self._check_cost(query, parameters, stops_after)
+            self._execute(query, parameters)
+            result_columns = [column[0] for column in self.cursor.description]
+            rows = self._fetchall()
+
+            self.logger.debug(self.MESSAGES["QUERY_SUCCESS"].format(table_name=table_name, row_count=len(rows)))
+            return {"columns": result_columns, "rows": rows}, 200
+
+        except Exception as e:
+            if (failure := self._budget_failure(table_name, e)) is not None:
+                return failure
+            message = self.MESSAGES["QUERY_FAIL"].format(table_name=table_name) + f" {str(e)}"
+            self.logger.error(message)
+            return message, 500
+
     """
     Insert row into table in SQLite Database
     Parameters:
@@ -421,7 +700,7 @@ class SQLiteAPI:
         try:
             if not self.connected:
                 message = self.MESSAGES["NOT_CONNECTED"]
-                self.logger.info(message)
+                self.logger.debug(message)
                 return message, 400
 
             if not self._table_exists(table_name):
@@ -431,11 +710,13 @@ class SQLiteAPI:
 
             placeholders = ", ".join(["?" for _ in row])
             insert_query = f"INSERT INTO {table_name} VALUES ({placeholders})"
-            self.cursor.execute(insert_query, row)
-            self.db.commit()
+            self._execute(insert_query, row)
+            self._commit()
+            if self._write_hooks:
+                self.notify_write(table_name)
 
             message = self.MESSAGES["ROW_INSERTED"].format(table_name=table_name)
-            self.logger.info(message)
+            self.logger.debug(message)
             return message, 201
 
         except Exception as e:
@@ -456,7 +737,7 @@ class SQLiteAPI:
         try:
             if not self.connected:
                 message = self.MESSAGES["NOT_CONNECTED"]
-                self.logger.info(message)
+                self.logger.debug(message)
                 return message, 400
 
             if not self._table_exists(table_name):
@@ -464,18 +745,20 @@ class SQLiteAPI:
                 self.logger.warning(message)
                 return message, 404
 
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = self.cursor.fetchall()
+            self._execute(f"PRAGMA table_info({table_name})")
+            columns_info = self._fetchall()
             column_names = [info[1] for info in columns_info]
 
             placeholders = ', '.join(['?' for _ in column_names])
             insert_query = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({placeholders})"
 
-            self.cursor.executemany(insert_query, rows)
-            self.db.commit()
+            self._executemany(insert_query, rows)
+            self._commit()
+            if self._write_hooks:
+                self.notify_write(table_name, self._row_keys(rows, columns_info))
 
             message = self.MESSAGES["ROWS_INSERTION_SUCCESS"].format(table_name=table_name)
-            self.logger.info(message)
+            self.logger.debug(message)
 
             return message, 201
 
@@ -484,6 +767,63 @@ class SQLiteAPI:
             self.logger.error(message)
             return message, 500
 
+    """
+    Insert or update multiple rows in a table in SQLite Database, matching on the primary key
+    Parameters:
+        - table_name (str) - The name of the table to upsert rows into
+        - rows (List[List[str]]) - A list of row data, with values in table column order
+    Returns:
+        Response message (str)
+        HTTP Status Code (int)
+    """
+    def upsert_rows(self, table_name: str, rows: List[List[str]]) -> Tuple[str, int]:
+        try:
+            if not self.connected:
+                message = self.MESSAGES["NOT_CONNECTED"]
+                self.logger.debug(message)
+                return message, 400
+
+            if not self._table_exists(table_name):
+                message = self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name)
+                self.logger.warning(message)
+                return message, 404
+
+            primary_key_column = self.get_primary_key_column(table_name)
+            if primary_key_column is None:
+                message = f"Table '{table_name}' has no primary key to upsert on."
+                self.logger.warning(message)
+                return message, 400
+
+            self._execute(f"PRAGMA table_info({table_name})")
+            columns_info = self._fetchall()
+            column_names = [info[1] for info in columns_info]
+
+            placeholders = ', '.join(['?' for _ in column_names])
+            update_clause = ', '.join([f"{column} = excluded.{column}" for column in column_names if column != primary_key_column])
+            upsert_query = (
+                f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({placeholders}) "
+                f"ON CONFLICT({primary_key_column}) DO UPDATE SET {update_clause}"
+            )
+
+            keys = self._row_keys(rows, columns_info) if self._write_hooks else None
+            if self._write_hooks:
+                self._notify_write('before', table_name, keys)
+
+            self._executemany(upsert_query, rows)
+            self._commit()
+            if self._write_hooks:
+                self._notify_write('after', table_name, keys)
+
+            message = self.MESSAGES["ROWS_UPSERT_SUCCESS"].format(table_name=table_name)
+            self.logger.debug(message)
+
+            return message, 200
+
+        except Exception as e:
+            message = self.MESSAGES["ROWS_UPSERT_FAIL"].format(table_name=table_name) + f" {str(e)}"
+            self.logger.error(message)
+            return message, 500
+
     """
     Delete rows from table in SQLite Database
     Parameters:
@@ -495,7 +835,7 @@ class SQLiteAPI:
     def delete_rows(self, table_name: str, conditions: List[str]) -> Tuple[str, int]:
         if not self.connected:
             message = self.MESSAGES["NOT_CONNECTED"]
-            self.logger.info(message)
+            self.logger.debug(message)
             return message, 400
 
         if not self._table_exists(table_name):
@@ -506,16 +846,18 @@ class SQLiteAPI:
         try:
             condition_str = " AND ".join(conditions)
             delete_query = f"DELETE FROM {table_name} WHERE {condition_str}"
-            self.cursor.execute(delete_query)
+            self._execute(delete_query)
 
-            self.db.commit()
+            self._commit()
+            if self._write_hooks:
+                self.notify_write(table_name)
 
             message = self.MESSAGES["ROWS_DELETED"].format(table_name=table_name)
-            self.logger.info(message)
+            self.logger.debug(message)
             return message, 200
 
         except Exception as e:
-            message = f"{self.MESSAGES['ROWS_DELETION_FAILED'].format(table_name=table_name)} {str(e)}"
+            message = f"{self.MESSAGES['ROWS_DELETION_FAIL'].format(table_name=table_name)} {str(e)}"
             self.logger.error(message)
             return message, 500
 
@@ -533,7 +875,7 @@ class SQLiteAPI:
         try:
             if not self.connected:
                 message = self.MESSAGES["NOT_CONNECTED"]
-                self.logger.info(message)
+                self.logger.debug(message)
                 return message, 400
 
             if not self._table_exists(table_name):
@@ -541,8 +883,8 @@ class SQLiteAPI:
                 self.logger.warning(message)
                 return message, 404
 
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns_info = self.cursor.fetchall()
+            self._execute(f"PRAGMA table_info({table_name})")
+            columns_info = self._fetchall()
             column_names = [info[1] for info in columns_info]
 
             if len(column_names) < 2:
@@ -556,7 +898,11 @@ class SQLiteAPI:
             set_clause = ', '.join([f"{column} = ?" for column in update_columns])
             update_query_template = f"UPDATE {table_name} SET {set_clause} WHERE {identifier_col} = ?"
 
-            with self.db:
+            keys = [row[0] for row in rows if len(row) == len(column_names)] if self._write_hooks else None
+            if self._write_hooks:
+                self._notify_write('before', table_name, keys)
+
+            try:
                 for row in rows:
                     if len(row) != len(column_names):
                         message = f"Row length {len(row)} does not match table column count {len(column_names)}"
@@ -566,11 +912,16 @@ class SQLiteAPI:
                     unique_id = row[0]
                     values = row[1:]
 
-                    self.cursor.execute(update_query_template, values + [unique_id])
+                    self._execute(update_query_template, values + [unique_id])
+            except Exception:
+                self._rollback()
+                raise
 
-            self.db.commit()
+            self._commit()
+            if self._write_hooks:
+                self._notify_write('after', table_name, keys)
             message = self.MESSAGES["ROWS_UPDATE_SUCCESS"].format(table_name=table_name)
-            self.logger.info(message)
+            self.logger.debug(message)
 
             return message, 200
 
@@ -583,70 +934,83 @@ class SQLiteAPI:
     Retrieve table from SQLite Database
     Parameters:
     table_name - The name of the table to retrieve
+    orient - 'records', 'rows' or 'columns', see _fetch_result
+    limit, offset - The page of rows to return, all rows by default
     Returns:
-        - A list of dictionaries representing the rows of the table if found,
+        - The rows of the table in the given orient if found,
           None otherwise
         - HTTP Status Code (int)
     """
-    def get_table(self, table_name: str) -> Tuple[Optional[List[dict]], int]:
+    def get_table(self, table_name: str, orient: str = 'records', limit: Optional[int] = None, offset: int = 0) -> Tuple[Optional[Any], int]:
         try:
             if not self.connected:
-                self.logger.info(self.MESSAGES["NOT_CONNECTED"])
+                self.logger.debug(self.MESSAGES["NOT_CONNECTED"])
                 return None, 400
 
+            if orient not in self.ORIENTS:
+                return self.MESSAGES["INVALID_ORIENT"].format(orient=orient, orients=', '.join(self.ORIENTS)), 400
+
+            if (limit is not None and limit < 0) or offset < 0:
+                return self.MESSAGES["INVALID_PAGE"], 400
+
             if not self._table_exists(table_name):
                 self.logger.warning(self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name))
                 return None, 404
 
-            self.logger.info(self.MESSAGES["TABLE_FOUND"].format(table_name=table_name))
-
-            query = f"SELECT * FROM ?"
-            self.cursor.execute(query, (table_name,))
-            rows = self.cursor.fetchall()
-
-            if not rows:
-                self.logger.info(self.MESSAGES["NO_ROWS_FOUND"].format(table_name=table_name))
-                return [], 200
-
-            self.logger.info(self.MESSAGES["ROWS_FOUND"].format(table_name=table_name))
+            self.logger.debug(self.MESSAGES["TABLE_FOUND"].format(table_name=table_name))
 
-            columns = [column[0] for column in self.cursor.description]
+            # Identifiers cannot be bound as parameters; the name was checked against sqlite_master above
+            page, parameters = self._page_clause(limit, offset)
+            query = f"SELECT * FROM {table_name}{page}"
+            self._check_cost(query, parameters, stops_after=offset + limit if limit is not None else None)
+            self._execute(query, parameters)
+            result = self._fetch_result(orient)
 
-            result = [dict(zip(columns, row)) for row in rows]
-
-            self.logger.info(self.MESSAGES["TABLE_RETRIEVED"].format(table_name=table_name))
+            self.logger.debug(self.MESSAGES["TABLE_RETRIEVED"].format(table_name=table_name))
             return result, 200
 
         except sqlite3.Error as e:
+            if (failure := self._budget_failure(table_name, e)) is not None:
+                return failure
             self.logger.error(f"Database error occurred while retrieving table {table_name}: {str(e)}")
             return None, 500
 
         except Exception as e:
+            if (failure := self._budget_failure(table_name, e)) is not None:
+                return failure
             self.logger.error(f"Unexpected error occurred while retrieving table {table_name}: {str(e)}")
             return None, 500
 
     """
     Retrieves all table data from SQLite Database
+    Parameters:
+        - orient (str) - 'rows' or 'columns', see _fetch_result
     Returns:
         - A dictionary with the names of the tables as keys. Each value is another dictionary containing:
             - "columns": list of str, the names of the columns.
             - "rows": list of tuples, where each tuple represents a row of data from the table.
+              Or with orient 'columns', "data": list of tuples, where each tuple holds the values of a column.
             Otherwise None If the database is not connected, or if there are no tables, or if an error occurs during retrieval.
         - HTTP Status Code (int)
     """
 
-    def get_tables(self) -> Tuple[Optional[Dict[str, Dict[str, Any]]], int]:
+    def get_tables(self, orient: str = 'rows') -> Tuple[Optional[Dict[str, Dict[str, Any]]], int]:
+        # The table being read, for the message of a read interrupted by its budget
+        table_name = 'sqlite_master'
         try:
             if not self.connected:
-                self.logger.info(self.MESSAGES["NOT_CONNECTED"])
+                self.logger.debug(self.MESSAGES["NOT_CONNECTED"])
                 return None, 400
 
+            if orient not in ('rows', 'columns'):
+                return self.MESSAGES["INVALID_ORIENT"].format(orient=orient, orients='rows, columns'), 400
+
             query = "SELECT name FROM sqlite_master WHERE type='table' AND name!='sqlite_sequence';"
-            self.cursor.execute(query)
-            table_names = self.cursor.fetchall()
+            self._execute(query)
+            table_names = self._fetchall()
 
             if not table_names:
-                self.logger.info(self.MESSAGES["NO_TABLES_FOUND"])
+                self.logger.debug(self.MESSAGES["NO_TABLES_FOUND"])
                 return {"tables": {}}, 200
 
             all_table_data = {}
@@ -657,20 +1021,17 @@ class SQLiteAPI:
                 query = f"SELECT * FROM {table_name}"
 
                 # Execute query without additional bindings since no parameters are required
-                self.cursor.execute(query)
-                rows = self.cursor.fetchall()
-                column_names = [description[0] for description in self.cursor.description]
-                table_data = {
-                    "columns": column_names,
-                    "rows": rows
-                }
-                self.logger.info(f"Table {table_name} data retrieved.")
+                self._execute(query)
+                table_data = self._fetch_result(orient)
+                self.logger.debug(f"Table {table_name} data retrieved.")
                 all_table_data[table_name] = table_data
 
-            self.logger.info("All table data retrieved.")
+            self.logger.debug("All table data retrieved.")
             return {"tables": all_table_data}, 200
 
         except Exception as e:
+            if (failure := self._budget_failure(table_name, e)) is not None:
+                return failure
             self.logger.error(f"Unexpected error occurred while retrieving all table data: {str(e)}")
             return None, 500
 
@@ -686,20 +1047,20 @@ class SQLiteAPI:
     def get_table_schema(self, table_name: str) -> Tuple[Optional[List[dict]], int]:
         try:
             if not self.connected:
-                self.logger.info(self.MESSAGES["NOT_CONNECTED"])
+                self.logger.debug(self.MESSAGES["NOT_CONNECTED"])
                 return None, 400
 
             if not self._table_exists(table_name):
                 self.logger.warning(self.MESSAGES["TABLE_NOT_FOUND"].format(table_name=table_name))
                 return None, 404
 
-            self.cursor.execute(f"PRAGMA table_info({table_name})")
-            schema = self.cursor.fetchall()
+            self._execute(f"PRAGMA table_info({table_name})")
+            schema = self._fetchall()
             if not schema:
                 self.logger.warning(f"Table {table_name} schema not found.")
                 return None, 404
 
-            self.logger.info(self.MESSAGES["TABLE_SCHEMA_RETRIEVED"].format(table_name=table_name))
+            self.logger.debug(self.MESSAGES["TABLE_SCHEMA_RETRIEVED"].format(table_name=table_name))
             return schema, 200
 
         except Exception as e:
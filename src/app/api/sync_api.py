@@ -0,0 +1,371 @@
+"""
+This class is responsible for incrementally syncing Spotify track data into the SQLite Database.
+A watermark is recorded per source (a playlist snapshot id, or the last seen track ids),
+so only new or changed tracks are fetched from Spotify and removed tracks are tombstoned.
+A track counts as changed when its marker in the source changed, e.g. the added_at of a playlist item,
+as Spotify does not report changes to the track objects themselves.
+Fetched documents are stored as JSON and loaded into the normalized catalog tables, which summaries query.
+"""
+
+import asyncio
+import json
+import time
+import logging
+from typing import Optional, List, Dict, Any, Set, Tuple, Callable
+from app.api.sqlite_api import SQLiteAPI
+from app.api import catalog_api
+from app.api.catalog_api import SpotifyCatalogAPI
+
+WATERMARKS_TABLE = 'sync_watermarks'
+SOURCE_TRACKS_TABLE = 'sync_source_tracks'
+TRACKS_TABLE = 'spotify_tracks'
+AUDIO_FEATURES_TABLE = 'spotify_audio_features'
+
+TABLE_COLUMNS = {
+    WATERMARKS_TABLE: [
+        'source_id TEXT PRIMARY KEY',
+        'snapshot_id TEXT',
+        'track_count INTEGER',
+        'synced_at REAL',
+    ],
+    SOURCE_TRACKS_TABLE: [
+        'source_id TEXT',
+        'track_id TEXT',
+        'added_at REAL',
+        'removed_at REAL',
+        'marker TEXT',
+        'PRIMARY KEY (source_id, track_id)',
+    ],
+    TRACKS_TABLE: [
+        'id TEXT PRIMARY KEY',
+        'data TEXT',
+        'synced_at REAL',
+        'removed_at REAL',
+    ],
+    AUDIO_FEATURES_TABLE: [
+        'id TEXT PRIMARY KEY',
+        'data TEXT',
+        'synced_at REAL',
+    ],
+}
+
+# Keeps IN (...) lists well below SQLite's bound parameter limit
+_IN_CLAUSE_BATCH = 500
+
+
+class SpotifySyncAPI:
+
+    # Ensure consistency across log messages
+    MESSAGES = {
+        "SOURCE_UNCHANGED": "Source {source_id} unchanged since last sync (snapshot {snapshot_id}).",
+        "SOURCE_SYNCED": "Source {source_id} synced: {added} added, {changed} changed, {removed} removed, {fetched} fetched, {failed} failed.",
+        "SOURCE_SYNC_FAIL": "Failed to sync source {source_id}: {error}",
+        "CATALOG_ENRICHED": "Catalog enriched: {artists} artists and {albums} albums fetched, {failed} failed.",
+        "CATALOG_ENRICH_FAIL": "Failed to enrich the catalog: {error}",
+        "AUDIO_FEATURES_REFRESHED": "Audio features refreshed: {refreshed} of {tracks} tracks, {failed} failed.",
+        "AUDIO_FEATURES_REFRESH_FAIL": "Failed to refresh audio features: {error}",
+    }
+
+    """
+    Parameters:
+        - spotify_api (SpotifyAPI) - The client tracks are fetched with
+        - sqlite_api (SQLiteAPI) - The connection tracks are written with
+        - similarity_api (SimilarityAPI) - If given, fetched audio features are added to its index
+        - catalog (SpotifyCatalogAPI) - The catalog loaded with fetched tracks, defaults to one on sqlite_api
+        - chunk_size (int) - Tracks fetched and written per step, each step is its own transaction
+        - checkpoint (Callable) - Called without arguments between steps, e.g. to pause a background job
+    """
+    def __init__(self, spotify_api, sqlite_api: SQLiteAPI, similarity_api=None, catalog: Optional[SpotifyCatalogAPI] = None,
+                 chunk_size: int = 500, checkpoint: Optional[Callable[[], None]] = None):
+        self.logger = logging.getLogger(__name__)
+        self.spotify_api = spotify_api
+        self.sqlite_api = sqlite_api
+        self.similarity_api = similarity_api
+        self.catalog = catalog if catalog is not None else SpotifyCatalogAPI(sqlite_api)
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self._tables_created = False
+
+    def set_logger(self, logger):
+        self.logger = logger
+        self.catalog.set_logger(logger)
+
+    def _create_tables(self):
+        if self._tables_created:
+            return
+        for table_name, columns in TABLE_COLUMNS.items():
+            self.sqlite_api.create_table(table_name, columns)
+        if self.catalog.create_tables():
+            # Tracks synced before the catalog existed are only stored as JSON
+            message, status_code = self.catalog.backfill(TRACKS_TABLE, AUDIO_FEATURES_TABLE)
+            if status_code != 200:
+                raise RuntimeError(message)
+        self._tables_created = True
+
+    """
+    Syncs a playlist, skipping it entirely if its snapshot id matches the stored watermark
+    Tracks whose added_at changed since the last sync are fetched again
+    Parameters:
+        - playlist_id (str) - The Spotify id of the playlist
+        - retries (int) - The number of retries per request
+        - delay (float) - The delay between retries in seconds
+    Returns:
+        - A dictionary summarising the sync
+        - HTTP Status Code (int)
+    """
+    async def sync_playlist(self, playlist_id: str, retries: int, delay: float) -> Tuple[Dict[str, Any], int]:
+        source_id = f'playlist:{playlist_id}'
+        try:
+            self._create_tables()
+            snapshot_id = await self.spotify_api.get_playlist_snapshot_id(playlist_id, retries, delay)
+
+            watermark = self._get_watermark(source_id)
+            if watermark is not None and watermark['snapshot_id'] == snapshot_id:
+                self.logger.info(self.MESSAGES["SOURCE_UNCHANGED"].format(source_id=source_id, snapshot_id=snapshot_id))
+                return {"source_id": source_id, "unchanged": True, "added": 0, "changed": 0, "removed": 0, "fetched": 0, "failed": 0}, 200
+
+            items = await self.spotify_api.get_playlist_items(playlist_id, retries, delay)
+            return await self._sync_track_ids(source_id, [track_id for track_id, _ in items], snapshot_id, retries, delay, dict(items))
+
+        except Exception as e:
+            message = self.MESSAGES["SOURCE_SYNC_FAIL"].format(source_id=source_id, error=str(e))
+            self.logger.error(message)
+            return {"error": message}, 500
+
+    """
+    Syncs an arbitrary set of track ids, using the previously seen ids of the source as the watermark
+    Parameters:
+        - source_id (str) - A stable name for the source, e.g. 'library:saved_tracks'
+        - track_ids (List[str]) - The track ids currently in the source
+        - retries (int) - The number of retries per request
+        - delay (float) - The delay between retries in seconds
+        - markers (Dict[str, str]) - A marker per track id, e.g. when it was saved, tracks whose marker changed are fetched again;
+                                     without markers only tracks new to the source are fetched
+    Returns:
+        - A dictionary summarising the sync
+        - HTTP Status Code (int)
+    """
+    async def sync_track_ids(self, source_id: str, track_ids: List[str], retries: int, delay: float,
+                             markers: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], int]:
+        try:
+            self._create_tables()
+            return await self._sync_track_ids(source_id, track_ids, None, retries, delay, markers)
+
+        except Exception as e:
+            message = self.MESSAGES["SOURCE_SYNC_FAIL"].format(source_id=source_id, error=str(e))
+            self.logger.error(message)
+            return {"error": message}, 500
+
+    async def _sync_track_ids(self, source_id: str, track_ids: List[str], snapshot_id: Optional[str], retries: int, delay: float,
+                              markers: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], int]:
+        markers = markers or {}
+        current = list(dict.fromkeys(track_ids))
+        known = self._get_source_track_ids(source_id)
+
+        added = [track_id for track_id in current if track_id not in known]
+        removed = list(set(known) - set(current))
+        # Tracks synced before markers were recorded only have theirs recorded, not fetched again
+        changed = [
+            track_id for track_id in current
+            if track_id in known and known[track_id] is not None and markers.get(track_id, known[track_id]) != known[track_id]
+        ]
+        unmarked = [track_id for track_id in current if track_id in known and known[track_id] is None and track_id in markers]
+
+        # Tracks already synced through another source don't need to be fetched again, unless they changed
+        live = self._get_live_track_ids(added)
+        stale = [track_id for track_id in added if track_id not in live] + changed
+        failed = set()
+        async for chunk in self._chunks(stale):
+            failed |= await self._fetch_and_upsert(chunk, retries, delay)
+        # Failed tracks are left out of the watermark (and the snapshot isn't recorded) so the next sync fetches them again
+        added = [track_id for track_id in added if track_id not in failed]
+        changed = [track_id for track_id in changed if track_id not in failed]
+
+        now = time.time()
+        with self.sqlite_api.transaction(immediate=True):
+            self.sqlite_api._executemany(
+                f"INSERT INTO {SOURCE_TRACKS_TABLE} (source_id, track_id, added_at, removed_at, marker) VALUES (?, ?, ?, NULL, ?) "
+                f"ON CONFLICT(source_id, track_id) DO UPDATE SET added_at = excluded.added_at, removed_at = NULL, marker = excluded.marker",
+                [(source_id, track_id, now, markers.get(track_id)) for track_id in added]
+            )
+            self.sqlite_api._executemany(
+                f"UPDATE {SOURCE_TRACKS_TABLE} SET marker = ? WHERE source_id = ? AND track_id = ?",
+                [(markers[track_id], source_id, track_id) for track_id in changed + unmarked]
+            )
+            self.sqlite_api._executemany(
+                f"UPDATE {SOURCE_TRACKS_TABLE} SET removed_at = ? WHERE source_id = ? AND track_id = ?",
+                [(now, source_id, track_id) for track_id in removed]
+            )
+            # Tombstone tracks that no longer belong to any source
+            for table_name in (TRACKS_TABLE, catalog_api.TRACKS_TABLE):
+                self.sqlite_api._executemany(
+                    f"UPDATE {table_name} SET removed_at = ? WHERE id = ? AND NOT EXISTS ("
+                    f"SELECT 1 FROM {SOURCE_TRACKS_TABLE} WHERE track_id = ? AND removed_at IS NULL)",
+                    [(now, track_id, track_id) for track_id in removed]
+                )
+            self.sqlite_api._execute(
+                f"INSERT OR REPLACE INTO {WATERMARKS_TABLE} (source_id, snapshot_id, track_count, synced_at) VALUES (?, ?, ?, ?)",
+                (source_id, snapshot_id if not failed else None, len(current), now)
+            )
+        if removed:
+            # Tombstones bypass the write hooks, so summaries over live tracks must be told
+            self.sqlite_api.notify_write(TRACKS_TABLE, removed)
+            self.sqlite_api.notify_write(catalog_api.TRACKS_TABLE, removed)
+
+        summary = {
+            "source_id": source_id, "unchanged": False, "added": len(added), "changed": len(changed), "removed": len(removed),
+            "fetched": len(stale) - len(failed), "failed": len(failed),
+        }
+        self.logger.info(self.MESSAGES["SOURCE_SYNCED"].format(**summary))
+        return summary, 200
+
+    async def _chunks(self, track_ids: List[str]):
+        for i in range(0, len(track_ids), self.chunk_size):
+            if i and self.checkpoint is not None:
+                # Run off the event loop, the checkpoint may block while the caller pauses
+                await asyncio.to_thread(self.checkpoint)
+            yield track_ids[i:i + self.chunk_size]
+
+    async def _fetch_and_upsert(self, track_ids: List[str], retries: int, delay: float) -> Set[str]:
+        tracks, track_failures = await self.spotify_api.get_tracks_data(track_ids, retries, delay)
+        audio_features, feature_failures = await self.spotify_api.get_tracks_audio_features(track_ids, retries, delay)
+        failed = set(track_failures) | set(feature_failures)
+
+        now = time.time()
+        track_rows = [[track['id'], json.dumps(track), now, None] for track in tracks if track]
+        feature_rows = [[features['id'], json.dumps(features), now] for features in audio_features if features]
+
+        for table_name, rows in ((TRACKS_TABLE, track_rows), (AUDIO_FEATURES_TABLE, feature_rows)):
+            if not rows:
+                continue
+            message, status_code = self.sqlite_api.upsert_rows(table_name, rows)
+            if status_code >= 300:
+                raise RuntimeError(message)
+
+        for load, items in ((self.catalog.load_tracks, tracks), (self.catalog.load_audio_features, audio_features)):
+            message, status_code = load(items)
+            if status_code != 200:
+                raise RuntimeError(message)
+
+        if self.similarity_api is not None and feature_rows:
+            self.similarity_api.add([features for features in audio_features if features])
+
+        return failed
+
+    """
+    Fetches the full artist and album objects of catalog entries only known from the tracks they appear on,
+    adding popularity, followers and genres of artists and the label and popularity of albums
+    Parameters:
+        - retries (int) - The number of retries per request
+        - delay (float) - The delay between retries in seconds
+    Returns:
+        - A dictionary summarising the enrichment
+        - HTTP Status Code (int)
+    """
+    async def enrich_catalog(self, retries: int, delay: float) -> Tuple[Dict[str, Any], int]:
+        try:
+            self._create_tables()
+            summary = {"artists": 0, "albums": 0, "failed": 0}
+            pending = (
+                ('artists', catalog_api.ARTISTS_TABLE, 'followers', self.spotify_api.get_artists_data, self.catalog.load_artists),
+                ('albums', catalog_api.ALBUMS_TABLE, 'label', self.spotify_api.get_albums_data, self.catalog.load_albums),
+            )
+            for name, table_name, detail_column, fetch, load in pending:
+                self.sqlite_api._execute(f"SELECT id FROM {table_name} WHERE {detail_column} IS NULL")
+                ids = [row[0] for row in self.sqlite_api._fetchall()]
+                if not ids:
+                    continue
+                items, failures = await fetch(ids, retries, delay)
+                summary["failed"] += len(failures)
+                message, status_code = load(items)
+                if status_code != 200:
+                    raise RuntimeError(message)
+                summary[name] = len([item for item in items if item])
+
+            self.logger.info(self.MESSAGES["CATALOG_ENRICHED"].format(**summary))
+            return summary, 200
+
+        except Exception as e:
+            message = self.MESSAGES["CATALOG_ENRICH_FAIL"].format(error=str(e))
+            self.logger.error(message)
+            return {"error": message}, 500
+
+    """
+    Fetches the audio features of live catalog tracks that have none, or whose features are older than max_age
+    Parameters:
+        - retries (int) - The number of retries per request
+        - delay (float) - The delay between retries in seconds
+        - max_age (float) - Seconds after which stored features are fetched again
+        - limit (int) - Tracks refreshed at most, those without features or with the oldest first
+    Returns:
+        - A dictionary summarising the refresh
+        - HTTP Status Code (int)
+    """
+    async def refresh_audio_features(self, retries: int, delay: float, max_age: float = 30 * 24 * 3600, limit: int = 5000) -> Tuple[Dict[str, Any], int]:
+        try:
+            self._create_tables()
+            self.sqlite_api._execute(
+                f"SELECT t.id FROM {catalog_api.TRACKS_TABLE} t "
+                f"LEFT JOIN {catalog_api.AUDIO_FEATURES_TABLE} f ON f.track_id = t.id "
+                f"WHERE t.removed_at IS NULL AND (f.track_id IS NULL OR f.synced_at < ?) "
+                f"ORDER BY f.synced_at IS NOT NULL, f.synced_at LIMIT ?",
+                (time.time() - max_age, limit)
+            )
+            track_ids = [row[0] for row in self.sqlite_api._fetchall()]
+            summary = {"tracks": len(track_ids), "refreshed": 0, "failed": 0}
+
+            async for chunk in self._chunks(track_ids):
+                audio_features, _ = await self.spotify_api.get_tracks_audio_features(chunk, retries, delay)
+                audio_features = [features for features in audio_features if features]
+                summary["failed"] += len(chunk) - len(audio_features)
+                if not audio_features:
+                    continue
+                now = time.time()
+                message, status_code = self.sqlite_api.upsert_rows(
+                    AUDIO_FEATURES_TABLE, [[features['id'], json.dumps(features), now] for features in audio_features]
+                )
+                if status_code >= 300:
+                    raise RuntimeError(message)
+                message, status_code = self.catalog.load_audio_features(audio_features)
+                if status_code != 200:
+                    raise RuntimeError(message)
+                if self.similarity_api is not None:
+                    self.similarity_api.add(audio_features)
+                summary["refreshed"] += len(audio_features)
+
+            self.logger.info(self.MESSAGES["AUDIO_FEATURES_REFRESHED"].format(**summary))
+            return summary, 200
+
+        except Exception as e:
+            message = self.MESSAGES["AUDIO_FEATURES_REFRESH_FAIL"].format(error=str(e))
+            self.logger.error(message)
+            return {"error": message}, 500
+
+    def _get_watermark(self, source_id: str) -> Optional[Dict[str, Any]]:
+        self.sqlite_api._execute(
+            f"SELECT source_id, snapshot_id, track_count, synced_at FROM {WATERMARKS_TABLE} WHERE source_id = ?",
+            (source_id,)
+        )
+        row = self.sqlite_api._fetchone()
+        if row is None:
+            return None
+        return dict(zip(['source_id', 'snapshot_id', 'track_count', 'synced_at'], row))
+
+    def _get_source_track_ids(self, source_id: str) -> Dict[str, Optional[str]]:
+        self.sqlite_api._execute(
+            f"SELECT track_id, marker FROM {SOURCE_TRACKS_TABLE} WHERE source_id = ? AND removed_at IS NULL",
+            (source_id,)
+        )
+        return {track_id: marker for track_id, marker in self.sqlite_api._fetchall()}
+
+    def _get_live_track_ids(self, track_ids: List[str]) -> Set[str]:
+        live = set()
+        for i in range(0, len(track_ids), _IN_CLAUSE_BATCH):
+            batch = track_ids[i:i + _IN_CLAUSE_BATCH]
+            placeholders = ', '.join(['?' for _ in batch])
+            self.sqlite_api._execute(
+                f"SELECT id FROM {TRACKS_TABLE} WHERE removed_at IS NULL AND id IN ({placeholders})",
+                batch
+            )
+            live.update(row[0] for row in self.sqlite_api._fetchall())
+        return live
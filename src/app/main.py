@@ -1,10 +1,20 @@
 import argparse
 import os
 import logging
-from flask import Flask
+import time
+from flask import Flask, g, request
 from flask_restx import Api
-from app.routes import sqlite
-from app.routes.sqlite import sqlite_api
+from app.routes import sqlite, imports, similarity, analysis, views, exports, maintenance, scheduler, health, metrics as metrics_routes
+from app.routes.sqlite import sqlite_api, ingest_api, batch_api, replica_api
+from app.routes.imports import import_api
+from app.routes.maintenance import maintenance_api
+from app.routes.scheduler import scheduler_api
+from app.routes.views import view_api
+from app.utils import profiler, serializers, compression
+from src.app.utils import metrics, budgets, cpu_pool
+import app_config
+
+config = app_config.load()
 
 os.makedirs('logs', exist_ok=True)
 
@@ -23,17 +33,72 @@ app = Flask(__name__)
 configure_logger(app.logger)
 flask_api = Api(app)
 configure_logger(flask_api.logger)
+# Negotiates JSON or MessagePack from the Accept header of each request
+serializers.init_representations(flask_api, config.serializer)
 
 sqlite.init_routes(flask_api)
 sqlite.set_logger(app.logger)
+imports.init_routes(flask_api)
+imports.set_logger(app.logger)
+similarity.init_routes(flask_api)
+similarity.set_logger(app.logger)
+analysis.init_routes(flask_api)
+analysis.set_logger(app.logger)
+views.init_routes(flask_api)
+views.set_logger(app.logger)
+exports.init_routes(flask_api)
+exports.set_logger(app.logger)
+maintenance.init_routes(flask_api)
+maintenance.set_logger(app.logger)
+scheduler.init_routes(flask_api)
+scheduler.set_logger(app.logger)
+metrics_routes.init_routes(app)
+health.init_routes(app)
+# Background jobs pause while requests are in flight and leave part of each external rate budget to requests
+budgets.init_budgets(app, config.rate_budgets)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if config.profiling and profiler.is_requested(request):
+        g.profiler = profiler.RequestProfiler()
+        g.profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    # Label by route template, not the concrete path, to keep one series per endpoint
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if g.get('profiler') is not None:
+        response.headers['X-Profile-File'] = g.profiler.stop(route)
+        g.profiler = None
+    if 'request_start' in g:
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, request.method, route, str(response.status_code))
+    return response
+
+# Registered last so that it runs first, the request metrics then include compression time
+compression.init_compression(app, config.compression_min_bytes)
+
+"""Stops background jobs, their worker processes, imports and maintenance work, commits buffered inserts and closes the read replica, the views connection and the shared database connection"""
+def shutdown():
+    app.logger.info("Shutting down Flask server...")
+    scheduler_api.shutdown()
+    # After the scheduler, whose jobs parse lyrics pages in the pool
+    cpu_pool.shutdown_pool()
+    import_api.shutdown()
+    ingest_api.shutdown()
+    batch_api.shutdown()
+    maintenance_api.shutdown()
+    view_api.shutdown()
+    replica_api.shutdown()
+    sqlite_api.disconnect()
 
 def run(debug, host, port, use_reloader, logger):
     try:
         app.logger.info(f"Starting Flask server on {host}:{port} with debug={debug}, use_reloader={use_reloader}...")
         app.run(debug=debug, host=host, port=port, use_reloader=use_reloader, logger=logger)
     finally:
-        print("Shutting down Flask server...")
-        sqlite_api.disconnect()
+        shutdown()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Run the Flask server with specified parameters.')
@@ -0,0 +1,44 @@
+import logging
+from flask import request
+from flask_restx import Namespace, Resource, Api
+from app.routes.sqlite import sqlite_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['analysis']['root']
+endpoints = config.endpoints['analysis']
+
+ns_analysis = Namespace(name='Analysis', path=root, description='Audio analysis features namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_analysis)
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    if analysis_api is not None:
+        analysis_api.set_logger(_logger)
+
+analysis_api = None
+
+"""Returns the shared AudioAnalysisAPI, creating it on first use so numpy is only imported when needed"""
+def get_analysis_api():
+    global analysis_api
+    if analysis_api is None:
+        from app.api.audio_analysis_api import AudioAnalysisAPI
+        analysis_api = AudioAnalysisAPI(sqlite_api)
+        analysis_api.set_logger(logger)
+    return analysis_api
+
+
+@ns_analysis.route(endpoints["features"])
+class AnalysisFeaturesResource(Resource):
+    def get(self):
+        logger.debug(f"Extracting audio analysis features from {request.url}")
+        track_ids = [track_id.strip() for track_id in request.args.get('ids', '').split(',') if track_id.strip()]
+        if not track_ids:
+            return {"error": "No track ids provided."}, 400
+        return get_analysis_api().get_features(track_ids)
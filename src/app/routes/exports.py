@@ -0,0 +1,74 @@
+import logging
+import os
+from flask import request, Response
+from flask_restx import Namespace, Resource, Api
+from app.api.export_api import ExportAPI, FORMATS
+from app.routes.sqlite import sqlite_api, replica_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['exports']['root']
+endpoints = config.endpoints['exports']
+
+ns_exports = Namespace(name='Exports', path=root, description='Parquet and Arrow table exports namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_exports)
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    export_api.set_logger(_logger)
+
+export_api = ExportAPI(sqlite_api, replica=replica_api)
+
+MIMETYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file',
+}
+
+CHUNK_SIZE = 1 << 16
+
+"""Streams a file in chunks and deletes it once sent, or once the client goes away"""
+def stream_and_remove(path):
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+"""Exports to a temporary file and sends it as a download"""
+def send_export(table_name, spec=None):
+    export_format = request.args.get('format', 'parquet')
+    result, status_code = export_api.export(table_name, export_format, spec=spec)
+    if status_code != 200:
+        return {"error": result}, status_code
+
+    return Response(
+        stream_and_remove(result['path']),
+        mimetype=MIMETYPES[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{table_name}{FORMATS[export_format]}"',
+            'Content-Length': str(result['bytes']),
+            'X-Export-Rows': str(result['rows']),
+        },
+    )
+
+
+@ns_exports.route(endpoints["table"])
+class TableExportResource(Resource):
+    def get(self, table_name):
+        logger.debug(f"Exporting table {table_name} from {request.url}")
+        return send_export(table_name)
+
+@ns_exports.route(endpoints["query"])
+class QueryExportResource(Resource):
+    def post(self, table_name):
+        logger.debug(f"Exporting query on {table_name} from {request.url}")
+        if not request.is_json:
+            return {"error": "Request must be JSON"}, 400
+        return send_export(table_name, request.get_json())
@@ -0,0 +1,14 @@
+"""
+This class exposes a health check used by the launcher to detect when the API is ready to serve requests
+"""
+
+from flask import Flask
+from app.routes.sqlite import sqlite_api
+
+def init_routes(app: Flask):
+    app.add_url_rule('/health', 'health', health)
+
+def health():
+    if not sqlite_api.connected:
+        return {"status": "unavailable", "database": False}, 503
+    return {"status": "ok", "database": True}, 200
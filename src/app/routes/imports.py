@@ -0,0 +1,49 @@
+import logging
+from flask import request
+from flask_restx import Namespace, Resource, Api
+from app.api.import_api import ImportAPI
+from app.routes.sqlite import sqlite_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['imports']['root']
+endpoints = config.endpoints['imports']
+
+ns_imports = Namespace(name='Imports', path=root, description='Background CSV import jobs namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_imports)
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    import_api.set_logger(_logger)
+
+import_api = ImportAPI(sqlite_api, max_workers=config.import_workers)
+
+
+@ns_imports.route(endpoints["jobs"])
+class ImportJobsResource(Resource):
+    def get(self):
+        logger.debug(f"Fetching import jobs from {request.url}")
+        ids = request.args.get('ids')
+        job_ids = ids.split(',') if ids else None
+        return import_api.get_jobs(job_ids)
+
+    def post(self):
+        logger.debug(f"Submitting import jobs from {request.url}")
+        uploads = request.files.getlist('files')
+        if not uploads:
+            return {"error": "No files provided."}, 400
+        files = [(upload.filename, upload.read()) for upload in uploads]
+        force_create = request.form.get('force_create', 'False') == 'True'
+        return import_api.submit(files, force_create=force_create)
+
+@ns_imports.route(endpoints["job"])
+class ImportJobResource(Resource):
+    def get(self, job_id):
+        logger.debug(f"Fetching import job {job_id} from {request.url}")
+        return import_api.get_job(job_id)
@@ -0,0 +1,39 @@
+import logging
+from flask import request
+from flask_restx import Namespace, Resource, Api
+from app.api.maintenance_api import MaintenanceAPI
+from app.routes.sqlite import sqlite_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['maintenance']['root']
+endpoints = config.endpoints['maintenance']
+
+ns_maintenance = Namespace(name='Maintenance', path=root, description='Storage maintenance namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_maintenance)
+    maintenance_api.start()
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    maintenance_api.set_logger(_logger)
+
+maintenance_api = MaintenanceAPI(sqlite_api, interval=config.maintenance_interval, vacuum_step_pages=config.vacuum_step_pages)
+
+
+@ns_maintenance.route(endpoints["stats"])
+class MaintenanceStatsResource(Resource):
+    def get(self):
+        logger.debug(f"Fetching storage stats from {request.url}")
+        return maintenance_api.get_stats()
+
+@ns_maintenance.route(endpoints["task"])
+class MaintenanceTaskResource(Resource):
+    def post(self, task_name):
+        logger.debug(f"Running maintenance task {task_name} from {request.url}")
+        return maintenance_api.run_task(task_name, wait=False)
@@ -0,0 +1,14 @@
+"""
+This class exposes the in-process metrics registry to Prometheus scrapers
+"""
+
+from flask import Flask, Response
+from src.app.utils import metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def init_routes(app: Flask):
+    app.add_url_rule('/metrics', 'metrics', render_metrics)
+
+def render_metrics():
+    return Response(metrics.registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,67 @@
+import logging
+from flask import request
+from flask_restx import Namespace, Resource, Api
+from app.api.scheduler_api import SchedulerAPI
+from app.api.etl_jobs_api import ETLJobsAPI
+from app.routes.sqlite import sqlite_api
+from app.routes.similarity import get_similarity_api
+from app.routes.views import view_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['scheduler']['root']
+endpoints = config.endpoints['scheduler']
+
+ns_scheduler = Namespace(name='Scheduler', path=root, description='Background ETL jobs namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_scheduler)
+    scheduler_api.start()
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    scheduler_api.set_logger(_logger)
+    etl_jobs_api.set_logger(_logger)
+
+scheduler_api = SchedulerAPI(sqlite_api, max_concurrent=config.scheduler_workers, max_pause=config.background_max_pause)
+etl_jobs_api = ETLJobsAPI(
+    sqlite_api,
+    view_api,
+    spotify_client_id=config.spotify_client_id,
+    spotify_client_secret=config.spotify_client_secret,
+    genius_access_token=config.genius_access_token,
+    playlist_ids=[playlist_id.strip() for playlist_id in config.sync_playlists.split(',') if playlist_id.strip()],
+    get_similarity_api=get_similarity_api,
+)
+etl_jobs_api.register(scheduler_api, config.schedules)
+
+
+@ns_scheduler.route(endpoints["jobs"])
+class SchedulerJobsResource(Resource):
+    def get(self):
+        logger.debug(f"Fetching scheduled jobs from {request.url}")
+        return scheduler_api.get_jobs()
+
+@ns_scheduler.route(endpoints["job"])
+class SchedulerJobResource(Resource):
+    def post(self, job_name):
+        logger.debug(f"Running job {job_name} from {request.url}")
+        return scheduler_api.trigger(job_name)
+
+@ns_scheduler.route(endpoints["runs"])
+class SchedulerRunsResource(Resource):
+    def get(self):
+        logger.debug(f"Fetching job runs from {request.url}")
+        return scheduler_api.get_runs(
+            request.args.get('job'), request.args.get('status'), request.args.get('limit', 50, type=int)
+        )
+
+@ns_scheduler.route(endpoints["run"])
+class SchedulerRunResource(Resource):
+    def get(self, run_id):
+        logger.debug(f"Fetching job run {run_id} from {request.url}")
+        return scheduler_api.get_run(run_id)
@@ -0,0 +1,45 @@
+import logging
+from flask import request
+from flask_restx import Namespace, Resource, Api
+from app.routes.sqlite import sqlite_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['similarity']['root']
+endpoints = config.endpoints['similarity']
+
+ns_similarity = Namespace(name='Similarity', path=root, description='Audio feature similarity search namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_similarity)
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    if similarity_api is not None:
+        similarity_api.set_logger(_logger)
+
+similarity_api = None
+
+"""Returns the shared SimilarityAPI, creating it on first use so numpy is only imported when needed"""
+def get_similarity_api():
+    global similarity_api
+    if similarity_api is None:
+        from app.api.similarity_api import SimilarityAPI
+        similarity_api = SimilarityAPI(sqlite_api, index_dir='src/database/similarity')
+        similarity_api.set_logger(logger)
+    return similarity_api
+
+
+@ns_similarity.route(endpoints["track"])
+class SimilarTracksResource(Resource):
+    def get(self, track_id):
+        logger.debug(f"Fetching tracks similar to {track_id} from {request.url}")
+        k = request.args.get('k', 10, type=int)
+        if k < 1:
+            return {"error": "k must be at least 1."}, 400
+        exact = request.args.get('exact', 'False') == 'True'
+        return get_similarity_api().query(track_id, k=k, exact=exact)
@@ -1,13 +1,19 @@
 import logging
+import urllib.parse
 from flask import request
 from flask_restx import Namespace, Resource, Api
 from app.api.sqlite_api import SQLiteAPI
+from app.api.ingest_api import IngestAPI
+from app.api.batch_api import BatchAPI
+from app.api.replica_api import ReadReplicaAPI
+from src.app.utils import query_guard
+from src.app.utils.query_guard import QueryBudget
 import app_config
 
 config = app_config.load()
 
-root = config['endpoints']['sqlite']['root']
-endpoints = config['endpoints']['sqlite']
+root = config.endpoints['sqlite']['root']
+endpoints = config.endpoints['sqlite']
 
 ns_db = Namespace(name='SQLite', path=root, description='SQLite Database namespace')
 
@@ -15,30 +21,100 @@ logger = logging.getLogger(__name__)
 
 def init_routes(flask_api: Api):
     flask_api.add_namespace(ns_db)
+    # Connect when the app is assembled rather than on import, so importing the routes stays cheap
+    if not sqlite_api.connected:
+        sqlite_api.connect(db_path)
+    replica_api.start()
 
 def set_logger(_logger):
     global logger
     logger = _logger
+    ingest_api.set_logger(_logger)
+    batch_api.set_logger(_logger)
+    replica_api.set_logger(_logger)
 
 sqlite_api = SQLiteAPI()
 db_path = 'src/database/database'
-sqlite_api.connect(db_path)
+# Small inserts from concurrent requests are committed together instead of one transaction each
+ingest_api = IngestAPI(sqlite_api, max_batch_rows=config.ingest_batch_rows, max_delay=config.ingest_max_delay_ms / 1000)
+# Several operations from one request run in one transaction on their own connection
+batch_api = BatchAPI(sqlite_api)
+# Reads are served from read-only, memory-mapped connections, so scans never queue behind writes on the shared connection
+replica_api = ReadReplicaAPI(
+    sqlite_api,
+    mode=config.read_replica,
+    mmap_size=config.replica_mmap_mb * 2**20,
+    snapshot_interval=config.replica_snapshot_interval,
+)
+# Row limits, cost limits and statement timeouts per route, routes without an entry use the default one
+query_budgets = {route: QueryBudget.from_config(values) for route, values in config.query_budgets.items()}
+
+def _budget(route: str) -> QueryBudget:
+    return query_budgets.get(route, query_budgets.get('default', QueryBudget()))
+
+"""
+Returns the page size and offset requested with the limit and offset arguments, the page size capped at the
+max_rows of the budget, and the number of rows to fetch, one more than the page to tell whether another follows
+Reads without a limit are not paged, as clients not following the next page headers would silently miss rows
+"""
+def _requested_page(budget: QueryBudget, limit, offset):
+    if budget.max_rows and limit is not None and limit > budget.max_rows:
+        limit = budget.max_rows
+    fetch = limit + 1 if limit is not None and limit >= 0 else limit
+    return limit, offset, fetch
+
+"""Returns a 400 response for a page size below 1 or a negative offset, whose next page links would never advance"""
+def _invalid_page(limit, offset):
+    if limit is not None and limit < 1:
+        return {"error": "limit must be at least 1."}, 400
+    if offset is not None and offset < 0:
+        return {"error": "offset must not be negative."}, 400
+    return None
+
+"""Truncates a result fetched with one extra row to its page, with headers pointing to the next page if there is one"""
+def _paged_response(result, status: int, limit, offset: int):
+    if status != 200 or limit is None:
+        return result, status
+    page, more = query_guard.split_page(result, limit)
+    if not more:
+        return page, status
+    headers = {'X-Next-Offset': str(offset + limit)}
+    if request.method == 'GET':
+        next_args = {**request.args.to_dict(), 'limit': limit, 'offset': offset + limit}
+        headers['Link'] = f'<{request.base_url}?{urllib.parse.urlencode(next_args)}>; rel="next"'
+    return page, status, headers
 
 
 @ns_db.route(endpoints["tables"])
 class TablesResource(Resource):
     def get(self):
-        logger.info(f"Fetching tables from {request.url}")
-        return sqlite_api.get_tables()
+        logger.debug(f"Fetching tables from {request.url}")
+        with query_guard.limits(_budget('tables')):
+            return replica_api.get_tables(request.args.get('orient', 'rows'))
+
+@ns_db.route(endpoints["batch"])
+class BatchResource(Resource):
+    def post(self):
+        logger.debug(f"Running batch from {request.url}")
+        if not request.is_json:
+            return {"error": "Request must be JSON"}, 400
+        return batch_api.run(request.get_json().get('operations'))
 
 @ns_db.route(endpoints["table"])
 class TableResource(Resource):
     def get(self, table_name):
-        logger.info(f"Fetching table {table_name} from {request.url}")
-        return sqlite_api.get_table(table_name)
+        logger.debug(f"Fetching table {table_name} from {request.url}")
+        budget = _budget('table')
+        limit, offset = request.args.get('limit', type=int), request.args.get('offset', 0, type=int)
+        if (invalid := _invalid_page(limit, offset)) is not None:
+            return invalid
+        limit, offset, fetch = _requested_page(budget, limit, offset)
+        with query_guard.limits(budget):
+            result, status = replica_api.get_table(table_name, request.args.get('orient', 'records'), fetch, offset)
+        return _paged_response(result, status, limit, offset)
 
     def post(self, table_name):
-        logger.info(f"Creating table {table_name} from {request.url}")
+        logger.debug(f"Creating table {table_name} from {request.url}")
         if not request.is_json:
             return {"error": "Request must be JSON"}, 400
         data = request.get_json()
@@ -51,41 +127,70 @@ class TableResource(Resource):
             return {"error": str(e)}, 500
 
     def delete(self, table_name):
-        logger.info(f"Deleting table {table_name} from {request.url}")
+        logger.debug(f"Deleting table {table_name} from {request.url}")
         return sqlite_api.drop_table(table_name)
 
 @ns_db.route(endpoints["table_schema"])
 class TableSchemaResource(Resource):
     def get(self, table_name):
-        logger.info(f"Fetching schema for table {table_name} from {request.url}")
-        return sqlite_api.get_table_schema(table_name)
+        logger.debug(f"Fetching schema for table {table_name} from {request.url}")
+        return replica_api.get_table_schema(table_name)
 
 @ns_db.route(endpoints["row"])
 class RowResource(Resource):
     def get(self, table_name, row_id):
-        logger.info(f"Fetching row {row_id} from {request.url}")
-        return sqlite_api.get_row(table_name, row_id)
+        logger.debug(f"Fetching row {row_id} from {request.url}")
+        return replica_api.get_row(table_name, row_id)
 
 @ns_db.route(endpoints["rows"])
 class RowsResource(Resource):
     def get(self, table_name):
-        logger.info(f"Fetching rows from {request.url}")
+        logger.debug(f"Fetching rows from {request.url}")
         conditions = []
         for key, value in request.args.items():
+            if key in ('orient', 'limit', 'offset'):
+                continue
             condition = f"{key}='{value}'"
             conditions.append(condition)
-        return sqlite_api.get_rows(table_name, conditions)
+        budget = _budget('rows')
+        limit, offset = request.args.get('limit', type=int), request.args.get('offset', 0, type=int)
+        if (invalid := _invalid_page(limit, offset)) is not None:
+            return invalid
+        limit, offset, fetch = _requested_page(budget, limit, offset)
+        with query_guard.limits(budget):
+            result, status = replica_api.get_rows(table_name, conditions, request.args.get('orient', 'records'), fetch, offset)
+        return _paged_response(result, status, limit, offset)
 
     def post(self, table_name):
-        logger.info(f"Inserting rows into {table_name} from {request.url}")
+        logger.debug(f"Inserting rows into {table_name} from {request.url}")
         if not request.is_json:
             return {"error": "Request must be JSON"}, 400
         data = request.get_json()["rows"]
-        return sqlite_api.insert_rows(table_name, data)
+        return ingest_api.insert_rows(table_name, data)
 
     def put(self, table_name):
-        logger.info(f"Updating rows in {table_name} from {request.url}")
+        logger.debug(f"Updating rows in {table_name} from {request.url}")
         if not request.is_json:
             return {"error": "Request must be JSON"}, 400
         data = request.get_json()["rows"]
         return sqlite_api.update_rows(table_name, data)
+
+@ns_db.route(endpoints["query"])
+class QueryResource(Resource):
+    def post(self, table_name):
+        logger.debug(f"Querying {table_name} from {request.url}")
+        if not request.is_json:
+            return {"error": "Request must be JSON"}, 400
+        spec = request.get_json()
+        budget = _budget('query')
+        limit = offset = None
+        # Invalid limits and offsets are left to the query compiler to reject
+        if isinstance(spec, dict) and isinstance(spec.get('limit', 0), int) and isinstance(spec.get('offset', 0), int):
+            if (invalid := _invalid_page(spec.get('limit'), spec.get('offset'))) is not None:
+                return invalid
+            limit, offset, fetch = _requested_page(budget, spec.get('limit'), spec.get('offset') or 0)
+            if fetch is not None:
+                spec = {**spec, 'limit': fetch}
+        with query_guard.limits(budget):
+            result, status = replica_api.query_table(table_name, spec)
+        return _paged_response(result, status, limit, offset)
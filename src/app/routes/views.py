@@ -0,0 +1,52 @@
+import logging
+from flask import request
+from flask_restx import Namespace, Resource, Api
+from app.api.materialized_views_api import MaterializedViewAPI
+from app.routes.sqlite import sqlite_api
+import app_config
+
+config = app_config.load()
+
+root = config.endpoints['views']['root']
+endpoints = config.endpoints['views']
+
+ns_views = Namespace(name='Views', path=root, description='Materialized summary views namespace')
+
+logger = logging.getLogger(__name__)
+
+def init_routes(flask_api: Api):
+    flask_api.add_namespace(ns_views)
+
+def set_logger(_logger):
+    global logger
+    logger = _logger
+    view_api.set_logger(_logger)
+
+view_api = MaterializedViewAPI(sqlite_api)
+
+
+@ns_views.route(endpoints["views"])
+class ViewsResource(Resource):
+    def get(self):
+        logger.debug(f"Fetching views from {request.url}")
+        return view_api.get_views()
+
+@ns_views.route(endpoints["view"])
+class ViewResource(Resource):
+    def get(self, view_name):
+        logger.debug(f"Fetching view {view_name} from {request.url}")
+        spec = {}
+        order_by = request.args.get('order_by')
+        if order_by:
+            spec['order_by'] = [{'column': order_by, 'direction': request.args.get('direction', 'asc')}]
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            spec['limit'] = limit
+        return view_api.get_view(view_name, spec)
+
+@ns_views.route(endpoints["refresh"])
+class ViewRefreshResource(Resource):
+    def post(self, view_name):
+        logger.debug(f"Refreshing view {view_name} from {request.url}")
+        full = request.args.get('full', 'False') == 'True'
+        return view_api.refresh(view_name, full=full)
@@ -3,37 +3,109 @@ This class handles asynchronous requests to server and returns the response json
 It is used for external API requests
 """
 
-from src.app.utils.http_errors import MaximumRetriesError, RequestFailedError, ERROR_MAP, RETRYABLE_EXCEPTIONS
-from urllib.parse import urlencode
+from src.app.utils.http_errors import MaximumRetriesError, RequestFailedError, CircuitOpenError, ERROR_MAP
+from src.app.utils.retry_policy import RetryPolicy, get_circuit_breaker, parse_retry_after
+from src.app.utils import metrics
+from src.app.utils.budgets import get_rate_budget
+from urllib.parse import urlencode, urlsplit
 import asyncio
+import logging
+import time
+import aiohttp
 
-async def get_response(base_url: str, endpoint: str, params: dict, headers: dict, session, retries, delay):
+logger = logging.getLogger(__name__)
+
+"""
+Requests a JSON resource, retrying transient failures according to the retry policy
+Parameters:
+    - retries (int), delay (float) - Maximum attempts and base backoff delay, used when no policy is given
+    - auth (SpotifyTokenManager) - Resolves the access token at send time and refreshes it after a 401
+    - policy (RetryPolicy) - Per-status retry rules, backoff and the overall deadline of the request
+    - as_text (bool) - Return the body as text instead of parsed JSON, e.g. for HTML pages
+"""
+async def get_response(base_url: str, endpoint: str, params: dict, headers: dict, session, retries, delay, auth=None, policy=None, as_text=False):
+    policy = policy or RetryPolicy(max_attempts=retries, base_delay=delay)
     url = f"{base_url}{endpoint}?{urlencode(params)}"
-    data = None
+    host = urlsplit(base_url).netloc
+    endpoint_label = metrics.endpoint_label(endpoint)
+    breaker = get_circuit_breaker(host)
+    budget = get_rate_budget(host)
+    deadline = time.monotonic() + policy.deadline
     attempts = 0
-    while data is None and attempts < retries:
+
+    while True:
         attempts += 1
+        if not breaker.allow():
+            metrics.EXTERNAL_CIRCUIT_OPEN.inc(host)
+            raise CircuitOpenError(host, breaker.retry_in())
+
+        # Set once the attempt has told the breaker how the host did, any other exit (a deadline, an invalid body,
+        # a cancellation) gives back the trial slot, or a half-open breaker would never let a request through again
+        recorded = False
         try:
-            async with session.get(url, headers=headers) as response:
-                if response.status in ERROR_MAP:
-                    exception = ERROR_MAP[response.status]()
-                    if exception in RETRYABLE_EXCEPTIONS:
-                        await asyncio.sleep(delay)
+            if budget is not None:
+                # Every attempt counts against the requests per second budget of the host
+                await budget.acquire()
+
+            status = None
+            retry_after = None
+            start = time.perf_counter()
+            try:
+                # Resolve the token at send time, so retries and long runs never use an expired one
+                access_token = None
+                request_headers = headers
+                if auth is not None:
+                    access_token = await auth.get_token()
+                    request_headers = {**headers, 'Authorization': f'Bearer {access_token}'}
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MaximumRetriesError(status_code=504, message=f"Request deadline of {policy.deadline}s exceeded.")
+                timeout = aiohttp.ClientTimeout(total=remaining)
+                async with session.get(url, headers=request_headers, timeout=timeout) as response:
+                    status = response.status
+                    if response.ok:
+                        data = await response.text() if as_text else await response.json()
+                        metrics.EXTERNAL_REQUEST_SECONDS.observe(time.perf_counter() - start, host, endpoint_label, str(status))
+                        breaker.record_success()
+                        recorded = True
+                        return data
+
+                    metrics.EXTERNAL_REQUEST_SECONDS.observe(time.perf_counter() - start, host, endpoint_label, str(status))
+                    if status == 429:
+                        metrics.EXTERNAL_RATE_LIMITED.inc(host, endpoint_label)
+
+                    if status == 401 and auth is not None and attempts < policy.max_attempts:
+                        breaker.record_success()
+                        recorded = True
+                        await auth.invalidate(access_token)
                         continue
-                    raise exception
-                if not response.ok:
-                    raise RequestFailedError(response.status, f"Error {response.status}: {response.reason}")
-                data = await response.json()
-        except Exception as e:
-            print(f"Error: {e}")
-            if attempts >= retries:
-                if hasattr(e, 'status_code'):
-                    raise RequestFailedError(e.status_code, str(e))
-                else:
-                    raise
-            await asyncio.sleep(delay)
-            continue
-
-    if data is None:
-        raise MaximumRetriesError(status_code=504, message="Request timed out after maximum retries.")
-    return data
\ No newline at end of file
+
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    error = ERROR_MAP[status]() if status in ERROR_MAP else RequestFailedError(status, f"Error {status}: {response.reason}")
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.EXTERNAL_REQUEST_SECONDS.observe(time.perf_counter() - start, host, endpoint_label, 'error')
+                error = e
+
+            if policy.is_host_failure(status):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            recorded = True
+        finally:
+            if not recorded:
+                breaker.release()
+
+        if not policy.should_retry(status):
+            raise error
+
+        logger.debug(f"Attempt {attempts} of {url} failed: {error}")
+        if attempts >= policy.max_attempts:
+            raise MaximumRetriesError(status_code=status or 504, message=f"Request failed after {attempts} attempts: {error}") from error
+
+        wait = policy.backoff(attempts, retry_after)
+        if time.monotonic() + wait >= deadline:
+            raise MaximumRetriesError(status_code=504, message=f"Request deadline of {policy.deadline}s exceeded: {error}") from error
+        metrics.EXTERNAL_RETRIES.inc(host, endpoint_label)
+        await asyncio.sleep(wait)
@@ -0,0 +1,127 @@
+"""
+This class runs batches of external async requests without letting a single failure discard the rest.
+Results are yielded as they complete, failures are recorded per item, and completed results can be
+checkpointed to disk so that a crashed job resumes without fetching them again.
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class Checkpoint:
+    """
+    Append-only JSON lines file of completed results, keyed by a string id.
+    Each line is written and flushed as soon as its result completes, so a crash loses at most the in-flight requests.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._results: Dict[str, Any] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash may leave the last line half written
+                        continue
+                    self._results[entry['key']] = entry['result']
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._results
+
+    def get(self, key: str) -> Any:
+        return self._results[key]
+
+    def save(self, key: str, result: Any):
+        self._results[key] = result
+        self._file.write(json.dumps({'key': key, 'result': result}) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BatchResult:
+    """Results and failures of a batch, keyed by the id of each task"""
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.failures: Dict[str, str] = {}
+
+    def ordered(self, keys: List[str]) -> List[Any]:
+        return [self.results.get(key) for key in keys]
+
+
+"""
+Runs the tasks concurrently and yields (key, result, error) for each one as soon as it completes
+Parameters:
+    - tasks (Dict[str, Callable]) - Task id mapped to a function returning the coroutine to await
+    - checkpoint (Checkpoint) - Completed results to skip and to record new results into
+    - concurrency (int) - The maximum number of tasks awaited at once, unlimited if None
+"""
+async def stream_results(
+        tasks: Dict[str, Callable[[], Awaitable[Any]]],
+        checkpoint: Optional[Checkpoint] = None,
+        concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[str, Any, Optional[Exception]]]:
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def run(key, factory):
+        try:
+            if semaphore is None:
+                return key, await factory(), None
+            async with semaphore:
+                return key, await factory(), None
+        except Exception as e:
+            return key, None, e
+
+    pending = []
+    for key, factory in tasks.items():
+        if checkpoint is not None and key in checkpoint:
+            yield key, checkpoint.get(key), None
+        else:
+            pending.append(asyncio.ensure_future(run(key, factory)))
+
+    try:
+        for completed in asyncio.as_completed(pending):
+            key, result, error = await completed
+            if error is None and checkpoint is not None:
+                checkpoint.save(key, result)
+            yield key, result, error
+    finally:
+        for task in pending:
+            task.cancel()
+
+"""
+Runs the tasks like asyncio.gather, but keeps every successful result when some of them fail
+Parameters:
+    - tasks (Dict[str, Callable]) - Task id mapped to a function returning the coroutine to await
+    - checkpoint_path (str) - Path of a checkpoint file to resume from and record results into
+    - concurrency (int) - The maximum number of tasks awaited at once, unlimited if None
+Returns:
+    - A BatchResult with the results and error messages of the tasks
+"""
+async def gather_partial(
+        tasks: Dict[str, Callable[[], Awaitable[Any]]],
+        checkpoint_path: Optional[str] = None,
+        concurrency: Optional[int] = None,
+) -> BatchResult:
+    batch = BatchResult()
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    try:
+        async for key, result, error in stream_results(tasks, checkpoint, concurrency):
+            if error is None:
+                batch.results[key] = result
+            else:
+                batch.failures[key] = str(error)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    return batch
@@ -0,0 +1,171 @@
+"""
+This class is responsible for the resource budgets that background jobs share with interactive traffic.
+Interactive requests are counted while they are served, and background jobs pause between their steps
+until no request has been served for a short quiet period, so a heavy job works in the gaps between
+page loads instead of competing with the dashboard for the database or the GIL.
+External API hosts get a requests per second budget enforced in get_response for every caller,
+where background callers may not spend the share of the budget reserved for interactive ones.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from src.app.utils import metrics
+
+# Share of each rate budget that only interactive callers may spend
+INTERACTIVE_RESERVE = 0.25
+
+# Seconds without requests before background work resumes, the requests of a page load arrive in quick succession
+QUIET_PERIOD = 0.05
+
+_background = contextvars.ContextVar('background', default=False)
+
+
+"""
+Marks the work of the block, and of the coroutines it runs, as background work
+Coroutines run with asyncio.run inside the block inherit the mark
+"""
+@contextmanager
+def background():
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+def is_background() -> bool:
+    return _background.get()
+
+
+class InteractiveLoad:
+    """
+    Counts the interactive requests in flight, for background work to wait until there are none
+    Parameters:
+        - quiet_period (float) - Seconds that must pass after the last request before the load is idle
+    """
+
+    def __init__(self, quiet_period: float = QUIET_PERIOD):
+        self.quiet_period = quiet_period
+        self.in_flight = 0
+        self._last_end = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._last_end = time.monotonic()
+
+    """
+    Waits until no interactive request has been in flight for the quiet period
+    Parameters:
+        - timeout (float) - Seconds to wait at most, so that steady traffic slows background work down without starving it
+    Returns:
+        - The seconds waited (float)
+    """
+    def wait_idle(self, timeout: float) -> float:
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                remaining = self.quiet_period - (now - self._last_end) if self.in_flight == 0 else self.quiet_period
+            if remaining <= 0 or now >= deadline:
+                break
+            # Polled rather than notified, waking the job up at the end of every request would cost the requests more
+            time.sleep(min(remaining, deadline - now))
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            metrics.BACKGROUND_YIELD_SECONDS.observe(waited)
+        return waited
+
+
+class RateBudget:
+    """
+    A token bucket of requests per second, shared by every caller of a host across threads and event loops
+    Parameters:
+        - rate (float) - Requests per second
+        - burst (float) - Requests that may be sent at once after an idle period, defaults to one second worth
+        - reserve (float) - Share of the burst that background callers leave to interactive ones
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, reserve: float = INTERACTIVE_RESERVE):
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self.reserve = reserve * self.burst
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    """Takes a token if one is available, otherwise returns the seconds to wait before trying again"""
+    def _take(self, background: bool) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            floor = 1.0 + (self.reserve if background else 0.0)
+            if self._tokens >= floor:
+                self._tokens -= 1.0
+                return 0.0
+            return (floor - self._tokens) / self.rate
+
+    async def acquire(self):
+        background = is_background()
+        while True:
+            wait = self._take(background)
+            if wait == 0.0:
+                return
+            metrics.EXTERNAL_BUDGET_WAIT_SECONDS.observe(wait, 'background' if background else 'interactive')
+            await asyncio.sleep(wait)
+
+
+interactive = InteractiveLoad()
+
+_rate_budgets: Dict[str, RateBudget] = {}
+
+"""
+Sets the requests per second budget of a host, a rate of 0 or less removes it
+Parameters:
+    - host (str) - The host as in the request URL, e.g. api.spotify.com
+    - rate (float) - Requests per second
+"""
+def set_rate_budget(host: str, rate: float, burst: Optional[float] = None):
+    if rate <= 0:
+        _rate_budgets.pop(host, None)
+    else:
+        _rate_budgets[host] = RateBudget(rate, burst)
+
+"""Returns the rate budget of a host, None if its requests are not limited"""
+def get_rate_budget(host: str) -> Optional[RateBudget]:
+    return _rate_budgets.get(host)
+
+
+"""
+Counts the requests of the app as interactive load and sets the rate budgets of external hosts
+Parameters:
+    - app (Flask) - The Flask app
+    - rate_budgets (Dict[str, str]) - Requests per second per host
+    - exclude (tuple) - Path prefixes not counted, e.g. health checks and metric scrapes
+"""
+def init_budgets(app, rate_budgets: Dict[str, str], exclude=('/health', '/metrics')):
+    from flask import g, request
+
+    for host, rate in rate_budgets.items():
+        set_rate_budget(host, float(rate))
+
+    @app.before_request
+    def begin_interactive():
+        if not request.path.startswith(exclude):
+            g.interactive = True
+            interactive.begin()
+
+    @app.teardown_request
+    def end_interactive(_):
+        if g.pop('interactive', False):
+            interactive.end()
@@ -0,0 +1,125 @@
+"""
+This class is responsible for compressing HTTP bodies between the dashboard and the Flask server.
+Responses larger than a threshold are compressed with brotli or gzip, whichever the client accepts,
+brotli only when it is installed. Request bodies sent with Content-Encoding: gzip are decompressed
+before Flask reads them, so large inserts and updates can be uploaded compressed too.
+"""
+
+import gzip
+import io
+import zlib
+from flask import request
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fast levels: bodies are compressed on every request, most of the saving comes at low levels
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Limits the size a compressed request body can expand to
+MAX_REQUEST_BYTES = 256 * 2**20
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack')
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+"""
+Decompresses a gzip body, refusing bodies that expand past max_bytes
+Raises:
+    - RequestEntityTooLarge if the body expands past max_bytes
+    - zlib.error if the body is not valid gzip
+"""
+def gunzip(body: bytes, max_bytes: int = MAX_REQUEST_BYTES) -> bytes:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, max_bytes + 1)
+    if len(data) > max_bytes:
+        raise RequestEntityTooLarge()
+    if not decompressor.eof:
+        raise zlib.error("Truncated gzip body")
+    return data
+
+
+class DecompressRequests:
+    """
+    WSGI middleware replacing gzip request bodies with their decompressed content
+    Parameters:
+        - wsgi_app - The application to wrap, e.g. Flask.wsgi_app
+        - max_bytes (int) - The size a body may expand to
+    """
+
+    def __init__(self, wsgi_app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.wsgi_app = wsgi_app
+        self.max_bytes = max_bytes
+
+    def __call__(self, environ, start_response):
+        if environ.get('HTTP_CONTENT_ENCODING', '').strip().lower() == 'gzip':
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            try:
+                body = gunzip(environ['wsgi.input'].read(length), self.max_bytes)
+            except RequestEntityTooLarge as e:
+                return e(environ, start_response)
+            except zlib.error as e:
+                return BadRequest(f"Invalid gzip request body: {str(e)}")(environ, start_response)
+            environ['wsgi.input'] = io.BytesIO(body)
+            environ['CONTENT_LENGTH'] = str(len(body))
+            del environ['HTTP_CONTENT_ENCODING']
+        return self.wsgi_app(environ, start_response)
+
+
+"""
+Compresses the response if the client accepts a supported encoding and the body is large enough
+Streamed responses, such as exported files, are left as they are
+"""
+def compress_response(response, min_bytes: int):
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or not (response.mimetype in COMPRESSIBLE_TYPES or response.mimetype.startswith('text/'))):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None or response.content_length is not None and response.content_length < min_bytes:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+"""
+Compresses responses of at least min_bytes and accepts gzip request bodies
+Parameters:
+    - app (Flask) - The Flask app
+    - min_bytes (int) - Smaller responses are sent as they are, compressing them costs more than it saves
+"""
+def init_compression(app, min_bytes: int = 1024):
+    app.wsgi_app = DecompressRequests(app.wsgi_app)
+    app.after_request(lambda response: compress_response(response, min_bytes))
+
+
+"""
+Returns the body and headers for sending a JSON request body, gzip compressed when it has at least min_bytes
+Parameters:
+    - body (bytes) - The encoded JSON body
+    - min_bytes (int) - Smaller bodies are sent as they are
+"""
+def json_request(body: bytes, min_bytes: int = 1024):
+    headers = {'Content-Type': 'application/json'}
+    if len(body) >= min_bytes:
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
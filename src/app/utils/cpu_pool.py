@@ -0,0 +1,99 @@
+"""
+This class runs CPU-bound work (HTML parsing, text normalization) in a pool of worker processes,
+so it neither blocks the event loop of the async pipeline nor is limited to one core by the GIL.
+Items are sent to the workers in batches, which amortizes the cost of pickling each call.
+Functions given to the pool must be defined at module level so that they can be pickled.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+
+
+def _apply(function: Callable[[Any], Any], batch: List[Any]) -> List[Any]:
+    # Runs inside a worker process
+    return [function(item) for item in batch]
+
+
+class CPUPool:
+
+    def __init__(self, max_workers: Optional[int] = None, batch_size: int = 256):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Workers are only started once there is work for them
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _batches(self, items: List[Any], batch_size: Optional[int]) -> List[List[Any]]:
+        size = batch_size or self.batch_size
+        # Smaller batches when there are few items, so that every worker gets a share
+        size = max(1, min(size, -(-len(items) // self.max_workers)))
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    """
+    Applies a function to every item in the worker processes, from a coroutine
+    Parameters:
+        - function (Callable) - A module-level function taking one item
+        - items (Iterable) - The items, they and the results must be picklable
+        - batch_size (int) - Items sent to a worker at once, defaults to the pool's batch size
+    Returns:
+        - The results, in the order of the items (List)
+    """
+    async def map(self, function: Callable[[Any], Any], items: Iterable[Any], batch_size: Optional[int] = None) -> List[Any]:
+        items = list(items)
+        if not items:
+            return []
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        batches = await asyncio.gather(*(
+            loop.run_in_executor(executor, _apply, function, batch) for batch in self._batches(items, batch_size)
+        ))
+        return [result for batch in batches for result in batch]
+
+    """
+    Applies a function to every item in the worker processes, blocking until all are done
+    Same as map, for callers outside of an event loop such as Flask request threads
+    """
+    def map_sync(self, function: Callable[[Any], Any], items: Iterable[Any], batch_size: Optional[int] = None) -> List[Any]:
+        items = list(items)
+        if not items:
+            return []
+        executor = self._get_executor()
+        futures = [executor.submit(_apply, function, batch) for batch in self._batches(items, batch_size)]
+        return [result for future in futures for result in future.result()]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_pool: Optional[CPUPool] = None
+_pool_lock = threading.Lock()
+
+"""Returns the process pool shared by the pipeline, sized by the cpu_workers setting (0 uses every core)"""
+def get_pool() -> CPUPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from app_config import load
+                _pool = CPUPool(max_workers=load().cpu_workers or None)
+    return _pool
+
+"""Stops the workers of the shared pool, if it was created, e.g. when the server shuts down"""
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
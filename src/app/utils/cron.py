@@ -0,0 +1,115 @@
+"""
+This class is responsible for parsing cron expressions and computing when they next fire.
+Expressions have the five standard fields, minute hour day-of-month month day-of-week, each a '*', a number,
+a range 'a-b', a step '*/n' or 'a-b/n', or a comma separated list of those, e.g. '*/15 * * * *' or '0 3 * * 1-5'.
+The aliases @hourly, @daily, @weekly and @monthly are accepted too. Times are local times.
+"""
+
+import datetime
+from typing import FrozenSet, List, Tuple
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+}
+
+# (name, lowest, highest) of each field
+FIELDS: List[Tuple[str, int, int]] = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 7),
+]
+
+# Searching further ahead than this means the expression never fires, e.g. '0 0 31 2 *'
+_MAX_DAYS = 5 * 366
+
+
+"""
+Parses one field of a cron expression into the set of values it matches
+Raises:
+    - ValueError if the field is malformed or out of range
+"""
+def _parse_field(text: str, name: str, low: int, high: int) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(','):
+        span, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f"Invalid step in {name} field '{text}'")
+        if span == '*':
+            start, end = low, high
+        elif '-' in span:
+            start, end = (int(value) for value in span.split('-', 1))
+        else:
+            start = end = int(span)
+            if step > 1:
+                end = high
+        if not low <= start <= end <= high:
+            raise ValueError(f"Value out of range in {name} field '{text}', expected {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """
+    A parsed cron expression
+    Parameters:
+        - expression (str) - Five cron fields or an alias, e.g. '30 2 * * *' or '@daily'
+    Raises:
+        - ValueError if the expression is malformed
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != len(FIELDS):
+            raise ValueError(f"Invalid cron expression '{expression}', expected {len(FIELDS)} fields")
+        try:
+            parsed = [_parse_field(text, name, low, high) for text, (name, low, high) in zip(fields, FIELDS)]
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression '{expression}': {str(e)}") from e
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Both 0 and 7 are Sunday, datetime.weekday() counts from Monday = 0
+        self.weekdays = frozenset((day - 1) % 7 for day in weekdays)
+        # As in cron, when both day fields are restricted a day matching either fires
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def __repr__(self):
+        return f"CronSchedule({self.expression!r})"
+
+    def _day_matches(self, date: datetime.date) -> bool:
+        day = date.day in self.days
+        weekday = date.weekday() in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    """
+    Returns the first time strictly after the given time at which the schedule fires
+    Parameters:
+        - after (float) - A Unix timestamp
+    Returns:
+        - A Unix timestamp (float), at the start of a minute
+    Raises:
+        - ValueError if the schedule never fires
+    """
+    def next_after(self, after: float) -> float:
+        moment = datetime.datetime.fromtimestamp(after).replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        date = moment.date()
+        for _ in range(_MAX_DAYS):
+            if date.month in self.months and self._day_matches(date):
+                same_day = date == moment.date()
+                for hour in sorted(self.hours):
+                    if same_day and hour < moment.hour:
+                        continue
+                    for minute in sorted(self.minutes):
+                        if same_day and hour == moment.hour and minute < moment.minute:
+                            continue
+                        return datetime.datetime(date.year, date.month, date.day, hour, minute).timestamp()
+            date += datetime.timedelta(days=1)
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
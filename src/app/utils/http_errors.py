@@ -67,6 +67,15 @@ class RequestFailedError(Exception):
         self.message = message
         super().__init__(f"Status Code: {self.status_code} - {self.message}")
 
+class CircuitOpenError(Exception):
+    """Exception raised when requests to a host are short-circuited because it keeps failing."""
+    def __init__(self, host, retry_in, message="Circuit open for host."):
+        self.status_code = 503
+        self.host = host
+        self.retry_in = retry_in
+        self.message = message
+        super().__init__(f"{self.message} Host: {self.host} - retry in {self.retry_in:.1f}s")
+
 ERROR_MAP = {
     401: InvalidAccessTokenError,
     403: ForbiddenError,
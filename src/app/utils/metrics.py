@@ -0,0 +1,150 @@
+"""
+This class collects in-process counters and latency histograms for the ETL, API and SQLite layers
+and renders them in the Prometheus text exposition format.
+"""
+
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds, from sub-millisecond SQLite statements to slow external requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Spotify ids and similar opaque path segments would otherwise create one series per resource
+_ID_SEGMENT = re.compile(r'/[A-Za-z0-9]{16,}(?=/|$)')
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    le_label = f'le="{le}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labels, label_values, le_label)} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labels, label_values)} {total[0]}')
+                lines.append(f'{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, description, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, description: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, description, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self._metrics for line in metric.render()) + '\n'
+
+
+registry = Registry()
+
+EXTERNAL_REQUEST_SECONDS = registry.histogram(
+    'notelab_external_request_seconds', 'Latency of each attempt of an external API request.', ['host', 'endpoint', 'status'])
+EXTERNAL_RETRIES = registry.counter(
+    'notelab_external_retries_total', 'Retried external API request attempts.', ['host', 'endpoint'])
+EXTERNAL_RATE_LIMITED = registry.counter(
+    'notelab_external_rate_limited_total', 'External API responses with status 429.', ['host', 'endpoint'])
+EXTERNAL_CIRCUIT_OPEN = registry.counter(
+    'notelab_external_circuit_open_total', 'External API requests short-circuited by an open circuit breaker.', ['host'])
+EXTERNAL_BUDGET_WAIT_SECONDS = registry.histogram(
+    'notelab_external_budget_wait_seconds', 'Waits for a token of the rate budget of an external host.', ['caller'])
+
+SQLITE_STATEMENT_SECONDS = registry.histogram(
+    'notelab_sqlite_statement_seconds', 'Latency of SQLite statements.', ['statement'])
+SQLITE_ROWS = registry.counter(
+    'notelab_sqlite_rows_total', 'Rows read or written by SQLite statements.', ['statement'])
+
+INGEST_BATCH_ROWS = registry.histogram(
+    'notelab_ingest_batch_rows', 'Rows committed per ingest buffer transaction.', buckets=(1, 10, 100, 1000, 5000, 10000, 50000))
+INGEST_BATCH_SECONDS = registry.histogram(
+    'notelab_ingest_batch_seconds', 'Latency of ingest buffer transactions, including the commit.')
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'notelab_http_request_seconds', 'Latency of Flask routes.', ['method', 'route', 'status'])
+
+SCHEDULER_JOB_SECONDS = registry.histogram(
+    'notelab_scheduler_job_seconds', 'Duration of scheduled job runs.', ['job', 'status'])
+BACKGROUND_YIELD_SECONDS = registry.histogram(
+    'notelab_background_yield_seconds', 'Time background jobs paused for interactive requests in flight.')
+
+
+"""Returns a low-cardinality label for an endpoint path by replacing id segments with {id}"""
+def endpoint_label(endpoint: str) -> str:
+    return _ID_SEGMENT.sub('/{id}', endpoint)
+
+"""Returns the SQL verb of a statement, e.g. SELECT or INSERT, for use as a label"""
+def statement_label(query: str) -> str:
+    verb = query.lstrip().split(None, 1)
+    return verb[0].upper() if verb else 'UNKNOWN'
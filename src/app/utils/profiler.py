@@ -0,0 +1,62 @@
+"""
+This class profiles individual Flask requests on demand.
+A request is profiled when profiling is enabled in the config and it carries ?profile=1 or an X-Profile header.
+pyinstrument is used when it is installed, cProfile otherwise, and each profile is written to logs/profiles/.
+"""
+
+import cProfile
+import os
+import pstats
+import time
+import uuid
+
+try:
+    from pyinstrument import Profiler as _Pyinstrument
+except ImportError:
+    _Pyinstrument = None
+
+PROFILE_DIR = os.path.join('logs', 'profiles')
+
+
+class RequestProfiler:
+    def __init__(self):
+        if _Pyinstrument is not None:
+            self._profiler = _Pyinstrument()
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if _Pyinstrument is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    """
+    Stops profiling and writes the profile to disk
+    Parameters:
+        - name (str) - Used to build the file name, usually the route of the request
+    Returns:
+        - The path of the written profile
+    """
+    def stop(self, name: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or 'request'
+        base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{uuid.uuid4().hex[:8]}")
+
+        if _Pyinstrument is not None:
+            self._profiler.stop()
+            path = f"{base}.html"
+            with open(path, 'w') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            # Binary pstats file, readable with `python -m pstats` or snakeviz
+            path = f"{base}.prof"
+            pstats.Stats(self._profiler).dump_stats(path)
+        return path
+
+
+"""Returns whether the request asked to be profiled through ?profile=1 or the X-Profile header"""
+def is_requested(request) -> bool:
+    flag = request.args.get('profile') or request.headers.get('X-Profile')
+    return flag is not None and flag.lower() in ('1', 'true', 'yes')
@@ -0,0 +1,200 @@
+"""
+This class compiles a JSON query spec into a parameterized SELECT statement over a single table.
+Every identifier is checked against the table's columns (or the aggregate aliases defined in the spec)
+and every value is bound as a parameter, so a spec can never inject SQL.
+
+Example spec:
+    {
+        "columns": ["artist"],
+        "aggregates": [{"function": "avg", "column": "tempo", "alias": "avg_tempo"}, {"function": "count"}],
+        "filters": [{"column": "popularity", "op": ">=", "value": 50}],
+        "group_by": ["artist"],
+        "having": [{"column": "avg_tempo", "op": ">", "value": 120}],
+        "order_by": [{"column": "avg_tempo", "direction": "desc"}],
+        "limit": 10
+    }
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+AGGREGATE_FUNCTIONS = {'count', 'sum', 'avg', 'min', 'max'}
+
+# Operators taking a single value, mapped to their SQL
+COMPARISON_OPERATORS = {'=': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', 'like': 'LIKE'}
+LIST_OPERATORS = {'in': 'IN', 'not in': 'NOT IN'}
+NULL_OPERATORS = {'is null': 'IS NULL', 'is not null': 'IS NOT NULL'}
+
+SPEC_KEYS = {'columns', 'aggregates', 'filters', 'group_by', 'having', 'order_by', 'limit', 'offset'}
+
+_ALIAS = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class QueryValidationError(ValueError):
+    pass
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _as_list(spec: Dict[str, Any], key: str) -> list:
+    value = spec.get(key) or []
+    if not isinstance(value, list):
+        raise QueryValidationError(f"'{key}' must be a list.")
+    return value
+
+
+def _column(name: Any, columns: List[str]) -> str:
+    if name not in columns:
+        raise QueryValidationError(f"Unknown column '{name}'.")
+    return _quote(name)
+
+
+def _conditions(conditions: list, resolve, key: str) -> Tuple[List[str], List[Any]]:
+    clauses, params = [], []
+    for condition in conditions:
+        if not isinstance(condition, dict):
+            raise QueryValidationError(f"Each entry of '{key}' must be an object.")
+        target = resolve(condition.get('column'))
+        op = str(condition.get('op', '=')).lower()
+        value = condition.get('value')
+
+        if op in COMPARISON_OPERATORS:
+            if isinstance(value, (list, dict)) or value is None:
+                raise QueryValidationError(f"Operator '{op}' needs a single non-null value, use 'is null' for nulls.")
+            clauses.append(f"{target} {COMPARISON_OPERATORS[op]} ?")
+            params.append(value)
+        elif op in LIST_OPERATORS:
+            if not isinstance(value, list) or not value:
+                raise QueryValidationError(f"Operator '{op}' needs a non-empty list of values.")
+            clauses.append(f"{target} {LIST_OPERATORS[op]} ({', '.join('?' for _ in value)})")
+            params.extend(value)
+        elif op == 'between':
+            if not isinstance(value, list) or len(value) != 2:
+                raise QueryValidationError("Operator 'between' needs a list of two values.")
+            clauses.append(f"{target} BETWEEN ? AND ?")
+            params.extend(value)
+        elif op in NULL_OPERATORS:
+            clauses.append(f"{target} {NULL_OPERATORS[op]}")
+        else:
+            raise QueryValidationError(f"Unsupported operator '{op}'.")
+    return clauses, params
+
+
+def _non_negative_int(spec: Dict[str, Any], key: str):
+    value = spec.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise QueryValidationError(f"'{key}' must be a non-negative integer.")
+    return value
+
+
+"""
+Compiles a query spec into SQL
+Parameters:
+    - table_name (str) - The table to query, already checked to exist
+    - columns (List[str]) - The column names of the table, from its schema
+    - spec (dict) - The query spec, see the module docstring
+Returns:
+    - The SQL statement (str)
+    - The parameters to bind, in order (List)
+Raises:
+    - QueryValidationError if the spec is invalid
+"""
+def compile_query(table_name: str, columns: List[str], spec: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    if not isinstance(spec, dict):
+        raise QueryValidationError("The query spec must be an object.")
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise QueryValidationError(f"Unknown spec key(s): {', '.join(sorted(unknown))}.")
+
+    projected_names = _as_list(spec, 'columns')
+    group_by_names = _as_list(spec, 'group_by')
+    projected = [_column(name, columns) for name in projected_names]
+    group_by = [_column(name, columns) for name in group_by_names]
+
+    select = list(projected)
+    aliases = {}
+    for aggregate in _as_list(spec, 'aggregates'):
+        if not isinstance(aggregate, dict):
+            raise QueryValidationError("Each aggregate must be an object.")
+        function = str(aggregate.get('function', '')).lower()
+        if function not in AGGREGATE_FUNCTIONS:
+            raise QueryValidationError(f"Unsupported aggregate function '{function}'.")
+        column = aggregate.get('column', '*')
+        if column == '*':
+            if function != 'count':
+                raise QueryValidationError(f"'{function}' needs a column.")
+            argument = '*'
+        else:
+            argument = _column(column, columns)
+            if aggregate.get('distinct'):
+                argument = f"DISTINCT {argument}"
+        alias = aggregate.get('alias') or (f"{function}_{column}" if column != '*' else function)
+        if not _ALIAS.match(alias) or alias in aliases or alias in columns:
+            raise QueryValidationError(f"Invalid or duplicate alias '{alias}'.")
+        aliases[alias] = f"{function.upper()}({argument})"
+        select.append(f"{aliases[alias]} AS {_quote(alias)}")
+
+    if aliases or group_by:
+        ungrouped = set(projected_names) - set(group_by_names)
+        if ungrouped:
+            raise QueryValidationError(f"Projected column(s) {', '.join(sorted(ungrouped))} must appear in group_by.")
+
+    sql = f"SELECT {', '.join(select) if select else '*'} FROM {_quote(table_name)}"
+    params: List[Any] = []
+
+    where, where_params = _conditions(_as_list(spec, 'filters'), lambda name: _column(name, columns), 'filters')
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+        params += where_params
+
+    if group_by:
+        sql += f" GROUP BY {', '.join(group_by)}"
+
+    def resolve_output(name):
+        # Output columns: aggregate aliases first, then table columns
+        if name in aliases:
+            return _quote(name)
+        return _column(name, columns)
+
+    having_conditions = _as_list(spec, 'having')
+    if having_conditions:
+        if not aliases:
+            raise QueryValidationError("'having' needs at least one aggregate.")
+
+        def resolve_alias(name):
+            if name not in aliases:
+                raise QueryValidationError(f"'having' can only reference aggregate aliases, got '{name}'.")
+            return aliases[name]
+
+        having, having_params = _conditions(having_conditions, resolve_alias, 'having')
+        sql += f" HAVING {' AND '.join(having)}"
+        params += having_params
+
+    order = []
+    for entry in _as_list(spec, 'order_by'):
+        if isinstance(entry, str):
+            entry = {'column': entry}
+        if not isinstance(entry, dict):
+            raise QueryValidationError("Each order_by entry must be a column name or an object.")
+        direction = str(entry.get('direction', 'asc')).upper()
+        if direction not in ('ASC', 'DESC'):
+            raise QueryValidationError(f"Invalid order direction '{direction}'.")
+        order.append(f"{resolve_output(entry.get('column'))} {direction}")
+    if order:
+        sql += f" ORDER BY {', '.join(order)}"
+
+    limit = _non_negative_int(spec, 'limit')
+    offset = _non_negative_int(spec, 'offset')
+    if limit is not None or offset is not None:
+        # SQLite only accepts OFFSET after a LIMIT, -1 means no limit
+        sql += " LIMIT ?"
+        params.append(limit if limit is not None else -1)
+        if offset is not None:
+            sql += " OFFSET ?"
+            params.append(offset)
+
+    return sql, params
@@ -0,0 +1,196 @@
+"""
+This class is responsible for the budgets that keep a single expensive read from holding up the rest of the app.
+A route runs its reads inside limits(budget), which applies to the statements of the calling thread:
+    - Before a read runs, its EXPLAIN QUERY PLAN is turned into an estimate of the rows it reads,
+      and reads estimated above max_cost are rejected, e.g. a filter on a column without an index over a large table.
+    - Statements still running timeout seconds after the budget was entered are interrupted by the progress handler
+      every connection installs, so a read that was estimated wrongly cannot run indefinitely either.
+    - Results requested in pages are paged at max_rows rows at most, with split_page telling the route whether there is a next page.
+Row estimates come from sqlite_stat1 when ANALYZE has run, as the maintenance task does periodically,
+and from the largest rowid of the table otherwise.
+"""
+
+import contextvars
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Virtual machine instructions between two calls of the progress handler, about a millisecond of work
+PROGRESS_INSTRUCTIONS = 10_000
+
+# Rows matched per key of an index without statistics, and the share of rows a range condition keeps, as SQLite assumes
+DEFAULT_ROWS_PER_KEY = 10
+RANGE_SELECTIVITY = 4
+
+_LOOP = re.compile(
+    r'^(SCAN|SEARCH)(?: TABLE)? (\w+)(?: AS \w+)?'
+    r'(?: USING (?:(?:COVERING )?INDEX (\w+)|(INTEGER PRIMARY KEY|PRIMARY KEY)))?(?: \((.*)\))?'
+)
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    """
+    Parameters:
+        - max_rows (int) - Largest page a client may request, 0 for no limit
+        - max_cost (int) - Estimated rows a statement may read, 0 for no limit
+        - timeout (float) - Seconds the statements of the budget may run for, 0 for no limit
+    """
+    max_rows: int = 0
+    max_cost: int = 0
+    timeout: float = 0
+
+    """Builds a budget from a config entry with "max_rows", "max_cost" and "timeout_ms" strings"""
+    @classmethod
+    def from_config(cls, values: Dict[str, str]) -> 'QueryBudget':
+        return cls(
+            max_rows=int(values.get('max_rows', 0)),
+            max_cost=int(values.get('max_cost', 0)),
+            timeout=int(values.get('timeout_ms', 0)) / 1000,
+        )
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, cost: int, max_cost: int, plan: List[str]):
+        self.cost = cost
+        self.max_cost = max_cost
+        self.plan = plan
+        super().__init__(f"Estimated to read {cost} rows, more than the {max_cost} allowed ({'; '.join(plan)}).")
+
+
+_budget = contextvars.ContextVar('query_budget', default=None)
+_deadline = contextvars.ContextVar('query_deadline', default=None)
+
+
+"""
+Applies a budget to the statements run by the block
+Parameters:
+    - budget (QueryBudget) - The budget, None to run the block without one
+"""
+@contextmanager
+def limits(budget: Optional[QueryBudget]):
+    deadline = time.monotonic() + budget.timeout if budget is not None and budget.timeout > 0 else None
+    budget_token = _budget.set(budget)
+    deadline_token = _deadline.set(deadline)
+    try:
+        yield budget
+    finally:
+        _deadline.reset(deadline_token)
+        _budget.reset(budget_token)
+
+"""Returns the budget of the current block, None outside of limits()"""
+def current() -> Optional[QueryBudget]:
+    return _budget.get()
+
+"""Whether the deadline of the current budget has passed, i.e. an interrupted statement was timed out"""
+def timed_out() -> bool:
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+"""
+Installed with Connection.set_progress_handler, a non-zero result interrupts the running statement
+Called in the thread running the statement, so it sees the budget of that thread's request only
+"""
+def progress_handler() -> int:
+    return 1 if timed_out() else 0
+
+
+def _table_rows(db: sqlite3.Connection, table_name: str) -> int:
+    try:
+        stat = db.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (table_name,)).fetchone()
+    except sqlite3.OperationalError:
+        # No sqlite_stat1 before the first ANALYZE
+        stat = None
+    if stat is not None and stat[0]:
+        return int(stat[0].split()[0])
+    try:
+        # The largest rowid is read from the last page of the table, counting the rows would scan it
+        row = db.execute(f'SELECT max(rowid) FROM "{table_name}"').fetchone()
+    except sqlite3.OperationalError:
+        # WITHOUT ROWID tables
+        return 0
+    return int(row[0] or 0)
+
+
+def _index_rows(db: sqlite3.Connection, table_rows: int, index_name: Optional[str], condition: str) -> int:
+    terms = [term.strip() for term in condition.split(' AND ')] if condition else []
+    equalities = len([term for term in terms if term.endswith('=?') and not term.endswith(('<=?', '>=?'))])
+    ranges = len(terms) - equalities
+
+    per_key = None
+    if index_name is not None and equalities:
+        try:
+            stat = db.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (index_name,)).fetchone()
+        except sqlite3.OperationalError:
+            stat = None
+        if stat is not None:
+            # "rows rows_per_first_key rows_per_first_two_keys ..."
+            counts = stat[0].split()
+            if len(counts) > equalities and counts[equalities].isdigit():
+                per_key = int(counts[equalities])
+    if per_key is None:
+        per_key = table_rows // DEFAULT_ROWS_PER_KEY ** equalities if equalities else table_rows
+    if ranges:
+        per_key //= RANGE_SELECTIVITY
+    return max(1, per_key)
+
+
+"""
+Estimates the rows a statement reads from its EXPLAIN QUERY PLAN, without running it
+The rows of each loop of the plan are multiplied by the rows of the loops it is nested in
+Parameters:
+    - db (sqlite3.Connection) - The connection the statement will run on
+    - query (str), parameters - The statement
+    - stops_after (int) - Rows after which the statement stops, when it reads its table without a filter,
+                          only applied when the plan does not sort or group the rows in a temporary b-tree first
+Returns:
+    - The estimated rows read (int)
+    - The lines of the plan (List[str])
+"""
+def estimate_cost(db: sqlite3.Connection, query: str, parameters=(), stops_after: Optional[int] = None) -> Tuple[int, List[str]]:
+    plan = [row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()]
+    cost, outer_rows = 0, 1
+    table_rows: Dict[str, int] = {}
+    for detail in plan:
+        loop = _LOOP.match(detail)
+        if loop is None:
+            continue
+        kind, table_name, index_name, primary_key, condition = loop.groups()
+        if table_name not in table_rows:
+            table_rows[table_name] = _table_rows(db, table_name)
+        rows = table_rows[table_name]
+        if kind == 'SEARCH':
+            if primary_key is not None and condition and '=' in condition and not any(op in condition for op in ('<', '>')):
+                rows = 1
+            else:
+                rows = _index_rows(db, rows, index_name, condition or '')
+        outer_rows *= rows
+        cost += outer_rows
+
+    sorted_first = any(detail.startswith('USE TEMP B-TREE') for detail in plan)
+    if stops_after is not None and not sorted_first:
+        cost = min(cost, stops_after)
+    return cost, plan
+
+
+"""
+Splits a result fetched with one row more than the page size into the page and whether more rows follow
+Parameters:
+    - result - A result of SQLiteAPI in any orient: a list of records, or a dictionary with "rows" or "data"
+    - max_rows (int) - The page size
+Returns:
+    - The result truncated to max_rows rows
+    - Whether the result had more rows (bool)
+"""
+def split_page(result: Any, max_rows: int) -> Tuple[Any, bool]:
+    if isinstance(result, list):
+        return result[:max_rows], len(result) > max_rows
+    if isinstance(result, dict) and 'rows' in result:
+        return {**result, 'rows': result['rows'][:max_rows]}, len(result['rows']) > max_rows
+    if isinstance(result, dict) and 'data' in result:
+        more = bool(result['data']) and len(result['data'][0]) > max_rows
+        return {**result, 'data': [column[:max_rows] for column in result['data']]}, more
+    return result, False
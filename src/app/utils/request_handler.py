@@ -5,10 +5,15 @@ It is used for internal API requests
 
 import requests
 from app_config import load
+from app.utils import serializers, compression
 
 config = load()
-flask_url = config['flask_url']
-endpoints = config['endpoints']
+flask_url = config.flask_url
+urls = config.urls
+
+# MessagePack when a decoder is installed, it is smaller and faster to decode than JSON
+# requests already sends Accept-Encoding for gzip, and brotli when it is installed, and decodes the response
+headers = {'Accept': serializers.accept_header()}
 
 method_to_request_function_map = {
     'get': requests.get,
@@ -17,23 +22,23 @@ method_to_request_function_map = {
     'put': requests.put,
 }
 
-"""Replaces parameter placeholders with the corresponding values"""
-def format_endpoint_template(endpoint_template: str, **params) -> str:
-    for key, value in params.items():
-        placeholder = f"<string:{key}>"
-        endpoint_template = endpoint_template.replace(placeholder, value)
-    return endpoint_template
-
 """Makes the request to the server"""
-def _make_request(endpoint, method, params=None) -> tuple[dict, int]:
+def _make_request(endpoint, method, params=None, files=None, query=None) -> tuple[dict, int]:
     try:
         request_url = f"{flask_url}{endpoint}"
         request_func = method_to_request_function_map.get(method.lower())
         if not request_func:
             raise ValueError(f"Unsupported HTTP method: {method}")
-        response = request_func(url=request_url, json=params)
+        if files is not None:
+            response = request_func(url=request_url, data=params, files=files, params=query, headers=headers)
+        elif params is not None:
+            # Large bodies such as row updates are uploaded gzip compressed
+            body, body_headers = compression.json_request(serializers.dumps(params), config.compression_min_bytes)
+            response = request_func(url=request_url, data=body, params=query, headers={**headers, **body_headers})
+        else:
+            response = request_func(url=request_url, params=query, headers=headers)
         response.raise_for_status()
-        return response.json(), response.status_code
+        return serializers.decode(response.headers.get('Content-Type'), response.content), response.status_code
 
     except requests.exceptions.RequestException as req_err:
         print(f"Request failed: {req_err}")
@@ -43,41 +48,94 @@ def _make_request(endpoint, method, params=None) -> tuple[dict, int]:
         print('Error occurred:', e)
         return {"error": str(e)}, 500
 
-sqlite_root = endpoints['sqlite']['root']
+sqlite_urls = urls['sqlite']
 
-"""Requests a list of tables from the SQLite Database"""
-def get_tables():
-    endpoint = sqlite_root + endpoints['sqlite']['tables']
+"""
+Requests a list of tables from the SQLite Database
+Parameters:
+    - orient (str) - 'rows' for a tuple per row, 'columns' for an array per column (cheaper to build a DataFrame from)
+"""
+def get_tables(orient='rows'):
+    endpoint = sqlite_urls['tables'].format()
     method = 'GET'
-    return _make_request(endpoint, method)
+    return _make_request(endpoint, method, query={'orient': orient})
 
 """Creates a table's column definitions in the SQLite Database"""
 def create_table(table_name, columns):
-    endpoint_template = sqlite_root + endpoints['sqlite']['table']
-    endpoint = format_endpoint_template(endpoint_template, table_name=table_name)
+    endpoint = sqlite_urls['table'].format(table_name=table_name)
     method = 'POST'
     params = {'columns': columns}
     return _make_request(endpoint, method, params)
 
 """Erases a table from the SQLite Database"""
 def drop_table(table_name):
-    endpoint_template = sqlite_root + endpoints['sqlite']['table']
-    endpoint = format_endpoint_template(endpoint_template, table_name=table_name)
+    endpoint = sqlite_urls['table'].format(table_name=table_name)
     method = 'DELETE'
     return _make_request(endpoint, method)
 
 """Inserts new rows into an existing table in the SQLite Database"""
 def insert_rows(table_name, rows):
-    endpoint_template = sqlite_root + endpoints['sqlite']['rows']
-    endpoint = format_endpoint_template(endpoint_template, table_name=table_name)
+    endpoint = sqlite_urls['rows'].format(table_name=table_name)
     method = 'POST'
     params = {'rows': rows}
     return _make_request(endpoint, method, params)
 
 """Updates existing rows in an existing table in the SQLite Database"""
 def update_rows(table_name, rows):
-    endpoint_template = sqlite_root + endpoints['sqlite']['rows']
-    endpoint = format_endpoint_template(endpoint_template, table_name=table_name)
+    endpoint = sqlite_urls['rows'].format(table_name=table_name)
     method = 'PUT'
     params = {'rows': rows}
-    return _make_request(endpoint, method, params)
\ No newline at end of file
+    return _make_request(endpoint, method, params)
+
+"""
+Runs a server-side projection/aggregation query on a table, so only the result set is transferred
+Parameters:
+    - spec (dict) - Columns, aggregates, filters, group_by, having, order_by, limit and offset
+"""
+def query_table(table_name, spec):
+    endpoint = sqlite_urls['query'].format(table_name=table_name)
+    method = 'POST'
+    return _make_request(endpoint, method, spec)
+
+"""
+Runs several operations in one round-trip and one transaction, rolled back entirely if one of them fails
+Parameters:
+    - operations (List[dict]) - Each names a SQLiteAPI method in 'op' with its arguments,
+                                e.g. {'op': 'update_rows', 'table_name': 'songs', 'rows': rows}
+"""
+def batch(operations):
+    endpoint = sqlite_urls['batch'].format()
+    method = 'POST'
+    params = {'operations': operations}
+    return _make_request(endpoint, method, params)
+
+imports_urls = urls['imports']
+
+"""Submits CSV files to be imported into the SQLite Database in the background"""
+def submit_import(files, force_create=False):
+    endpoint = imports_urls['jobs'].format()
+    method = 'POST'
+    params = {'force_create': str(force_create)}
+    uploads = [('files', (file_name, content, 'text/csv')) for file_name, content in files]
+    return _make_request(endpoint, method, params, files=uploads)
+
+"""Requests the status of background import jobs"""
+def get_import_jobs(job_ids):
+    endpoint = imports_urls['jobs'].format()
+    method = 'GET'
+    return _make_request(endpoint, method, query={'ids': ','.join(job_ids)})
+
+views_urls = urls['views']
+
+"""Requests the staleness metadata of every materialized summary view"""
+def get_views():
+    endpoint = views_urls['views'].format()
+    method = 'GET'
+    return _make_request(endpoint, method)
+
+"""Requests the rows of a materialized summary view, optionally ordered and limited"""
+def get_view(view_name, order_by=None, descending=False, limit=None):
+    endpoint = views_urls['view'].format(view_name=view_name)
+    method = 'GET'
+    query = {'order_by': order_by, 'direction': 'desc' if descending else 'asc', 'limit': limit}
+    return _make_request(endpoint, method, query={key: value for key, value in query.items() if value is not None})
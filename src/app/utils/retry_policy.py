@@ -0,0 +1,129 @@
+"""
+This class decides when and how long to wait before retrying external async requests.
+It provides per-status retry rules, exponential backoff with jitter, an overall deadline per request,
+and a per-host circuit breaker that fails fast while a host keeps failing.
+"""
+
+import random
+import time
+from typing import Optional, Dict
+from src.app.utils.http_errors import ERROR_MAP, RETRYABLE_EXCEPTIONS
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RetryPolicy:
+    # Statuses worth retrying: those mapped to retryable errors in http_errors, plus 502 Bad Gateway
+    RETRY_STATUSES = frozenset({status for status, error in ERROR_MAP.items() if error in RETRYABLE_EXCEPTIONS} | {502})
+
+    # Statuses that count against the host's circuit breaker (429 means the host is up, just busy)
+    FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+
+    def __init__(
+            self,
+            max_attempts: int = 5,
+            base_delay: float = 0.5,
+            max_delay: float = 30.0,
+            deadline: float = 120.0,
+            retry_statuses=None,
+            failure_statuses=None,
+        ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses = frozenset(retry_statuses) if retry_statuses is not None else self.RETRY_STATUSES
+        self.failure_statuses = frozenset(failure_statuses) if failure_statuses is not None else self.FAILURE_STATUSES
+
+    """
+    Returns whether a failed attempt should be retried
+    Parameters:
+        - status (int) - The HTTP status of the response, None if no response was received
+    """
+    def should_retry(self, status: Optional[int]) -> bool:
+        # No response at all (connection reset, timeout, ...) is treated as transient
+        return status is None or status in self.retry_statuses
+
+    """Returns whether a failed attempt indicates the host itself is unhealthy"""
+    def is_host_failure(self, status: Optional[int]) -> bool:
+        return status is None or status in self.failure_statuses
+
+    """
+    Returns the number of seconds to wait before the next attempt, using exponential backoff with full jitter
+    Parameters:
+        - attempt (int) - The number of the attempt that just failed, starting at 1
+        - retry_after (float) - The delay requested by the server through the Retry-After header, if any
+    """
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures of a host.
+    After failure_threshold failures the circuit opens and requests fail fast for reset_timeout seconds,
+    after which a single trial request is let through to decide whether to close it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    """Gives back the trial slot of a request that ended without a success or failure, e.g. when it was cancelled"""
+    def release(self):
+        self._trial_in_flight = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+"""Returns the circuit breaker shared by all requests to a host"""
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    breaker = _circuit_breakers.get(host)
+    if breaker is None:
+        breaker = _circuit_breakers[host] = CircuitBreaker()
+    return breaker
+
+"""Parses a Retry-After header given in seconds, ignoring HTTP-date values"""
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
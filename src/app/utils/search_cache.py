@@ -0,0 +1,76 @@
+"""
+This class is responsible for persisting search responses of external APIs in a local SQLite file,
+so that searches repeated across playlists and runs are only sent once.
+Entries are stored as JSON under a normalized query key and expire after a time to live.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+# SQLite limits the number of bound parameters per statement
+_IN_CLAUSE_BATCH = 500
+
+
+class SearchCache:
+
+    def __init__(self, path: str = 'src/database/cache/search_cache.db', namespace: str = 'default', ttl: Optional[float] = 30 * 24 * 3600):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            "namespace TEXT, key TEXT, value TEXT, stored_at REAL, PRIMARY KEY (namespace, key))"
+        )
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    """
+    Retrieves the cached values of the given keys
+    Parameters:
+        - keys (Iterable[str]) - The query keys to look up
+    Returns:
+        - The cached values by key, keys that are missing or expired are left out (Dict[str, Any])
+    """
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        oldest = time.time() - self.ttl if self.ttl is not None else float('-inf')
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _IN_CLAUSE_BATCH):
+                batch = keys[i:i + _IN_CLAUSE_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM search_cache WHERE namespace = ? AND stored_at >= ? "
+                    f"AND key IN ({', '.join('?' for _ in batch)})",
+                    [self.namespace, oldest, *batch]
+                ).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    """
+    Stores values under their keys, replacing previous entries
+    Parameters:
+        - values (Dict[str, Any]) - JSON serializable values by key
+    """
+    def put_many(self, values: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?)",
+                [(self.namespace, key, json.dumps(value), now) for key, value in values.items()]
+            )
+            self._db.commit()
@@ -0,0 +1,128 @@
+"""
+This class is responsible for encoding API responses and decoding them in the client.
+JSON is encoded with orjson or msgspec when one of them is installed, falling back to the standard library.
+Clients that send Accept: application/msgpack get MessagePack instead, a binary format that is smaller
+and faster to decode. Flask-RESTX picks the representation matching the Accept header of each request.
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional
+from flask import make_response
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _stdlib_dumps(data: Any) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _msgspec_dumps(data: Any) -> bytes:
+    return msgspec.json.encode(data)
+
+
+JSON_ENCODERS: Dict[str, Callable[[Any], bytes]] = {'json': _stdlib_dumps}
+JSON_DECODERS: Dict[str, Callable[[bytes], Any]] = {'json': json.loads}
+if msgspec is not None:
+    JSON_ENCODERS['msgspec'] = _msgspec_dumps
+    JSON_DECODERS['msgspec'] = msgspec.json.decode
+if orjson is not None:
+    JSON_ENCODERS['orjson'] = _orjson_dumps
+    JSON_DECODERS['orjson'] = orjson.loads
+
+MSGPACK_ENCODERS: Dict[str, Callable[[Any], bytes]] = {}
+MSGPACK_DECODERS: Dict[str, Callable[[bytes], Any]] = {}
+if msgspec is not None:
+    MSGPACK_ENCODERS['msgspec'] = msgspec.msgpack.encode
+    MSGPACK_DECODERS['msgspec'] = msgspec.msgpack.decode
+if msgpack is not None:
+    MSGPACK_ENCODERS['msgpack'] = msgpack.packb
+    MSGPACK_DECODERS['msgpack'] = msgpack.unpackb
+
+# Preferred first
+_PREFERENCE = ('orjson', 'msgspec', 'msgpack', 'json')
+
+"""
+Returns the name of the backend to use from the available ones
+Parameters:
+    - available (Dict) - Backends by name
+    - preferred (str) - A backend name, or 'auto' for the fastest available
+"""
+def _select(available: Dict[str, Callable], preferred: str = 'auto') -> Optional[str]:
+    if preferred in available:
+        return preferred
+    return next((name for name in _PREFERENCE if name in available), None)
+
+
+"""
+Registers the JSON and, when a MessagePack backend is installed, the MessagePack representations on the API
+JSON stays the default for clients that accept any media type
+Parameters:
+    - flask_api (Api) - The Flask-RESTX API
+    - preferred (str) - The JSON backend to use, 'auto' picks orjson, then msgspec, then the standard library
+"""
+def init_representations(flask_api, preferred: str = 'auto'):
+    dumps = JSON_ENCODERS[_select(JSON_ENCODERS, preferred)]
+
+    def output_json(data, code, headers=None):
+        response = make_response(dumps(data), code)
+        response.headers.extend(headers or {})
+        return response
+
+    representations = {JSON: output_json}
+
+    msgpack_backend = _select(MSGPACK_ENCODERS, preferred)
+    if msgpack_backend is not None:
+        packb = MSGPACK_ENCODERS[msgpack_backend]
+
+        def output_msgpack(data, code, headers=None):
+            response = make_response(packb(data), code)
+            response.headers.extend(headers or {})
+            return response
+
+        representations[MSGPACK] = output_msgpack
+
+    flask_api.representations = representations
+
+
+"""Encodes data as JSON with the fastest installed backend"""
+def dumps(data: Any) -> bytes:
+    return JSON_ENCODERS[_select(JSON_ENCODERS)](data)
+
+
+"""Returns the Accept header a client should send, MessagePack first when it can decode it"""
+def accept_header() -> str:
+    if MSGPACK_DECODERS:
+        return f'{MSGPACK}, {JSON};q=0.9'
+    return JSON
+
+
+"""
+Decodes a response body according to its content type
+Parameters:
+    - content_type (str) - The Content-Type header of the response
+    - body (bytes) - The raw body
+"""
+def decode(content_type: str, body: bytes) -> Any:
+    if content_type and content_type.startswith(MSGPACK):
+        return MSGPACK_DECODERS[_select(MSGPACK_DECODERS)](body)
+    return JSON_DECODERS[_select(JSON_DECODERS)](body)
@@ -0,0 +1,97 @@
+"""
+This class manages the lifecycle of a Spotify client-credentials access token.
+Tokens are refreshed ahead of expiry without blocking the event loop, and concurrent callers
+share a single in-flight refresh instead of each requesting a new token.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from typing import Optional
+import aiohttp
+
+SPOTIFY_TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+
+class SpotifyTokenManager:
+    def __init__(self, client_id, client_secret, access_token=None, token_expires=0.0, refresh_margin=60.0, token_url=SPOTIFY_TOKEN_URL):
+        self.logger = logging.getLogger(__name__)
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.token_url = token_url
+        self._access_token: Optional[str] = access_token
+        self._token_expires: float = token_expires or 0.0
+        # One lock per event loop, an asyncio.Lock can only be awaited on the loop it was first used on
+        self._locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+
+    def set_logger(self, logger):
+        self.logger = logger
+
+    @property
+    def access_token(self) -> Optional[str]:
+        return self._access_token
+
+    @property
+    def token_expires(self) -> float:
+        return self._token_expires
+
+    def set_token(self, access_token, token_expires):
+        self._access_token = access_token
+        self._token_expires = token_expires or 0.0
+
+    def _is_fresh(self) -> bool:
+        return self._access_token is not None and time.time() < self._token_expires - self.refresh_margin
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    """Returns a valid access token, refreshing it first if it is missing or about to expire"""
+    async def get_token(self) -> str:
+        if self._is_fresh():
+            return self._access_token
+        async with self._get_lock():
+            # Another task may have refreshed the token while this one waited for the lock
+            if not self._is_fresh():
+                await self._refresh()
+        return self._access_token
+
+    """Returns the Authorization header for the current access token"""
+    async def headers(self) -> dict:
+        return {'Authorization': f'Bearer {await self.get_token()}'}
+
+    """
+    Marks a token as rejected by the server, so the next caller refreshes it
+    Only the first of several tasks failing with the same token triggers a refresh
+    """
+    async def invalidate(self, access_token: Optional[str]):
+        async with self._get_lock():
+            if access_token is None or access_token == self._access_token:
+                self._token_expires = 0.0
+
+    """Requests a new access token, regardless of the current token's expiry"""
+    async def refresh(self) -> str:
+        async with self._get_lock():
+            await self._refresh()
+        return self._access_token
+
+    async def _refresh(self):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                url=self.token_url,
+                data={
+                    'grant_type': 'client_credentials',
+                    'client_id': self.client_id,
+                    'client_secret': self.client_secret,
+                }
+            ) as response:
+                response.raise_for_status()
+                token_data = await response.json()
+        self._access_token = token_data['access_token']
+        self._token_expires = time.time() + token_data['expires_in']
+        self.logger.info(f"Generated Spotify access token, expires in {token_data['expires_in']}s")
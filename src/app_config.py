@@ -1,22 +1,148 @@
+"""
+This class is responsible for loading the application config once and exposing it as a typed object.
+Values come from app_config.json and can be overridden with NOTELAB_<FIELD> environment variables,
+e.g. NOTELAB_FLASK_PORT=8000, dictionary settings taking a JSON object. NOTELAB_CONFIG points to a different config file.
+Endpoint templates are compiled into URL builders when the config is loaded, not on every request.
+"""
+
+import dataclasses
 import json
 import os
-from gnome_abrt.config import singleton
-
-@singleton
-def load():
-    current_dir = os.path.dirname(__file__)
-    config_path = os.path.join(current_dir, 'app_config.json')
-
-    with open(config_path) as config_file:
-        config = json.load(config_file)
-
-    return {
-        'host': config['host'],
-        'flask_port': config['flask_port'],
-        'flask_url': f"http://{config['host']}:{config['flask_port']}",
-        'streamlit_port': config['streamlit_port'],
-        'streamlit_url': f"http://{config['host']}:{config['streamlit_port']}",
-        'debug': config['debug'] == 'True',
-        'use_reloader': config['use_reloader'] == 'True',
-        'endpoints': config['endpoints'],
-    }
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, get_origin
+
+ENV_PREFIX = 'NOTELAB_'
+
+# Flask route converters, e.g. <string:table_name> or <int:row_id>
+_CONVERTER = re.compile(r'<(?:[a-z]+:)?([A-Za-z_][A-Za-z0-9_]*)>')
+
+
+class EndpointURL:
+    """
+    A Flask endpoint template compiled to a str.format template
+    Parameters:
+        - rule (str) - The full Flask rule including its namespace root, e.g. /db/<string:table_name>/rows
+    """
+
+    def __init__(self, rule: str):
+        self.rule = rule
+        self.template = _CONVERTER.sub(r'{\1}', rule.replace('{', '{{').replace('}', '}}'))
+        self.params = tuple(_CONVERTER.findall(rule))
+        self._format = self.template.format
+
+    """Returns the endpoint path with its placeholders replaced by the given values"""
+    def format(self, **params) -> str:
+        return self._format(**params)
+
+    def __repr__(self):
+        return f"EndpointURL({self.rule!r})"
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('true', '1', 'yes', 'on')
+
+
+def _parse_dict(value) -> dict:
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, dict):
+        raise ValueError(f"expected a JSON object, got {type(value).__name__}")
+    return value
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    host: str = '127.0.0.1'
+    flask_port: int = 5000
+    streamlit_port: int = 8501
+    debug: bool = False
+    use_reloader: bool = False
+    import_workers: int = 4
+    cpu_workers: int = 0
+    ingest_batch_rows: int = 5000
+    ingest_max_delay_ms: int = 2
+    maintenance_interval: int = 300
+    vacuum_step_pages: int = 256
+    read_replica: str = 'direct'
+    replica_mmap_mb: int = 256
+    replica_snapshot_interval: int = 60
+    serializer: str = 'auto'
+    compression_min_bytes: int = 1024
+    scheduler_workers: int = 1
+    background_max_pause: int = 5
+    sync_playlists: str = ''
+    spotify_client_id: str = ''
+    spotify_client_secret: str = ''
+    genius_access_token: str = ''
+    schedules: Dict[str, str] = field(default_factory=dict)
+    rate_budgets: Dict[str, str] = field(default_factory=dict)
+    query_budgets: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    profiling: bool = False
+    endpoints: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    urls: Dict[str, Dict[str, EndpointURL]] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def flask_url(self) -> str:
+        return f"http://{self.host}:{self.flask_port}"
+
+    @property
+    def streamlit_url(self) -> str:
+        return f"http://{self.host}:{self.streamlit_port}"
+
+    """
+    Builds the config from raw values, converting each to the type of its field
+    Parameters:
+        - values (dict) - Raw values as read from the config file
+        - environ (dict) - Environment variables, NOTELAB_<FIELD> entries override values
+    """
+    @classmethod
+    def from_dict(cls, values: dict, environ=None) -> 'AppConfig':
+        environ = os.environ if environ is None else environ
+        converters = {bool: _parse_bool, int: int, str: str}
+        kwargs = {}
+        for config_field in dataclasses.fields(cls):
+            if config_field.name == 'urls':
+                continue
+            env_name = ENV_PREFIX + config_field.name.upper()
+            value = environ.get(env_name, values.get(config_field.name))
+            if value is None:
+                continue
+            converter = _parse_dict if get_origin(config_field.type) is dict else converters.get(config_field.type)
+            try:
+                kwargs[config_field.name] = converter(value) if converter else value
+            except ValueError as e:
+                source = env_name if env_name in environ else config_field.name
+                raise ValueError(f"Invalid value for {source}: {e}") from e
+
+        endpoints = kwargs.get('endpoints', {})
+        kwargs['urls'] = {
+            namespace: {
+                name: EndpointURL(templates['root'] + template)
+                for name, template in templates.items() if name != 'root'
+            }
+            for namespace, templates in endpoints.items()
+        }
+        return cls(**kwargs)
+
+
+_config = None
+_lock = threading.Lock()
+
+"""Returns the application config, reading it on the first call only"""
+def load() -> AppConfig:
+    global _config
+    if _config is None:
+        with _lock:
+            if _config is None:
+                current_dir = os.path.dirname(__file__)
+                config_path = os.environ.get(ENV_PREFIX + 'CONFIG', os.path.join(current_dir, 'app_config.json'))
+
+                with open(config_path) as config_file:
+                    config = json.load(config_file)
+
+                _config = AppConfig.from_dict(config)
+    return _config
@@ -1,8 +1,48 @@
+import time
 import streamlit as st
+import pandas as pd
+from app.utils import request_handler
+
+"""Shows when a view was last refreshed, read from its staleness metadata"""
+def show_freshness(metadata):
+    if not metadata.get('refreshed_at'):
+        st.caption("Not refreshed yet")
+        return
+    age = time.time() - metadata['refreshed_at']
+    st.caption(f"Refreshed {age:.0f}s ago ({metadata['refresh_mode']}, {metadata['refresh_seconds'] * 1000:.1f} ms)")
+
+def view_frame(view_name, **query):
+    response, status_code = request_handler.get_view(view_name, **query)
+    if status_code != 200:
+        st.error(f"Failed to fetch {view_name}: {response}")
+        return None, {}
+    return pd.DataFrame(response['rows'], columns=response['columns']), response['metadata']
+
 def page_dashboard():
     st.title('Dashboard')
 
     repo_url = 'https://github.com/saragarcia6123/NoteLab'
     st.link_button('Link to GitHub Repository', repo_url)
 
-page_dashboard()
\ No newline at end of file
+    averages, metadata = view_frame('mv_audio_feature_averages')
+    if averages is not None and not averages.empty and averages['track_count'][0]:
+        st.subheader("Library")
+        st.metric("Tracks", int(averages['track_count'][0]))
+        st.dataframe(averages.drop(columns=['track_count']), hide_index=True)
+        show_freshness(metadata)
+
+    left, right = st.columns(2)
+    with left:
+        st.subheader("Top artists")
+        artists, metadata = view_frame('mv_top_artists', order_by='track_count', descending=True, limit=10)
+        if artists is not None and not artists.empty:
+            st.bar_chart(artists, x='artist_name', y='track_count')
+            show_freshness(metadata)
+    with right:
+        st.subheader("Key distribution")
+        keys, metadata = view_frame('mv_key_distribution', order_by='key')
+        if keys is not None and not keys.empty:
+            st.bar_chart(keys, x='key', y=['major_count', 'minor_count'])
+            show_freshness(metadata)
+
+page_dashboard()
@@ -4,11 +4,29 @@ import pandas as pd
 import message_handler
 from app.utils import request_handler
 
+AGGREGATE_FUNCTIONS = ['avg', 'sum', 'min', 'max', 'count']
+
+"""Aggregates a table on the server and shows only the grouped result"""
+def summarize_table(table_name, columns):
+    with st.expander("Summarize"):
+        group_by = st.multiselect("Group by", columns, key=f"group_by_{table_name}")
+        function = st.selectbox("Aggregate", AGGREGATE_FUNCTIONS, key=f"function_{table_name}")
+        targets = st.multiselect("Columns", columns, key=f"targets_{table_name}")
+        if st.button("Run", key=f"summarize_{table_name}"):
+            aggregates = [{'function': function, 'column': column} for column in targets] or [{'function': 'count'}]
+            spec = {'columns': group_by, 'group_by': group_by, 'aggregates': aggregates, 'order_by': group_by}
+            response, status_code = request_handler.query_table(table_name, spec)
+            if status_code == 200:
+                st.dataframe(pd.DataFrame(response['rows'], columns=response['columns']))
+            else:
+                message_handler.add_response(response, status_code)
+                st.rerun()
+
 def page_tables():
     st.title('Tables')
     message_handler.show_messages()
 
-    tables_data = request_handler.get_tables()
+    tables_data = request_handler.get_tables(orient='columns')
 
     if tables_data is None:
         st.error("Failed to fetch tables from server")
@@ -20,13 +38,13 @@ def page_tables():
         tables = tables_data[0]['tables']
         for table_name, table_info in tables.items():
             columns = table_info["columns"]
-            rows = table_info["rows"]
-
-            df = pd.DataFrame(rows, columns=columns)
+            # Built column by column, without materializing a row object per row
+            df = pd.DataFrame(dict(zip(columns, table_info["data"])), columns=columns)
             df.replace('NULL', np.nan, inplace=True)
 
             st.subheader(f"Table: {table_name}")
             st.dataframe(df)
+            summarize_table(table_name, columns)
 
             if st.button("Delete table", key=f"delete_{table_name}"):
                 response, status_code = request_handler.drop_table(table_name)
@@ -4,10 +4,10 @@ from app.utils import request_handler
 from dashboard import message_handler
 from utils import pandas_to_sql
 import pandas as pd
-import os
+import time
 
 config = app_config.load()
-endpoint_template = config['endpoints']['sqlite']['table']
+endpoint_template = config.endpoints['sqlite']['table']
 
 def page_create_table():
     st.title('New Table')
@@ -22,22 +22,53 @@ def page_create_table():
         new_table()
 
 def upload_from_csv():
-    csv = st.file_uploader('Upload from .csv', type=['csv'])
-    if csv:
+    csvs = st.file_uploader('Upload from .csv', type=['csv'], accept_multiple_files=True)
+    if csvs:
         if st.button('Upload'):
-            df = pd.read_csv(csv)
-            table_name = os.path.splitext(csv.name)[0]
-            columns = pandas_to_sql.columns_from_df(table_name, df)
-            rows = pandas_to_sql.rows_from_df(df)
-
-            response, status_code = request_handler.create_table(table_name, columns)
-            message_handler.add_response(response, status_code)
-
-            response, status_code = request_handler.insert_rows(table_name, rows)
-            message_handler.add_response(response, status_code)
-
+            files = [(csv.name, csv.getvalue()) for csv in csvs]
+            response, status_code = request_handler.submit_import(files)
+            if 200 <= status_code < 300:
+                st.session_state.import_jobs = response['jobs']
+            else:
+                message_handler.add_response(response, status_code)
             st.rerun()
 
+    show_import_progress()
+
+"""Polls the server for the status of submitted import jobs until they have all finished"""
+def show_import_progress(poll_interval=1):
+    job_ids = st.session_state.get('import_jobs')
+    if not job_ids:
+        return
+
+    jobs, status_code = request_handler.get_import_jobs(job_ids)
+    if not 200 <= status_code < 300:
+        message_handler.add_response(jobs, status_code)
+        st.session_state.import_jobs = []
+        return
+
+    finished = True
+    for job in jobs:
+        rows_total = job['rows_total'] or 0
+        progress = job['rows_written'] / rows_total if rows_total else 0.0
+        label = f"{job['file_name']}: {job['status']}"
+        if job['status'] == 'failed':
+            st.error(f"{label} - {job['error']}")
+        elif job['status'] == 'done':
+            st.progress(1.0, text=label)
+        else:
+            finished = False
+            st.progress(progress, text=label)
+
+    if finished:
+        st.session_state.import_jobs = []
+        done = sum(1 for job in jobs if job['status'] == 'done')
+        message_handler.add_response(f"Imported {done} of {len(jobs)} file(s).", 200)
+        st.rerun()
+    else:
+        time.sleep(poll_interval)
+        st.rerun()
+
 
 def new_table():
     st.title('This section is WIP')
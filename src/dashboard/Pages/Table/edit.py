@@ -9,7 +9,10 @@ def page_edit_table():
     st.title('Edit Tables')
     message_handler.show_messages()
 
-    tables = request_handler.get_tables()[0]['tables']
+    # Tables returned with the last update, so the rerun after it does not request them again
+    tables = st.session_state.pop('edited_tables', None)
+    if tables is None:
+        tables = request_handler.get_tables(orient='columns')[0]['tables']
     table_names = list(tables.keys())
 
     table_name = st.selectbox(
@@ -20,16 +23,24 @@ def page_edit_table():
     if table_name:
         st.subheader(f"Table: {table_name}")
         columns = tables[table_name]["columns"]
-        rows = tables[table_name]["rows"]
-        df = pd.DataFrame(rows, columns=columns)
+        df = pd.DataFrame(dict(zip(columns, tables[table_name]["data"])), columns=columns)
         df.set_index(df.columns[0], inplace=True)
         edited_df = st.data_editor(df, num_rows='dynamic', use_container_width=True)
         edited_df.reset_index(inplace=True)
 
         if st.button("Update"):
             rows = pandas_to_sql.rows_from_df(edited_df)
-            response, status_code = request_handler.update_rows(table_name, rows)
-            message_handler.add_response(response, status_code)
+            # The update and the refreshed tables in one round-trip
+            response, status_code = request_handler.batch([
+                {'op': 'update_rows', 'table_name': table_name, 'rows': rows},
+                {'op': 'get_tables', 'orient': 'columns'},
+            ])
+            if status_code == 200:
+                update, tables = response['results']
+                message_handler.add_response(update['result'], update['status'])
+                st.session_state['edited_tables'] = tables['result']['tables']
+            else:
+                message_handler.add_response(response, status_code)
             st.rerun()
 
 page_edit_table()
\ No newline at end of file
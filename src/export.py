@@ -0,0 +1,54 @@
+"""
+This class is the command line entry point for exporting tables to Parquet or Arrow IPC files
+
+Usage:
+    python src/export.py songs --format parquet --output songs.parquet
+    python src/export.py songs --format arrow --query '{"columns": ["artist"], "group_by": ["artist"], "aggregates": [{"function": "count"}]}'
+"""
+
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ''))
+repo_root = os.path.dirname(project_root)
+
+for path in (project_root, repo_root):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import argparse
+import json
+from app.api.sqlite_api import SQLiteAPI
+from app.api.export_api import ExportAPI, FORMATS
+
+def run(db_path, table_name, export_format, output, spec, batch_size):
+    sqlite_api = SQLiteAPI()
+    message, status_code = sqlite_api.connect(db_path)
+    if status_code != 200:
+        print(message, file=sys.stderr)
+        return 1
+    try:
+        export_api = ExportAPI(sqlite_api, export_dir='.', batch_size=batch_size)
+        output = output or f"{table_name}{FORMATS[export_format]}"
+        result, status_code = export_api.export(table_name, export_format, path=output, spec=spec)
+        if status_code != 200:
+            print(result, file=sys.stderr)
+            return 1
+        print(f"Exported {result['rows']} row(s) to {result['path']} ({result['bytes']} bytes) in {result['seconds']:.2f}s")
+        return 0
+    finally:
+        sqlite_api.disconnect()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a table or a query result to Parquet or Arrow IPC.')
+
+    parser.add_argument('table', type=str, help='The table to export.')
+    parser.add_argument('--db', type=str, default='src/database/database', help='Path of the SQLite database.')
+    parser.add_argument('--format', type=str, default='parquet', choices=list(FORMATS), help='The output format.')
+    parser.add_argument('--output', type=str, default=None, help='The output file, defaults to <table>.<format>.')
+    parser.add_argument('--query', type=str, default=None, help='A JSON query spec applied to the table, as for /db/<table>/query.')
+    parser.add_argument('--batch_size', type=int, default=50_000, help='Rows held in memory per written batch.')
+
+    args = parser.parse_args()
+
+    spec = json.loads(args.query) if args.query else None
+    sys.exit(run(args.db, args.table, args.format, args.output, spec, args.batch_size))
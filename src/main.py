@@ -1,74 +1,145 @@
 """
 This class is the starting point and is responsible for initiating the server and streamlit app
+The Flask app is served from this process and Streamlit is started as soon as the API answers its health check
 """
 
 import sys
 import os
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ''))
+repo_root = os.path.dirname(project_root)
 
-if project_root not in sys.path:
-    sys.path.append(project_root)
+# The app is imported both as `app...` and as `src.app...`, which `flask run` covered by adding the working directory
+for path in (project_root, repo_root):
+    if path not in sys.path:
+        sys.path.append(path)
 
+import argparse
+import socket
 import subprocess
 import threading
 import time
-import requests
+import urllib.error
+import urllib.request
 import app_config
 
 os.environ['FLASK_APP'] = 'src/app/main.py'
 
 config = app_config.load()
 
-def run_flask():
-    debug = config['debug']
-    host = config['host']
-    port = config['flask_port']
-    use_reloader = config['use_reloader']
+"""
+Serves the Flask app from a thread of this process
+The server socket is bound before this returns, so connections queue up instead of being refused
+Returns:
+    - The server, to be shut down with server.shutdown()
+"""
+def run_flask_in_process(host, port):
+    # Imported here so the launcher itself starts instantly and the app is imported only once
+    from werkzeug.serving import make_server
+    from app.main import app
 
+    app.debug = config.debug
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name='flask-server', daemon=True)
+    thread.start()
+    return server
+
+"""
+Runs Flask with its reloader in a child process
+The reloader restarts the whole interpreter on code changes, so it cannot run inside this process
+"""
+def run_flask_subprocess(host, port):
     command = [
         "flask", "run",
         "--host", host,
         "--port", str(port)
     ]
 
-    if debug:
+    if config.debug:
         command.append("--debug")
 
-    if use_reloader:
-        command.append("--reload")
+    command.append("--reload")
 
-    process = subprocess.Popen(command)
-    process.wait()
+    return subprocess.Popen(command)
 
 def run_streamlit():
-    process = subprocess.Popen(["streamlit", "run", "src/dashboard/streamlit_app.py"])
-    process.wait()
+    return subprocess.Popen(["streamlit", "run", "src/dashboard/streamlit_app.py", "--server.port", str(config.streamlit_port)])
 
-def await_flask(url, timeout=20):
-    start_time = time.time()
-    while time.time() - start_time < timeout:
+"""
+Waits until the server accepts connections and its health check succeeds
+Polls with a short exponential backoff instead of fixed one-second sleeps
+Parameters:
+    - host (str), port (int) - The address of the server
+    - timeout (float) - Seconds to wait before giving up
+    - process (subprocess.Popen) - If given, stop waiting as soon as it exits
+Returns:
+    - Whether the server is ready (bool)
+"""
+def await_flask(host, port, timeout=20, process=None):
+    deadline = time.monotonic() + timeout
+    health_url = f"http://{host}:{port}/health"
+    wait = 0.01
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
         try:
-            response = requests.get(url)
-            return response.status_code == 200
-        except requests.ConnectionError:
+            with socket.create_connection((host, port), timeout=0.5):
+                pass
+            with urllib.request.urlopen(health_url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except (OSError, urllib.error.URLError):
             pass
-        time.sleep(1)
+        time.sleep(wait)
+        wait = min(wait * 2, 0.25)
     return False
 
-def run():
-    flask_thread = threading.Thread(target=run_flask)
-    flask_thread.daemon = True
-    flask_thread.start()
+def run(api_only=False, host=None, port=None, timeout=20):
+    host = host or config.host
+    port = int(port or config.flask_port)
 
-    flask_ready = await_flask(config['flask_url'])
+    server = process = None
+    if config.use_reloader:
+        process = run_flask_subprocess(host, port)
+    else:
+        server = run_flask_in_process(host, port)
+
+    try:
+        if not await_flask(host, port, timeout=timeout, process=process):
+            print("Flask did not start in time, exiting.")
+            return -1
+
+        print(f"Flask is ready at http://{host}:{port}")
+        if api_only:
+            # Keep the main thread alive while the server thread or child process serves requests
+            if process is not None:
+                process.wait()
+            else:
+                threading.Event().wait()
+        else:
+            print(f"Starting Streamlit at {config.streamlit_url}...")
+            run_streamlit().wait()
+        return 0
 
-    if flask_ready:
-        print(f"Flask is ready at {config['flask_url']}\nStarting Streamlit at {config['streamlit_url']}...")
-        run_streamlit()
+    except KeyboardInterrupt:
         return 0
-    else:
-        print("Flask did not start in time, exiting.")
-        return -1
+
+    finally:
+        if server is not None:
+            from app.main import shutdown
+            server.shutdown()
+            shutdown()
+        if process is not None and process.poll() is None:
+            process.terminate()
+            process.wait()
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser(description='Start the Flask API and the Streamlit dashboard.')
+
+    parser.add_argument('--api-only', action='store_true', help='Start only the Flask API, without Streamlit.')
+    parser.add_argument('--host', type=str, default=None, help='Host on which to run the server, defaults to the config.')
+    parser.add_argument('--port', type=int, default=None, help='Port on which to run the server, defaults to the config.')
+    parser.add_argument('--timeout', type=float, default=20, help='Seconds to wait for the server to become ready.')
+
+    args = parser.parse_args()
+
+    sys.exit(run(api_only=args.api_only, host=args.host, port=args.port, timeout=args.timeout))
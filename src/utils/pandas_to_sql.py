@@ -6,9 +6,11 @@ from typing import Type, Union, List
 import pandas as pd
 import pandas.api.types as ptypes
 import re
-from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Float
 
-def _infer_sql_type(dtype) -> Type[Union[Integer, DateTime, String, Float]]:
+# sqlalchemy is imported inside the functions that use it, it is slow to import and only needed to build column types
+def _infer_sql_type(dtype) -> "Type[Union[Integer, DateTime, String, Float]]":
+    from sqlalchemy import Integer, String, DateTime, Float
+
     type_mapping = {
         'integer': Integer,
         'datetime64': DateTime,
@@ -31,6 +33,8 @@ def to_snake_case(name: str) -> str:
 Converts the columns to SQL format for use in CREATE TABLE statements
 """
 def columns_from_df(table_name: str, df: pd.DataFrame) -> list[str]:
+    from sqlalchemy import MetaData, Table, Column
+
     metadata = MetaData()
     columns = [
         Column(to_snake_case(col), _infer_sql_type(df[col].dtype))
@@ -0,0 +1,87 @@
+"""
+This class scores search hits against the songs and artists they were searched for.
+Strings are compared as sets of words, and every query-hit pair of a batch is scored at once with numpy
+"""
+
+import re
+from itertools import chain
+from typing import List, Optional, Tuple
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+"""
+Scores each pair (left[i], right[i]) between 0 and 1 by the words they share
+Shared words are divided by the size of the smaller set (so 'hello' fully matches 'hello remastered'),
+blended with the Dice coefficient so that exact matches rank above partial ones
+Parameters:
+    - left (List[str]) - The first string of each pair
+    - right (List[str]) - The second string of each pair
+Returns:
+    - The scores (np.ndarray)
+"""
+def token_set_scores(left: List[str], right: List[str]) -> np.ndarray:
+    vocabulary = {}
+
+    def word_ids(text):
+        return {vocabulary.setdefault(word, len(vocabulary)) for word in _WORD.findall(text.lower())}
+
+    left_ids = [word_ids(text) for text in left]
+    right_ids = [word_ids(text) for text in right]
+    n = len(left_ids)
+    left_sizes = np.fromiter(map(len, left_ids), dtype=np.int64, count=n)
+    right_sizes = np.fromiter(map(len, right_ids), dtype=np.int64, count=n)
+
+    # One key per (pair, word), a key present on both sides is a word shared by the pair
+    width = len(vocabulary) + 1
+    pairs = np.arange(n, dtype=np.int64)
+    left_keys = np.repeat(pairs, left_sizes) * width + np.fromiter(chain.from_iterable(left_ids), dtype=np.int64)
+    right_keys = np.repeat(pairs, right_sizes) * width + np.fromiter(chain.from_iterable(right_ids), dtype=np.int64)
+    shared = np.bincount(np.intersect1d(left_keys, right_keys, assume_unique=True) // width, minlength=n)
+
+    smaller = np.minimum(left_sizes, right_sizes)
+    total = left_sizes + right_sizes
+    containment = np.divide(shared, smaller, out=np.zeros(n), where=smaller > 0)
+    dice = np.divide(2 * shared, total, out=np.zeros(n), where=total > 0)
+    return 0.8 * containment + 0.2 * dice
+
+"""
+Picks the best hit of each query
+Parameters:
+    - queries (List[Tuple[str, str]]) - The querified (song, artist) of each query
+    - hits (List[List[Tuple[str, str]]]) - The querified (title, primary artist) of the hits of each query, in search order
+    - title_weight (float) - Weight of the title score, the artist score gets the rest
+    - min_score (float) - Queries whose best hit scores lower resolve to None
+Returns:
+    - The index of the best hit of each query, or None (List[Optional[int]])
+"""
+def best_hits(queries: List[Tuple[str, str]], hits: List[List[Tuple[str, str]]],
+              title_weight: float = 0.6, min_score: float = 0.5) -> List[Optional[int]]:
+    counts = np.fromiter(map(len, hits), dtype=np.int64, count=len(hits))
+    if not counts.sum():
+        return [None] * len(queries)
+
+    query_index = np.repeat(np.arange(len(queries)), counts)
+    rank = np.arange(len(query_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+    songs = [queries[i][0] for i in query_index]
+    artists = [queries[i][1] for i in query_index]
+    titles = [title for query_hits in hits for title, _ in query_hits]
+    primary_artists = [artist for query_hits in hits for _, artist in query_hits]
+
+    artist_scores = token_set_scores(artists, primary_artists)
+    # The primary artist matching outright beats a partial match on a featured or group name
+    exact_artist = np.fromiter((a == b for a, b in zip(artists, primary_artists)), dtype=bool, count=len(artists))
+    artist_scores = np.where(exact_artist, 1.0, 0.9 * artist_scores)
+    scores = title_weight * token_set_scores(songs, titles) + (1 - title_weight) * artist_scores
+    # Ties go to the hit Genius ranked first
+    scores -= 1e-3 * rank
+
+    order = np.lexsort((-scores, query_index))
+    queries_with_hits, first = np.unique(query_index[order], return_index=True)
+    best = order[first]
+
+    result: List[Optional[int]] = [None] * len(queries)
+    for i, pair, score in zip(queries_with_hits, best, scores[best]):
+        if score >= min_score:
+            result[i] = int(rank[pair])
+    return result
@@ -4,20 +4,34 @@ This class uses regex to format song and artist names for use in API search quer
 
 import re
 
+# Compiled once, these run for every song and search hit of a batch
+_BRACKETS = re.compile(r'\s*[(\[{].*?[)\]}]')
+_DASH = re.compile(r' - ')
+_SONG_PUNCTUATION = re.compile(r'[;:/"]')
+_SONG_SPECIAL = re.compile(r'[+|?!]|\.{3}')
+_FEATURING = re.compile(r'\s*(feat|starring).*')
+_ARTIST_SPECIAL = re.compile(r'[+|?]|\.{3}')
+_ARTIST_PUNCTUATION = re.compile(r'[¥:$&|/"]')
+_ARTIST_KEYWORDS = re.compile(r'\b(and|with|x|duet)\b')
+
 def querify_song(song):
     song = song.lower()
-    song = re.sub(r'\s*[(\[{].*?[)\]}]', '', song).rstrip()  # Remove content within brackets
-    song = re.sub(r' - ', ' ', song)  # Replace ' - ' with a space
-    song = re.sub(r'[;:/"]', '', song)  # Remove certain punctuation
-    song = re.sub(r'[+|?!]|\.{3}', ' ', song)  # Replace special characters with a space
+    song = _BRACKETS.sub('', song).rstrip()  # Remove content within brackets
+    song = _DASH.sub(' ', song)  # Replace ' - ' with a space
+    song = _SONG_PUNCTUATION.sub('', song)  # Remove certain punctuation
+    song = _SONG_SPECIAL.sub(' ', song)  # Replace special characters with a space
     return song.strip()  # Strip extra spaces
     
 def querify_artist(artist):
     artist = artist.lower()  # Convert to lowercase
-    artist = re.sub(r'\s*[(\[{].*?[)\]}]', '', artist).rstrip()  # Remove content within brackets
-    artist = re.sub(r' - ', ' ', artist)  # Replace ' - ' with a space
-    artist = re.split(r'\s*(feat|starring).*', artist)[0]  # Remove anything after "feat" or "starring"
-    artist = re.sub(r'[+|?]|\.{3}', ' ', artist)  # Replace special characters with a space
-    artist = re.sub(r'[¥:$&|/"]', '', artist)  # Remove additional unwanted characters
-    artist = re.sub(r'\b(and|with|x|duet)\b', '', artist)  # Remove specific keywords
-    return artist.strip()  # Strip extra spaces
\ No newline at end of file
+    artist = _BRACKETS.sub('', artist).rstrip()  # Remove content within brackets
+    artist = _DASH.sub(' ', artist)  # Replace ' - ' with a space
+    artist = _FEATURING.split(artist)[0]  # Remove anything after "feat" or "starring"
+    artist = _ARTIST_SPECIAL.sub(' ', artist)  # Replace special characters with a space
+    artist = _ARTIST_PUNCTUATION.sub('', artist)  # Remove additional unwanted characters
+    artist = _ARTIST_KEYWORDS.sub('', artist)  # Remove specific keywords
+    return artist.strip()  # Strip extra spaces
+
+def querify_pair(pair):
+    song, artist = pair
+    return querify_song(song), querify_artist(artist)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Tests get_response against the local stub servers of the benchmarks, with a host that fails part of its requests
+and with attempts that end without an outcome while the host's circuit breaker is half-open.
+"""
+
+import asyncio
+import time
+import aiohttp
+import pytest
+from stub_servers import SpotifyStub
+from src.app.utils.async_request_handler import get_response
+from src.app.utils.http_errors import MaximumRetriesError
+from src.app.utils.retry_policy import RetryPolicy, get_circuit_breaker, CLOSED, OPEN, HALF_OPEN
+
+
+class SlowAuth:
+    def __init__(self, seconds=0.0, error=None):
+        self.seconds = seconds
+        self.error = error
+
+    async def get_token(self):
+        await asyncio.sleep(self.seconds)
+        if self.error is not None:
+            raise self.error
+        return 'token'
+
+    async def invalidate(self, token):
+        pass
+
+
+def _request(stub, **kwargs):
+    async def request():
+        async with aiohttp.ClientSession() as session:
+            return await get_response(stub.url, '/tracks', {'ids': 'a,b'}, {}, session, 5, 0.01, **kwargs)
+    return request()
+
+
+def _half_open(stub):
+    breaker = get_circuit_breaker(f'127.0.0.1:{stub.port}')
+    breaker.state = OPEN
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+    return breaker
+
+
+def test_flaky_host_is_retried():
+    with SpotifyStub(failure_rate=0.5, seed=1) as stub:
+        policy = RetryPolicy(max_attempts=10, base_delay=0.001, max_delay=0.01)
+        for _ in range(10):
+            assert len(asyncio.run(_request(stub, policy=policy))['tracks']) == 2
+        assert stub.failed > 0
+        assert get_circuit_breaker(f'127.0.0.1:{stub.port}').state == CLOSED
+
+
+def test_flaky_host_opens_the_circuit():
+    with SpotifyStub(failure_rate=1.0) as stub:
+        policy = RetryPolicy(max_attempts=5, base_delay=0.001, max_delay=0.01)
+        with pytest.raises(MaximumRetriesError):
+            asyncio.run(_request(stub, policy=policy))
+        assert get_circuit_breaker(f'127.0.0.1:{stub.port}').state == OPEN
+
+
+def test_half_open_trial_closes_the_circuit():
+    with SpotifyStub() as stub:
+        breaker = _half_open(stub)
+        asyncio.run(_request(stub))
+        assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize('auth, policy', [
+    # The deadline passes while the token is resolved
+    (SlowAuth(seconds=0.05), RetryPolicy(deadline=0.01)),
+    # The token manager raises something other than a client error
+    (SlowAuth(error=RuntimeError('no credentials')), None),
+])
+def test_half_open_trial_without_outcome_releases_the_slot(auth, policy):
+    with SpotifyStub() as stub:
+        breaker = _half_open(stub)
+        with pytest.raises((MaximumRetriesError, RuntimeError)):
+            asyncio.run(_request(stub, auth=auth, policy=policy))
+        assert breaker.state == HALF_OPEN
+        asyncio.run(_request(stub))
+        assert breaker.state == CLOSED
+
+
+def test_cancelled_half_open_trial_releases_the_slot():
+    with SpotifyStub(latency=1.0) as stub:
+        breaker = _half_open(stub)
+
+        async def cancel():
+            task = asyncio.ensure_future(_request(stub))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel())
+        assert breaker.state == HALF_OPEN
+        stub.latency = 0.0
+        asyncio.run(_request(stub))
+        assert breaker.state == CLOSED
@@ -0,0 +1,91 @@
+"""
+Tests that audio analysis packed into BLOBs unpacks to the values of the payload,
+and that features extracted from a batch of stored tracks match the ones computed by hand for each track.
+"""
+
+import sqlite3
+import numpy as np
+import pytest
+from app.api.sqlite_api import SQLiteAPI
+from app.api.audio_analysis_api import AudioAnalysisAPI, ARRAY_WIDTHS, TRACK_FIELDS, pack_analysis, unpack_array
+
+
+def _segment(start, duration, pitches, timbre):
+    return {'start': start, 'duration': duration, 'confidence': 0.5, 'loudness_start': -20.0,
+            'loudness_max_time': 0.05, 'loudness_max': -10.0, 'pitches': pitches, 'timbre': timbre}
+
+
+def _analysis(tempo, segments, beat_durations):
+    return {
+        'track': {'duration': 180.0, 'tempo': tempo, 'key': 5, 'mode': 1, 'time_signature': 4, 'loudness': -8.0},
+        'segments': segments,
+        'beats': [{'start': float(i), 'duration': duration, 'confidence': 0.9} for i, duration in enumerate(beat_durations)],
+        'bars': [{'start': 0.0, 'duration': 2.0, 'confidence': 0.8}],
+        'tatums': [],
+        'sections': [{'start': 0.0, 'duration': 180.0, 'confidence': 1.0, 'loudness': -8.0, 'tempo': tempo, 'key': 5, 'mode': 1}],
+    }
+
+
+ANALYSES = {
+    'a': _analysis(120.0, [
+        _segment(0.0, 0.25, [1.0] + [0.0] * 11, list(range(12))),
+        _segment(0.25, 0.75, [0.0] * 4 + [1.0] + [0.0] * 7, [0.0] * 12),
+    ], [0.5, 0.5, 0.5]),
+    'b': _analysis(90.0, [_segment(0.0, 1.0, [0.0] * 11 + [1.0], [2.0] * 12)], [0.4, 0.6]),
+    # A track without segments or beats gets zero features rather than failing the batch
+    'c': _analysis(100.0, [], []),
+}
+
+
+@pytest.fixture
+def analysis_api(tmp_path):
+    db_path = str(tmp_path / 'database')
+    sqlite3.connect(db_path).close()
+    sqlite_api = SQLiteAPI()
+    sqlite_api.connect(db_path)
+    api = AudioAnalysisAPI(sqlite_api)
+    assert api.store(list(ANALYSES.items()))[1] == 201
+    yield api
+    sqlite_api.disconnect()
+
+
+def test_pack_and_unpack_round_trip():
+    payload = ANALYSES['a']
+    values = pack_analysis(payload)
+    assert values[:len(TRACK_FIELDS)] == [payload['track'][field] for field in TRACK_FIELDS]
+
+    arrays = dict(zip(ARRAY_WIDTHS, values[len(TRACK_FIELDS):]))
+    segments = unpack_array('segments', arrays['segments'])
+    assert segments.shape == (2, ARRAY_WIDTHS['segments'])
+    assert segments[1, 1] == 0.75
+    assert segments[0, -12:].tolist() == list(range(12))
+    assert unpack_array('beats', arrays['beats'])[:, 1].tolist() == [0.5, 0.5, 0.5]
+    assert unpack_array('tatums', arrays['tatums']).shape == (0, ARRAY_WIDTHS['tatums'])
+    assert unpack_array('sections', arrays['sections'])[0, 4] == 120.0
+
+
+def test_get_analysis_returns_stored_arrays(analysis_api):
+    analyses, status = analysis_api.get_analysis(['b', 'missing'], arrays=['segments'])
+    assert status == 200
+    assert list(analyses) == ['b']
+    assert analyses['b']['tempo'] == 90.0
+    assert analyses['b']['segments'][0, -12:].tolist() == [2.0] * 12
+    assert analysis_api.get_analysis(['missing'])[1] == 404
+
+
+def test_extract_features(analysis_api):
+    features, status = analysis_api.extract_features(['c', 'a', 'b'])
+    assert status == 200
+    assert features['track_ids'] == ['c', 'a', 'b']
+    assert features['tempo'].tolist() == [100.0, 120.0, 90.0]
+
+    assert features['mean_pitches'][1].tolist() == [0.5] + [0.0] * 3 + [0.5] + [0.0] * 7
+    assert features['mean_timbre'][1].tolist() == pytest.approx([i / 2 for i in range(12)])
+    assert features['mean_timbre'][2].tolist() == [2.0] * 12
+    # Weighted by segment duration, the second segment of 'a' lasts three times as long as the first
+    assert features['key_histogram'][1].tolist() == pytest.approx([0.25] + [0.0] * 3 + [0.75] + [0.0] * 7)
+    assert features['key_histogram'][2].tolist() == pytest.approx([0.0] * 11 + [1.0])
+    assert features['tempo_stability'].tolist() == pytest.approx([0.0, 1.0, 0.8])
+
+    for name in ('mean_pitches', 'mean_timbre', 'key_histogram'):
+        assert features[name][0].tolist() == [0.0] * 12
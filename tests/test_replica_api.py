@@ -0,0 +1,68 @@
+"""
+Tests that the read-only connections of ReadReplicaAPI are never locked out by the shared connection,
+reading with a busy timeout of 0 so a lock held by the writer fails the read instead of waiting for it,
+and that opening another connection does not wait for a write in progress either.
+"""
+
+import os
+import sqlite3
+import time
+import pytest
+from app.api.sqlite_api import SQLiteAPI
+from app.api.replica_api import ReadReplicaAPI, MODE_DIRECT, MODE_SNAPSHOT
+
+
+@pytest.fixture
+def sqlite_api(tmp_path):
+    db_path = str(tmp_path / 'database')
+    sqlite3.connect(db_path).close()
+    api = SQLiteAPI()
+    assert api.connect(db_path)[1] == 200
+    yield api
+    api.disconnect()
+
+
+def _read_tables(replica):
+    with replica.reader() as reader:
+        reader.db.execute("PRAGMA busy_timeout = 0")
+        return reader.get_tables()
+
+
+def test_reads_right_after_connecting(sqlite_api):
+    replica = ReadReplicaAPI(sqlite_api, mode=MODE_DIRECT)
+    assert not os.path.exists(f"{sqlite_api.db_path}-journal")
+    assert _read_tables(replica) == ({'tables': {}}, 200)
+    replica.shutdown()
+
+
+@pytest.mark.parametrize('mode', [MODE_DIRECT, MODE_SNAPSHOT])
+def test_reads_and_writes_do_not_wait_for_each_other(sqlite_api, mode):
+    assert sqlite_api.create_table('songs', ['id INTEGER PRIMARY KEY', 'name TEXT'])[1] == 201
+    replica = ReadReplicaAPI(sqlite_api, mode=mode)
+    if mode == MODE_SNAPSHOT:
+        assert replica.take_snapshot()[1] == 200
+
+    with replica.reader() as reader:
+        reader.db.execute("PRAGMA busy_timeout = 0")
+        # A read transaction left open while the shared connection commits
+        reader.db.execute("BEGIN")
+        assert reader.db.execute("SELECT count(*) FROM songs").fetchone() == (0,)
+        assert sqlite_api.insert_rows('songs', [[1, 'Song 1']])[1] == 201
+        reader.db.rollback()
+
+    assert sqlite_api.db.execute("PRAGMA journal_mode").fetchone() == ('wal',)
+    assert _read_tables(replica)[1] == 200
+    replica.shutdown()
+
+
+def test_connects_while_another_connection_writes(sqlite_api):
+    assert sqlite_api.create_table('songs', ['id INTEGER PRIMARY KEY', 'name TEXT'])[1] == 201
+    with sqlite_api.transaction(immediate=True):
+        sqlite_api._execute("INSERT INTO songs VALUES (1, 'Song 1')")
+        # Setting auto_vacuum on an existing database waited out the write lock, then failed to connect
+        writer = SQLiteAPI()
+        start = time.perf_counter()
+        assert writer.connect(sqlite_api.db_path)[1] == 200
+        assert time.perf_counter() - start < 1
+    assert writer.db.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+    writer.disconnect()
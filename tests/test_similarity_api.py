@@ -0,0 +1,53 @@
+"""
+Tests that tracks replaced after the approximate index was built are searched with their new features.
+"""
+
+import json
+import sqlite3
+import numpy as np
+import pytest
+from app.api.sqlite_api import SQLiteAPI
+from app.api.similarity_api import SimilarityAPI, AUDIO_FEATURES_TABLE, FEATURES
+
+
+def _features(track_id, values):
+    return {'id': track_id, **dict(zip(FEATURES, map(float, values)))}
+
+
+@pytest.fixture
+def similarity_api(tmp_path):
+    db_path = str(tmp_path / 'database')
+    sqlite3.connect(db_path).close()
+    sqlite_api = SQLiteAPI()
+    sqlite_api.connect(db_path)
+    sqlite_api.create_table(AUDIO_FEATURES_TABLE, ['id TEXT PRIMARY KEY', 'data TEXT'])
+    rng = np.random.default_rng(1)
+    rows = [[f't{i}', json.dumps(_features(f't{i}', rng.normal(size=len(FEATURES))))] for i in range(400)]
+    sqlite_api.insert_rows(AUDIO_FEATURES_TABLE, rows)
+
+    api = SimilarityAPI(sqlite_api, index_dir=str(tmp_path / 'similarity'), approximate_threshold=100, n_probe=1)
+    api.build()
+    assert api._ivf is not None
+    yield api
+    sqlite_api.disconnect()
+
+
+def test_replaced_track_is_scored_with_its_new_features(similarity_api):
+    neighbours, status = similarity_api.query('t0', k=1)
+    assert status == 200
+    # t1 gets the features of t0, approximate results must not score it from the index files
+    features = similarity_api._matrix[similarity_api._positions['t0']]
+    raw = features * similarity_api._std + similarity_api._mean
+    similarity_api.add([_features('t1', raw)])
+
+    for exact in (False, True):
+        neighbours, status = similarity_api.query('t0', k=1, exact=exact)
+        assert status == 200
+        assert neighbours[0]['id'] == 't1'
+        assert neighbours[0]['score'] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_replaced_tracks_count_towards_a_rebuild(similarity_api):
+    rng = np.random.default_rng(2)
+    similarity_api.add([_features(f't{i}', rng.normal(size=len(FEATURES))) for i in range(50)])
+    assert not similarity_api._ivf_stale.any()
@@ -0,0 +1,38 @@
+"""
+Tests that a SpotifyTokenManager shared between event loops, as by clients used from several asyncio.run calls,
+shares one refresh per loop and never awaits a lock bound to another loop.
+"""
+
+import asyncio
+import time
+from src.app.utils.token_manager import SpotifyTokenManager
+
+
+class CountingTokenManager(SpotifyTokenManager):
+    def __init__(self):
+        super().__init__(client_id=None, client_secret=None)
+        self.refreshes = 0
+
+    async def _refresh(self):
+        await asyncio.sleep(0.01)
+        self.refreshes += 1
+        self.set_token(f'token-{self.refreshes}', time.time() + 3600)
+
+
+async def _contend(manager, tasks=5):
+    manager.set_token(None, 0)
+    return await asyncio.gather(*[manager.get_token() for _ in range(tasks)])
+
+
+def test_concurrent_callers_share_one_refresh():
+    manager = CountingTokenManager()
+    assert asyncio.run(_contend(manager)) == ['token-1'] * 5
+    assert manager.refreshes == 1
+
+
+def test_lock_is_not_shared_between_event_loops():
+    manager = CountingTokenManager()
+    asyncio.run(_contend(manager))
+    # Waiting on a lock first used on the previous loop raised "is bound to a different event loop"
+    assert asyncio.run(_contend(manager)) == ['token-2'] * 5
+    assert manager.refreshes == 2